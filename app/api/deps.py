@@ -8,7 +8,10 @@ from sqlalchemy.orm import Session
 from app import crud, models, schemas
 from app.core import security
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db import session as db_session
+from app.db.session import SessionLocal, get_async_db
+from app.services.principal_cache import principal_cache
+from app.services.revocation import revocation_list
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"/login/access-token"
@@ -21,23 +24,116 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
+# Without a replica, read-only routes use get_db itself (and its overrides)
+get_read_db = db_session.get_read_db if settings.DATABASE_READ_URL else get_db
+
+def _verified_access_token(token: str) -> schemas.TokenPayload:
+    """Decode an access token and reject refresh tokens and revoked ids"""
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
+        token_data = schemas.TokenPayload(**security.decode_token(token))
     except (jwt.JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = crud.user.get(db, id=int(token_data.sub))
+    # Refresh tokens are only accepted by /login/refresh
+    if token_data.type not in (None, security.ACCESS_TOKEN_TYPE):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    if token_data.jti and revocation_list.is_token_revoked(token_data.jti):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+        )
+    return token_data
+
+def _revoked_since_cached(user_id: int, token_data: schemas.TokenPayload) -> bool:
+    """In-memory checks a cached principal must still pass on every request"""
+    return bool(
+        (token_data.jti and revocation_list.is_token_revoked(token_data.jti))
+        or revocation_list.is_user_revoked(user_id)
+        or revocation_list.is_version_stale(user_id, token_data.ver or 0)
+    )
+
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> schemas.User:
+    """
+    Resolve the bearer token to a schemas.User snapshot of the current user.
+    Recently verified tokens are answered from the principal cache, once they
+    pass the in-memory revocation checks; endpoints that modify the user must
+    load the row themselves.
+    """
+    cached = principal_cache.get(token)
+    if cached is not None:
+        snapshot, token_data = cached
+        if not _revoked_since_cached(snapshot.id, token_data):
+            return snapshot
+        # Revoked, blocked or re-roled on another worker: the full check below rejects or reloads it
+        principal_cache.discard(token)
+    token_data = _verified_access_token(token)
+    user_id = int(token_data.sub)
+    generation = principal_cache.generation(user_id)
+    user = crud.user.get(db, id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    snapshot = schemas.User.model_validate(user)
+    # End the read so the pooled connection isn't held while the request waits for the endpoint
+    db.rollback()
+    principal_cache.put(token, snapshot, token_data, generation)
+    return snapshot
+
+def get_token_principal(token: str = Depends(reusable_oauth2)) -> schemas.TokenPrincipal:
+    """
+    Caller id and roles from the signed claims of the access token; the user
+    is never loaded. Blocked or inactive users and revoked tokens are caught by
+    the in-memory revocation list, and a token issued before the user's last
+    role change (older `ver`) gets a 401 so the client refreshes it.
+    Only for endpoints that need nothing but the caller's id and roles.
+    """
+    token_data = _verified_access_token(token)
+    user_id = int(token_data.sub)
+    # Tokens issued before role claims existed carry no version
+    if token_data.ver is None or revocation_list.is_version_stale(user_id, token_data.ver):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token is out of date, refresh it",
+        )
+    if revocation_list.is_user_revoked(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive or blocked user",
+        )
+    return schemas.TokenPrincipal(
+        id=user_id,
+        role=token_data.role,
+        is_superuser=bool(token_data.is_superuser),
+        is_professor=bool(token_data.is_professor),
+    )
+
+def get_token_superuser(
+    principal: schemas.TokenPrincipal = Depends(get_token_principal),
+) -> schemas.TokenPrincipal:
+    """get_current_active_superuser from token claims"""
+    if not principal.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The user doesn't have enough privileges"
+        )
+    return principal
+
+def get_token_professor(
+    principal: schemas.TokenPrincipal = Depends(get_token_principal),
+) -> schemas.TokenPrincipal:
+    """get_current_active_professor from token claims"""
+    if not principal.is_professor and not principal.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The user doesn't have professor privileges"
+        )
+    return principal
 
 def get_current_active_user(
     current_user: models.User = Depends(get_current_user),
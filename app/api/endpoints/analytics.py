@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 import pandas as pd
@@ -6,12 +6,16 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 import io
 import datetime
-from typing import List
+from typing import List, Optional
 
 from app.api import deps
 from app.api.deps import get_db
-from app.models.user import User
+from app.schemas.token import TokenPrincipal
 from app.services.analytics import AnalyticsService
+from app.services.analytics_worker import analytics_worker
+from app.services.event_loop_monitor import event_loop_monitor
+from app.services.principal_cache import principal_cache
+from app.db.session import read_replica
 from app.crud import crud_feedback
 from app.schemas import feedback as feedback_schemas
 
@@ -20,8 +24,8 @@ router = APIRouter(tags=["analytics"])
 @router.get("/dashboard", response_model=dict)
 def get_dashboard_summary(
     group_id: str = None, # Future use: filter by group
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    db: Session = Depends(deps.get_read_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """
     Get dashboard metrics for admins.
@@ -33,8 +37,8 @@ def get_dashboard_summary(
 
 @router.get("/export/excel")
 def export_progress_excel(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    db: Session = Depends(deps.get_read_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """
     Export raw progress data to Excel (.xlsx).
@@ -61,8 +65,8 @@ def export_progress_excel(
 
 @router.get("/export/pdf")
 def export_progress_pdf(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    db: Session = Depends(deps.get_read_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """
     Export progress report to PDF.
@@ -122,7 +126,7 @@ def export_progress_pdf(
 def get_stage_analytics(
     stage_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """Get analytics for a specific stage"""
     return crud_feedback.get_stage_analytics(db, stage_id)
@@ -131,8 +135,58 @@ def get_stage_analytics(
 @router.get("/difficult-stages", response_model=List[feedback_schemas.StageAnalytics])
 def get_difficult_stages(
     limit: int = 5,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    db: Session = Depends(deps.get_read_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """Get list of most difficult stages based on student performance"""
     return crud_feedback.get_most_difficult_stages(db, limit)
+
+
+@router.post("/reconcile", response_model=dict, status_code=202)
+def reconcile_stage_analytics(
+    stage_id: Optional[List[int]] = Query(None, description="Stages to rebuild; every stage with attempts if omitted"),
+    db: Session = Depends(get_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
+):
+    """
+    Queue a rebuild of stage analytics from the attempts table.
+    Attempts update the counters incrementally; this repairs drift (manual
+    data fixes, imports) in the background worker.
+    """
+    if not analytics_worker.is_running:
+        raise HTTPException(status_code=503, detail="Analytics worker is not running")
+    stage_ids = stage_id or crud_feedback.get_stage_ids_with_attempts(db)
+    queued = sum(1 for sid in stage_ids if analytics_worker.mark_dirty(sid))
+    return {"queued": queued, "rejected": len(stage_ids) - queued}
+
+
+@router.get("/refresh-queue", response_model=dict)
+def get_refresh_queue_metrics(
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
+):
+    """Queue depth, lag and throughput of the background analytics refresh worker"""
+    return analytics_worker.metrics()
+
+
+@router.get("/principal-cache", response_model=dict)
+def get_principal_cache_metrics(
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
+):
+    """Size and hit/miss counters of the authenticated-user cache"""
+    return principal_cache.metrics()
+
+
+@router.get("/event-loop", response_model=dict)
+def get_event_loop_metrics(
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
+):
+    """Event-loop lag and per-route stall time of this worker"""
+    return event_loop_monitor.metrics()
+
+
+@router.get("/read-replica", response_model=dict)
+def get_read_replica_metrics(
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
+):
+    """Whether read-only routes are on the replica, and how often they fell back to the primary"""
+    return read_replica.metrics()
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 
+from app.core.pagination import CURSOR_DESCRIPTION
 from app.db.session import get_db
-from app.schemas.category import Category, CategoryCreate, CategoryUpdate, CategoryDetail, StageSummary
+from app.schemas.category import Category, CategoryCreate, CategoryUpdate, CategoryDetail, CategoryStudent, StageSummary
+from app.schemas.pagination import CursorPage
 from app.crud import crud_category
 from app.api import deps
 from app.models.user import User
+from app.schemas.token import TokenPrincipal
 
 router = APIRouter()
 
@@ -26,8 +29,8 @@ def read_categories(
     skip: int = 0, 
     limit: int = 100, 
     q: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_user)
+    db: Session = Depends(deps.get_read_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_principal)
 ):
     """
     Get all categories (simple list).
@@ -42,11 +45,11 @@ def list_categories_enhanced(
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=500, description="Maximum number of records to return"),
     search: Optional[str] = Query(None, description="Search by name or description"),
-    order_by: str = Query("name", pattern="^(name|created_at)$", description="Field to order by"),
+    order_by: str = Query("name", pattern="^(name|created_at|total_stages)$", description="Field to order by"),
     order_direction: str = Query("asc", pattern="^(asc|desc)$", description="Order direction"),
     detect_duplicates: bool = Query(False, description="Enable duplicate detection"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    db: Session = Depends(deps.get_read_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """
     Get enhanced category list with advanced features (Admin only).
@@ -54,7 +57,7 @@ def list_categories_enhanced(
     Features:
     - **Pagination**: Use skip and limit parameters
     - **Search**: Filter by name or description
-    - **Ordering**: Sort by name or created_at (asc/desc)
+    - **Ordering**: Sort by name, created_at or total_stages (asc/desc)
     - **Duplicate Detection**: Highlights similar category names (>70% similarity)
     
     Response includes:
@@ -90,7 +93,7 @@ def list_categories_enhanced(
 def read_category(
     category_id: int, 
     db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_user)
+    current_user: TokenPrincipal = Depends(deps.get_token_principal)
 ):
     db_category = crud_category.get_category(db, category_id=category_id)
     if db_category is None:
@@ -101,8 +104,8 @@ def read_category(
 @router.get("/{category_id}/detail", response_model=CategoryDetail)
 def read_category_detail(
     category_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    db: Session = Depends(deps.get_read_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """
     Get detailed information about a category including:
@@ -176,71 +179,44 @@ def delete_category(
     return crud_category.delete_category(db=db, db_category=db_category)
 
 
-@router.get("/{category_id}/students", response_model=List[dict])
+@router.get(
+    "/{category_id}/students",
+    response_model=Union[List[CategoryStudent], CursorPage[CategoryStudent]]
+)
 def get_category_students(
     category_id: int,
     search: Optional[str] = Query(None, description="Search students by name or email"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=500,
+        description="Maximum number of records to return (all when omitted; 100 per page with cursor)"
+    ),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    order_by: str = Query("email", pattern="^(email|progress)$", description="Field to order by"),
+    order_direction: str = Query("asc", pattern="^(asc|desc)$", description="Order direction"),
+    db: Session = Depends(deps.get_read_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """
     Get list of students who have accessed this category.
-    Supports search by name or email.
+    Supports search by name or email, ordering by email or progress
+    percentage, and keyset pagination with `cursor`. Without `limit` or
+    `cursor`, every matching student is returned.
     
     Returns student info with their progress in this category.
     """
-    from app.models.user import User
-    from app.models.stage import Stage, UserStageProgress
-    from sqlalchemy import and_, or_
-    
     # Verify category exists
     db_category = crud_category.get_category(db, category_id=category_id)
     if db_category is None:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    # Get unique students who have progress in this category
-    query = db.query(User).join(
-        UserStageProgress, UserStageProgress.user_id == User.id
-    ).join(
-        Stage, Stage.id == UserStageProgress.stage_id
-    ).filter(
-        Stage.category_id == category_id
-    ).distinct()
-    
-    # Apply search filter if provided
-    if search:
-        query = query.filter(
-            or_(
-                User.email.ilike(f"%{search}%"),
-                User.full_name.ilike(f"%{search}%")
-            )
+    if cursor is not None:
+        students, next_cursor = crud_category.get_category_students_page(
+            db, category_id, cursor, search=search, limit=limit or 100,
+            order_by=order_by, order_direction=order_direction
         )
-    
-    students = query.all()
-    
-    # Calculate progress for each student
-    result = []
-    total_stages = crud_category.get_category_metrics(db, category_id).total_stages
-    
-    for student in students:
-        # Get student's completed stages in this category
-        completed = db.query(UserStageProgress).join(Stage).filter(
-            and_(
-                UserStageProgress.user_id == student.id,
-                Stage.category_id == category_id,
-                UserStageProgress.is_completed == True
-            )
-        ).count()
-        
-        progress_percentage = (completed / total_stages * 100) if total_stages > 0 else 0
-        
-        result.append({
-            "id": student.id,
-            "email": student.email,
-            "full_name": student.full_name,
-            "completed_stages": completed,
-            "total_stages": total_stages,
-            "progress_percentage": round(progress_percentage, 2)
-        })
-    
-    return result
+        return {"items": students, "next_cursor": next_cursor}
+    return crud_category.get_category_students(
+        db, category_id, search=search, skip=skip, limit=limit,
+        order_by=order_by, order_direction=order_direction
+    )
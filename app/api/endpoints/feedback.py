@@ -1,19 +1,22 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api import deps
 from app.crud import crud_feedback, crud_stage
 from app.schemas import feedback as feedback_schemas
 from app.models.user import User
+from app.schemas.token import TokenPrincipal
 from app.core import media
+from app.services import grading
 
 router = APIRouter()
 
 # ================= Teacher Endpoints =================
 
 @router.post("/stages/{stage_id}/feedback", response_model=feedback_schemas.StageFeedback)
-async def create_feedback(
+def create_feedback(
     stage_id: int,
     feedback: feedback_schemas.StageFeedbackCreate,
     db: Session = Depends(deps.get_db),
@@ -28,12 +31,12 @@ async def create_feedback(
 
 
 @router.get("/stages/{stage_id}/feedback", response_model=List[feedback_schemas.StageFeedback])
-async def get_stage_feedback(
+def get_stage_feedback(
     stage_id: int,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """Get all feedback configured for a stage (Teacher only)"""
     stage = crud_stage.get_stage(db, stage_id)
@@ -44,7 +47,7 @@ async def get_stage_feedback(
 
 
 @router.put("/feedback/{feedback_id}", response_model=feedback_schemas.StageFeedback)
-async def update_feedback(
+def update_feedback(
     feedback_id: int,
     feedback_update: feedback_schemas.StageFeedbackUpdate,
     db: Session = Depends(deps.get_db),
@@ -58,7 +61,7 @@ async def update_feedback(
 
 
 @router.delete("/feedback/{feedback_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_feedback(
+def delete_feedback(
     feedback_id: int,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_superuser)
@@ -71,7 +74,7 @@ async def delete_feedback(
 
 
 @router.post("/feedback/{feedback_id}/media", response_model=feedback_schemas.StageFeedback)
-async def upload_feedback_media(
+def upload_feedback_media(
     feedback_id: int,
     file: UploadFile = File(...),
     media_type: str = Form(...),  # "image" or "audio"
@@ -113,24 +116,42 @@ async def preview_feedback(
 async def record_attempt(
     stage_id: int,
     attempt: feedback_schemas.StudentAttemptCreate,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
-    """Record a student attempt on a stage"""
+    """
+    Record a student attempt on a stage.
+    Stages with an interactive challenge are graded on the server: a
+    successful attempt on them must go through /stages/{stage_id}/grade.
+    """
+    return await db.run_sync(_record_attempt, stage_id, current_user.id, attempt)
+
+
+def _record_attempt(
+    db: Session, stage_id: int, user_id: int, attempt: feedback_schemas.StudentAttemptCreate
+) -> feedback_schemas.StudentAttempt:
     # Verify stage exists
     stage = crud_stage.get_stage(db, stage_id)
     if not stage:
         raise HTTPException(status_code=404, detail="Stage not found")
-        
-    return crud_feedback.create_attempt(db, current_user.id, attempt)
+    # The attempt is recorded against the stage in the path, not the one in the body
+    attempt = attempt.model_copy(update={"stage_id": stage_id})
+
+    if attempt.is_successful and grading.has_answer_key(db, stage):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"This stage is graded on the server; submit the answer to /stages/{stage_id}/grade"
+        )
+
+    return feedback_schemas.StudentAttempt.model_validate(crud_feedback.create_attempt(db, user_id, attempt))
 
 
 @router.get("/stages/{stage_id}/hints", response_model=List[feedback_schemas.StageFeedback])
 async def get_available_hints(
     stage_id: int,
     attempt_id: Optional[int] = None,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_user)
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_principal)
 ):
     """
     Get available hints for a stage.
@@ -139,21 +160,21 @@ async def get_available_hints(
     """
     # Simply return all active hints for the stage
     # The client/frontend will manage progressive disclosure based on attempt count
-    return crud_feedback.get_feedback_by_stage(db, stage_id)
+    return await db.run_sync(crud_feedback.get_feedback_by_stage, stage_id)
 
 
 @router.post("/attempts/{attempt_id}/view-hint/{feedback_id}", response_model=feedback_schemas.StudentFeedbackView)
 async def record_hint_view(
     attempt_id: int,
     feedback_id: int,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
     Record that a student viewed a specific hint.
     Enforces the max hints per attempt limit.
     """
-    result = crud_feedback.record_feedback_view(db, attempt_id, feedback_id)
+    result = await db.run_sync(_record_hint_view, attempt_id, feedback_id)
     
     if not result:
         # Check if it was limit reached or just invalid IDs
@@ -165,3 +186,8 @@ async def record_hint_view(
         )
         
     return result
+
+
+def _record_hint_view(db: Session, attempt_id: int, feedback_id: int) -> Optional[feedback_schemas.StudentFeedbackView]:
+    view = crud_feedback.record_feedback_view(db, attempt_id, feedback_id)
+    return feedback_schemas.StudentFeedbackView.model_validate(view) if view else None
@@ -1,25 +1,45 @@
 from datetime import timedelta
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import jwt
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
 from app.core import security
 from app.core.config import settings
+from app.services.principal_cache import principal_cache
 
 router = APIRouter()
 
+
+def token_response(user: models.User) -> dict:
+    """Access + refresh token pair returned by login and refresh"""
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return {
+        "access_token": security.create_access_token(
+            user.id, expires_delta=access_token_expires, claims=security.role_claims(user)
+        ),
+        "refresh_token": security.create_refresh_token(user.id),
+        "expires_in": int(access_token_expires.total_seconds()),
+        "token_type": "bearer",
+        "user_email": user.email,
+        "user_role": user.role,
+        "user_name": user.full_name,
+    }
+
+
 @router.post("/login/access-token", response_model=schemas.Token)
-def login_access_token(
+async def login_access_token(
     db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = crud.user.authenticate(
+    user = await crud.user.authenticate_async(
         db, email=form_data.username, password=form_data.password
     )
     if not user:
@@ -32,13 +52,74 @@ def login_access_token(
             detail=f"Account blocked: {user.block_reason}"
         )
         
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return {
-        "access_token": security.create_access_token(
-            user.id, expires_delta=access_token_expires
-        ),
-        "token_type": "bearer",
-        "user_email": user.email,
-        "user_role": user.role,
-        "user_name": user.full_name,
-    }
+    return token_response(user)
+
+
+@router.post("/login/refresh", response_model=schemas.Token)
+def refresh_access_token(
+    body: schemas.RefreshTokenRequest,
+    db: Session = Depends(deps.get_db),
+) -> Any:
+    """
+    Exchange a refresh token for a new access/refresh token pair.
+    Refresh tokens are single use: the presented one is revoked.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+    )
+    try:
+        token_data = schemas.TokenPayload(**security.decode_token(body.refresh_token))
+    except (jwt.JWTError, ValidationError):
+        raise invalid
+    if token_data.type != security.REFRESH_TOKEN_TYPE or not token_data.jti:
+        raise invalid
+
+    user = crud.user.get(db, id=int(token_data.sub))
+    if not user:
+        raise invalid
+    elif not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    elif user.is_blocked:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Account blocked: {user.block_reason}"
+        )
+
+    if not crud.crud_token.revoke_token(
+        db, token_data.jti, user.id, security.REFRESH_TOKEN_TYPE, token_data.exp
+    ):
+        raise invalid
+    return token_response(user)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    body: Optional[schemas.RefreshTokenRequest] = None,
+    token: str = Depends(deps.reusable_oauth2),
+    db: Session = Depends(deps.get_db),
+) -> None:
+    """
+    Revoke the current access token and, if given, the refresh token.
+    The refresh token is only revoked when it is one and belongs to the
+    same user, so a caller can't log anyone else out with a leaked token.
+    """
+    try:
+        access = schemas.TokenPayload(**security.decode_token(token))
+    except (jwt.JWTError, ValidationError):
+        return None
+    revoke = [(access, access.type or security.ACCESS_TOKEN_TYPE)]
+    if body:
+        try:
+            refresh = schemas.TokenPayload(**security.decode_token(body.refresh_token))
+        except (jwt.JWTError, ValidationError):
+            refresh = None
+        if refresh and refresh.type == security.REFRESH_TOKEN_TYPE and refresh.sub == access.sub:
+            revoke.append((refresh, security.REFRESH_TOKEN_TYPE))
+    for token_data, token_type in revoke:
+        if not token_data.jti:
+            continue
+        user_id = int(token_data.sub)
+        crud.crud_token.revoke_token(db, token_data.jti, user_id, token_type, token_data.exp)
+        principal_cache.invalidate(user_id)
+    return None
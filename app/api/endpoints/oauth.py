@@ -2,6 +2,7 @@ from datetime import timedelta
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import RedirectResponse
 from fastapi_sso.sso.google import GoogleSSO
 from fastapi_sso.sso.microsoft import MicrosoftSSO
@@ -26,6 +27,16 @@ microsoft_sso = MicrosoftSSO(
     scope=["openid", "email", "profile"],
 )
 
+def login_success_redirect(token: str, refresh_token: str) -> RedirectResponse:
+    """
+    Redirect to the frontend's login page with the token pair. The refresh
+    token goes in the fragment: browsers never send it to a server, so it
+    stays out of access logs, proxies and Referer headers.
+    """
+    return RedirectResponse(
+        f"{settings.FRONTEND_URL}/login/success?token={token}#refresh_token={refresh_token}"
+    )
+
 @router.get("/google/login")
 async def google_login(request: Request):
     """
@@ -47,7 +58,8 @@ async def google_callback(request: Request, db: Session = Depends(deps.get_db)):
     if not user_info:
         raise HTTPException(status_code=400, detail="Google authentication failed")
     
-    user = crud.user.get_or_create_oauth(
+    user = await run_in_threadpool(
+        crud.user.get_or_create_oauth,
         db,
         email=user_info.email,
         full_name=user_info.display_name or user_info.email,
@@ -63,11 +75,13 @@ async def google_callback(request: Request, db: Session = Depends(deps.get_db)):
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     token = security.create_access_token(
-        user.id, expires_delta=access_token_expires
+        user.id, expires_delta=access_token_expires, claims=security.role_claims(user)
     )
     
+    refresh_token = security.create_refresh_token(user.id)
+    
     # Redirect back to frontend with token
-    return RedirectResponse(f"{settings.FRONTEND_URL}/login/success?token={token}")
+    return login_success_redirect(token, refresh_token)
 
 @router.get("/microsoft/login")
 async def microsoft_login(request: Request):
@@ -90,7 +104,8 @@ async def microsoft_callback(request: Request, db: Session = Depends(deps.get_db
     if not user_info:
         raise HTTPException(status_code=400, detail="Microsoft authentication failed")
     
-    user = crud.user.get_or_create_oauth(
+    user = await run_in_threadpool(
+        crud.user.get_or_create_oauth,
         db,
         email=user_info.email,
         full_name=user_info.display_name or user_info.email,
@@ -106,8 +121,10 @@ async def microsoft_callback(request: Request, db: Session = Depends(deps.get_db
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     token = security.create_access_token(
-        user.id, expires_delta=access_token_expires
+        user.id, expires_delta=access_token_expires, claims=security.role_claims(user)
     )
     
+    refresh_token = security.create_refresh_token(user.id)
+    
     # Redirect back to frontend with token
-    return RedirectResponse(f"{settings.FRONTEND_URL}/login/success?token={token}")
+    return login_success_redirect(token, refresh_token)
@@ -1,71 +1,167 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api import deps
-from app.crud import crud_stage
+from app.crud import crud_category, crud_feedback, crud_stage
 from app.schemas import stage as stage_schemas
-from app.schemas.interactive import InteractiveConfig
+from app.schemas.pagination import CursorPage
+from app.schemas.interactive import InteractiveConfig, GradeRequest, BatchGradeRequest, GradeResult
+from app.schemas.feedback import StudentAttemptCreate
 from app.models.user import User
-from app.core import media
+from app.schemas.token import TokenPrincipal
+from app.core import http_cache, media
+from app.core.pagination import CURSOR_DESCRIPTION
+from app.services import grading
 
 router = APIRouter()
 
+FIELDS_DESCRIPTION = (
+    "Comma-separated stage fields to return (e.g. id,title,order), "
+    "or 'summary' for the lightweight StageSummary schema. Omit for full stages."
+)
 
-@router.get("/categories/{category_id}/stages", response_model=List[stage_schemas.Stage])
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Validate the `fields` query parameter; None means full stages"""
+    if not fields:
+        return None
+    if fields == "summary":
+        return list(crud_stage.STAGE_SUMMARY_FIELDS)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in crud_stage.STAGE_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown stage fields: {', '.join(unknown)}"
+        )
+    return list(dict.fromkeys(["id", *requested]))
+
+
+def _sparse_stage(stage, fields: List[str], summary: bool, **extra) -> dict:
+    """Serialize only the selected columns, so deferred ones are never loaded"""
+    if summary:
+        model = stage_schemas.StageSummaryWithProgress if extra else stage_schemas.StageSummary
+        return model.model_validate({**{field: getattr(stage, field) for field in fields}, **extra}).model_dump()
+    return {**{field: getattr(stage, field) for field in fields}, **extra}
+
+
+# Response shapes of the stage endpoints: full stages, `fields=summary` and
+# other `fields=` selections. Sparse responses are serialized directly (only
+# the selected keys), the unions document them in the OpenAPI schema.
+STAGE_RESPONSE = Union[stage_schemas.Stage, stage_schemas.StageSummary, stage_schemas.StagePartial]
+STAGE_LIST_RESPONSE = Union[
+    List[stage_schemas.Stage], CursorPage[stage_schemas.Stage],
+    List[stage_schemas.StageSummary], CursorPage[stage_schemas.StageSummary],
+    List[stage_schemas.StagePartial], CursorPage[stage_schemas.StagePartial]
+]
+STAGE_PROGRESS_RESPONSE = Union[
+    List[stage_schemas.StageWithProgress],
+    List[stage_schemas.StageSummaryWithProgress],
+    List[stage_schemas.StagePartialWithProgress]
+]
+
+
+@router.get("/categories/{category_id}/stages", response_model=STAGE_LIST_RESPONSE)
 async def get_category_stages(
     category_id: int,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_user)
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_principal)
 ):
     """
     Get all stages for a specific category.
     Students only see APPROVED stages.
     Admins see ALL stages in this category.
+
+    Responses carry an ETag and Last-Modified built from the category's stage
+    version; a matching If-None-Match gets a 304 without loading any stage.
+    With `fields`, only the requested columns are fetched and returned.
     """
+    selected = _parse_fields(fields)
     status_filter = "approved" if not current_user.is_superuser else None
-    stages = crud_stage.get_stages_by_category(db, category_id, skip, limit, status=status_filter)
-    return stages
 
+    headers = {}
+    version = await db.run_sync(crud_category.get_stage_version, category_id)
+    if version is not None:
+        stage_version, stages_updated_at = version
+        etag = http_cache.make_etag(
+            category_id, stage_version, status_filter or "all", skip, limit, cursor, fields or ""
+        )
+        if http_cache.is_not_modified(request, etag, stages_updated_at):
+            return http_cache.not_modified_response(etag, stages_updated_at)
+        headers = http_cache.cache_headers(etag, stages_updated_at)
+        response.headers.update(headers)
+
+    if cursor is not None:
+        stages, next_cursor = await db.run_sync(
+            crud_stage.get_stages_by_category_page, category_id, cursor, limit, status=status_filter, fields=selected
+        )
+    else:
+        stages = await db.run_sync(
+            crud_stage.get_stages_by_category, category_id, skip, limit, status=status_filter, fields=selected
+        )
+
+    if selected is not None:
+        stages = [_sparse_stage(stage, selected, fields == "summary") for stage in stages]
+    content = {"items": stages, "next_cursor": next_cursor} if cursor is not None else stages
+    if selected is None:
+        return content
+    return JSONResponse(content=jsonable_encoder(content), headers=headers)
 
-@router.get("/categories/{category_id}/stages/progress", response_model=List[stage_schemas.StageWithProgress])
+
+@router.get("/categories/{category_id}/stages/progress", response_model=STAGE_PROGRESS_RESPONSE)
 async def get_category_stages_with_progress(
     category_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_user)
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_principal)
 ):
     """
     Get all stages for a category with user progress information.
     Shows which stages are locked/unlocked and completed for the current user.
     
-    The first stage (order=1) is always unlocked.
+    The first approved stage is always unlocked.
     Subsequent stages are locked until the previous stage is completed.
     
     Students only see APPROVED stages.
+    With `fields`, only the requested columns are fetched and returned
+    alongside is_unlocked/is_completed.
     """
-    # Get all approved stages for the category
-    stages = crud_stage.get_stages_by_category(db, category_id, status="approved")
-    
-    if not stages:
-        return []
-    
-    # Initialize progress if user hasn't started this category yet
-    existing_progress = crud_stage.get_user_progress_by_category(db, current_user.id, category_id)
-    if not existing_progress:
-        crud_stage.initialize_user_progress_for_category(db, current_user.id, category_id)
-    
-    # Get user progress for all stages
-    progress_map = {}
-    user_progress = crud_stage.get_user_progress_by_category(db, current_user.id, category_id)
-    for progress in user_progress:
-        progress_map[progress.stage_id] = progress
+    selected = _parse_fields(fields)
+    content = await db.run_sync(_stages_with_progress, current_user.id, category_id, selected, fields == "summary")
+    if selected is not None:
+        return JSONResponse(content=jsonable_encoder(content))
+    return content
+
+
+def _stages_with_progress(
+    db: Session, user_id: int, category_id: int, selected: Optional[List[str]], summary: bool
+) -> list:
+    # Stages and progress come back in one query; missing progress is initialized on the way
+    rows = crud_stage.get_stages_with_progress(db, user_id, category_id, fields=selected)
+
+    if selected is not None:
+        return [
+            _sparse_stage(
+                stage, selected, summary,
+                is_unlocked=progress.is_unlocked if progress else False,
+                is_completed=progress.is_completed if progress else False
+            )
+            for stage, progress in rows
+        ]
     
     # Combine stage data with progress
     stages_with_progress = []
-    for stage in stages:
-        progress = progress_map.get(stage.id)
+    for stage, progress in rows:
         stage_data = stage_schemas.StageWithProgress(
             id=stage.id,
             category_id=stage.category_id,
@@ -89,24 +185,28 @@ async def get_category_stages_with_progress(
     return stages_with_progress
 
 
-@router.get("/stages/{stage_id}", response_model=stage_schemas.Stage)
+@router.get("/stages/{stage_id}", response_model=STAGE_RESPONSE)
 async def get_stage(
     stage_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_user)
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: TokenPrincipal = Depends(deps.get_token_principal)
 ):
     """Get a specific stage by ID"""
-    stage = crud_stage.get_stage(db, stage_id)
+    selected = _parse_fields(fields)
+    stage = await db.run_sync(crud_stage.get_stage, stage_id, fields=selected)
     if not stage:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Stage not found"
         )
+    if selected is not None:
+        return JSONResponse(content=jsonable_encoder(_sparse_stage(stage, selected, fields == "summary")))
     return stage
 
 
 @router.post("/stages", response_model=stage_schemas.Stage)
-async def create_stage(
+def create_stage(
     stage: stage_schemas.StageCreate,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_professor)
@@ -119,7 +219,7 @@ async def create_stage(
 
 
 @router.put("/stages/{stage_id}", response_model=stage_schemas.Stage)
-async def update_stage(
+def update_stage(
     stage_id: int,
     stage_update: stage_schemas.StageUpdate,
     db: Session = Depends(deps.get_db),
@@ -138,7 +238,7 @@ async def update_stage(
 
 
 @router.delete("/stages/{stage_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_stage(
+def delete_stage(
     stage_id: int,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_professor)
@@ -158,7 +258,7 @@ async def delete_stage(
 @router.post("/stages/{stage_id}/complete", response_model=stage_schemas.UserStageProgress)
 async def complete_stage(
     stage_id: int,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
@@ -169,6 +269,10 @@ async def complete_stage(
     - The stage must be unlocked for the user
     - The user must have successfully completed the challenge
     """
+    return await db.run_sync(_complete_stage, current_user.id, stage_id)
+
+
+def _complete_stage(db: Session, user_id: int, stage_id: int) -> stage_schemas.UserStageProgress:
     # Check if stage exists
     stage = crud_stage.get_stage(db, stage_id)
     if not stage:
@@ -178,7 +282,7 @@ async def complete_stage(
         )
     
     # Check if stage is unlocked for the user
-    user_progress = crud_stage.get_user_stage_progress(db, current_user.id, stage_id)
+    user_progress = crud_stage.get_stage_progress(db, user_id, stage)
     if not user_progress or not user_progress.is_unlocked:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -186,14 +290,14 @@ async def complete_stage(
         )
     
     # Mark stage as completed and unlock next stage
-    updated_progress = crud_stage.complete_stage(db, current_user.id, stage_id)
-    return updated_progress
+    updated_progress = crud_stage.complete_stage(db, user_id, stage_id)
+    return stage_schemas.UserStageProgress.model_validate(updated_progress)
 
 
 @router.post("/categories/{category_id}/initialize", response_model=List[stage_schemas.UserStageProgress])
 async def initialize_category_progress(
     category_id: int,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
@@ -202,29 +306,101 @@ async def initialize_category_progress(
     This is automatically called when accessing stages with progress,
     but can be manually triggered if needed.
     """
-    progress_list = crud_stage.initialize_user_progress_for_category(
-        db, current_user.id, category_id
-    )
-    return progress_list
+    return await db.run_sync(_initialize_category_progress, current_user.id, category_id)
+
+
+def _initialize_category_progress(db: Session, user_id: int, category_id: int) -> List[stage_schemas.UserStageProgress]:
+    progress_list = crud_stage.initialize_user_progress_for_category(db, user_id, category_id)
+    return [stage_schemas.UserStageProgress.model_validate(progress) for progress in progress_list]
+
+
+# ================= Grading Endpoints =================
+
+def _gradable_stage(db: Session, stage_id: int, current_user: User):
+    # interactive_config stays deferred: it is only loaded when the answer key must be compiled
+    stage = crud_stage.get_stage(db, stage_id, fields=["approval_status", "is_active"])
+    if not stage or not stage.is_active:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stage not found")
+    if stage.approval_status != "approved" and not (current_user.is_superuser or current_user.is_professor):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stage not found")
+    return stage
+
+
+@router.post("/stages/{stage_id}/grade", response_model=GradeResult)
+async def grade_stage_submission(
+    stage_id: int,
+    submission: GradeRequest,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    Grade an answer to the stage's interactive challenge on the server.
+    With record_attempt, the attempt is stored with the graded result
+    instead of a client-reported is_successful.
+    """
+    return await db.run_sync(_grade_submission, stage_id, submission, current_user)
+
+
+def _grade_submission(db: Session, stage_id: int, submission: GradeRequest, current_user: User) -> GradeResult:
+    stage = _gradable_stage(db, stage_id, current_user)
+    try:
+        result = grading.grade_submission(db, stage, submission)
+    except grading.GradingError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if submission.record_attempt:
+        attempt = crud_feedback.create_attempt(db, current_user.id, StudentAttemptCreate(
+            stage_id=stage_id,
+            is_successful=result.is_correct,
+            error_details=None if result.is_correct else {"incorrect_ids": result.incorrect_ids},
+            time_spent_seconds=submission.time_spent_seconds
+        ))
+        result.attempt_id = attempt.id
+    return result
+
+
+@router.post("/stages/{stage_id}/grade/batch", response_model=List[GradeResult])
+def grade_stage_submissions(
+    stage_id: int,
+    batch: BatchGradeRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_professor)
+):
+    """
+    Grade many answers to one stage at once (Professor/Admin).
+    Results come back in submission order; nothing is recorded.
+    """
+    stage = _gradable_stage(db, stage_id, current_user)
+    try:
+        return grading.grade_batch(db, stage, batch.submissions)
+    except grading.GradingError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 # ================= Admin Review Endpoints =================
 
-@router.get("/review/pending", response_model=List[stage_schemas.Stage])
-async def get_pending_review(
+@router.get(
+    "/review/pending",
+    response_model=Union[List[stage_schemas.Stage], CursorPage[stage_schemas.Stage]]
+)
+def get_pending_review(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_superuser)
+    current_user: TokenPrincipal = Depends(deps.get_token_superuser)
 ):
     """
     List all stages pending approval (Admin only).
     """
+    if cursor is not None:
+        stages, next_cursor = crud_stage.get_pending_stages_page(db, cursor, limit)
+        return {"items": stages, "next_cursor": next_cursor}
     return crud_stage.get_pending_stages(db, skip=skip, limit=limit)
 
 
 @router.post("/stages/{stage_id}/review", response_model=stage_schemas.Stage)
-async def review_stage(
+def review_stage(
     stage_id: int,
     review: stage_schemas.StageReview,
     db: Session = Depends(deps.get_db),
@@ -249,7 +425,7 @@ async def review_stage(
     
     return updated_stage
 @router.post("/stages/{stage_id}/interactive", response_model=stage_schemas.Stage)
-async def update_interactive_challenge(
+def update_interactive_challenge(
     stage_id: int,
     config: InteractiveConfig,
     db: Session = Depends(deps.get_db),
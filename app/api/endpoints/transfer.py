@@ -1,9 +1,11 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from app import crud, models, schemas
 from app.api import deps
+from app.core.pagination import CURSOR_DESCRIPTION
 from app.crud import crud_transfer
+from app.schemas.pagination import CursorPage
 from app.schemas.transfer import TransferRequest, TransferRequestCreate, NotificationBase
 
 router = APIRouter()
@@ -11,8 +13,8 @@ router = APIRouter()
 @router.get("/search-colleagues", response_model=List[schemas.User])
 def search_colleagues(
     q: str,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: Session = Depends(deps.get_read_db),
+    current_user: schemas.TokenPrincipal = Depends(deps.get_token_principal),
 ) -> Any:
     """
     Search for other professors by email or name.
@@ -47,7 +49,7 @@ def initiate_transfer(
 @router.get("/requests", response_model=List[TransferRequest])
 def list_transfer_requests(
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: schemas.TokenPrincipal = Depends(deps.get_token_principal),
 ) -> Any:
     """
     List pending transfer requests for the current user.
@@ -82,14 +84,18 @@ def reject_transfer(
         raise HTTPException(status_code=400, detail="Invalid request or already processed")
     return {"msg": "Transfer rejected"}
 
-@router.get("/notifications", response_model=List[NotificationBase])
+@router.get("/notifications", response_model=Union[List[NotificationBase], CursorPage[NotificationBase]])
 def get_notifications(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: schemas.TokenPrincipal = Depends(deps.get_token_principal),
 ) -> Any:
     """
     Get notifications for the current user.
     """
+    if cursor is not None:
+        notifications, next_cursor = crud_transfer.get_notifications_page(db, current_user.id, cursor, limit)
+        return {"items": notifications, "next_cursor": next_cursor}
     return crud_transfer.get_notifications(db, current_user.id, skip, limit)
@@ -1,11 +1,16 @@
-from typing import Any, List
+from typing import Any, List, Optional, Union
 
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.core import security
+from app.core.pagination import CURSOR_DESCRIPTION
+from app.services.principal_cache import principal_cache
+from app.services.revocation import revocation_list
 
 router = APIRouter()
 
@@ -21,21 +26,25 @@ def delete_me(
     crud.user.remove_completely(db, user_id=current_user.id)
     return current_user
 
-@router.get("/", response_model=List[schemas.User])
+@router.get("/", response_model=Union[List[schemas.User], schemas.CursorPage[schemas.User]])
 def read_users(
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_read_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     current_user: models.User = Depends(deps.get_current_superuser),
 ) -> Any:
     """
     Retrieve users.
     """
+    if cursor is not None:
+        users, next_cursor = crud.user.get_multi_page(db, cursor=cursor, limit=limit)
+        return {"items": users, "next_cursor": next_cursor}
     users = crud.user.get_multi(db, skip=skip, limit=limit)
     return users
 
 @router.post("/signup", response_model=schemas.User)
-def signup(
+async def signup(
     *,
     db: Session = Depends(deps.get_db),
     user_in: schemas.UserCreate,
@@ -43,7 +52,7 @@ def signup(
     """
     Public signup endpoint for new users.
     """
-    user = crud.user.get_by_email(db, email=user_in.email)
+    user = await run_in_threadpool(crud.user.get_by_email, db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
@@ -51,11 +60,13 @@ def signup(
         )
     # Ensure superuser flag cannot be set via public signup
     user_in.is_superuser = False
-    user = crud.user.create(db, obj_in=user_in)
+    # Argon2 runs on the hashing pool, not on a request thread
+    hashed_password = await security.get_password_hash_async(user_in.password)
+    user = await run_in_threadpool(crud.user.create, db, obj_in=user_in, hashed_password=hashed_password)
     return user
 
 @router.post("/", response_model=schemas.User)
-def create_user(
+async def create_user(
     *,
     db: Session = Depends(deps.get_db),
     user_in: schemas.UserCreate,
@@ -64,13 +75,14 @@ def create_user(
     """
     Create new user.
     """
-    user = crud.user.get_by_email(db, email=user_in.email)
+    user = await run_in_threadpool(crud.user.get_by_email, db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this username already exists in the system",
         )
-    user = crud.user.create(db, obj_in=user_in)
+    hashed_password = await security.get_password_hash_async(user_in.password)
+    user = await run_in_threadpool(crud.user.create, db, obj_in=user_in, hashed_password=hashed_password)
     return user
 
 @router.post("/{user_id}/block", response_model=schemas.User)
@@ -116,19 +128,24 @@ def deactivate_me(
     
     # Archive topics if professor
     if current_user.is_professor:
+        crud.crud_category.bump_stage_version_for_professor(db, current_user.id)
         db.query(models.Stage).filter(models.Stage.professor_id == current_user.id).update(
             {models.Stage.is_archived: True}
         )
     
-    current_user.is_active = False
-    db.add(current_user)
+    # current_user may be a cached snapshot; update the row itself
+    user = crud.user.get(db, id=current_user.id)
+    user.is_active = False
+    db.add(user)
     db.commit()
-    db.refresh(current_user)
+    db.refresh(user)
+    principal_cache.invalidate(user.id)
+    revocation_list.revoke_user(user.id)
     
     # Audit log
-    crud.user.block_user(db, db_obj=current_user, reason="Self-deactivation", admin_id=current_user.id)
+    crud.user.block_user(db, db_obj=user, reason="Self-deactivation", admin_id=user.id)
     
-    return current_user
+    return user
 
 @router.delete("/{user_id}", response_model=schemas.User)
 def delete_user(
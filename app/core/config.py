@@ -1,10 +1,86 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "EduPractica API"
     DATABASE_URL: str = "sqlite:///./sql_app.db"
+    # Engine behind AsyncSession (get_async_db). Defaults to DATABASE_URL with
+    # its async driver: aiosqlite for SQLite, asyncpg for PostgreSQL (pip install asyncpg).
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Optional read replica for read-only routes (dashboards, exports, listings).
+    # If it can't be reached, those routes use the primary and the replica is
+    # retried after DATABASE_READ_RETRY_SECONDS.
+    DATABASE_READ_URL: Optional[str] = None
+    DATABASE_READ_RETRY_SECONDS: float = 30.0
+    # Apply pending schema migrations on startup (app/db/migrations.py). With
+    # several workers, turn it off and run `python migrate.py` before a deploy.
+    SCHEMA_AUTO_MIGRATE: bool = True
+    # File-based SQLite: WAL, synchronous=NORMAL and the pragmas below on every
+    # connection. Reads use a pool of reader connections; writes go through a
+    # single writer connection and queue for up to SQLITE_WRITER_TIMEOUT_SECONDS.
+    SQLITE_PERFORMANCE_PROFILE: bool = True
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_READER_POOL_SIZE: int = 8
+    SQLITE_READER_MAX_OVERFLOW: int = 8
+    SQLITE_WRITER_TIMEOUT_SECONDS: float = 30.0
     SECRET_KEY: str = "INSECURE_SECRET_KEY_FOR_DEV_ONLY" # Change in production
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8 # 8 days
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8 # 8 days
+    # Revoked tokens/users are checked in memory, reloaded by a background thread this often;
+    # other workers' revocations show up after it
+    REVOCATION_RELOAD_SECONDS: float = 30.0
+
+    # Argon2 runs on a dedicated pool (see security.PasswordHasherPool).
+    # Each hash uses ARGON2_MEMORY_COST KiB (passlib default 64 MiB), so size
+    # the pool for memory as well as CPU. Unset Argon2 costs keep passlib's defaults.
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    ARGON2_TIME_COST: Optional[int] = None
+    ARGON2_MEMORY_COST: Optional[int] = None
+    ARGON2_PARALLELISM: Optional[int] = None
+
+    # Background stage analytics reconciliation (rebuilds queued by POST /api/analytics/reconcile)
+    ANALYTICS_REFRESH_DEBOUNCE_SECONDS: float = 5.0
+    ANALYTICS_REFRESH_MAX_PENDING: int = 1000
+
+    # Event-loop lag ticker; requests that waited longer than the threshold on a
+    # blocked loop are logged. Lag only counts from when the pending tick was due,
+    # so a stall can read up to one interval short. An interval of 0 disables it.
+    EVENT_LOOP_MONITOR_INTERVAL_SECONDS: float = 0.1
+    EVENT_LOOP_STALL_THRESHOLD_SECONDS: float = 0.1
+
+    # Per-request SQL statement count and time (Server-Timing header). Requests
+    # repeating one statement more than the threshold are logged as possible N+1.
+    QUERY_COUNTER_ENABLED: bool = True
+    QUERY_REPEAT_THRESHOLD: int = 10
+
+    # Prometheus text metrics at /metrics: per-route request counts, latency and
+    # sizes, database pool checkout wait and cache hit rates
+    METRICS_ENABLED: bool = True
+
+    # In-memory stage sequence cache (next/previous stage lookups)
+    STAGE_SEQUENCE_CACHE_TTL_SECONDS: float = 60.0
+
+    # In-memory CategoryMetrics cache (/categories/{id}/detail); writes in this
+    # process invalidate it, the TTL bounds staleness from other workers
+    CATEGORY_METRICS_CACHE_TTL_SECONDS: float = 60.0
+
+    # Verified token -> user snapshot cache used by get_current_user.
+    # Keep the TTL short: other workers only drop blocked users on expiry.
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0
+    PRINCIPAL_CACHE_SIZE: int = 10000
+
+    # Compiled answer keys for server-side grading (stages kept in memory)
+    ANSWER_KEY_CACHE_SIZE: int = 1024
+
+    # Student progress store: "rows" (one row per user and stage) or
+    # "compact" (one row per user and category, see UserCategoryProgress; it
+    # tracks stage order, so keep orders unique within a category).
+    PROGRESS_STORE: str = "rows"
 
     # OAuth Settings
     GOOGLE_CLIENT_ID: str = ""
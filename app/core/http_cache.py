@@ -0,0 +1,54 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag derived from the given version parts"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive UTC timestamps
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {
+        "ETag": etag,
+        # Responses depend on the caller, so only the client may cache them and must revalidate
+        "Cache-Control": "private, no-cache",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the current version"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: ignore the W/ prefix on both sides
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+    return False
+
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag, last_modified))
@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_, select
+
+CURSOR_DESCRIPTION = (
+    "Opaque cursor for keyset pagination. Pass an empty value for the first page, "
+    "then the next_cursor of the previous page. Switches the response to {items, next_cursor}; "
+    "skip is ignored."
+)
+
+
+def encode_cursor(row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": row_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """Id of the last row of the previous page; None for the first page"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        row_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+        if not isinstance(row_id, int):
+            raise ValueError(row_id)
+        return row_id
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def keyset_page(
+    query,
+    id_column,
+    cursor: str,
+    limit: int,
+    sort_column=None,
+    descending: bool = False,
+    anchor: Optional[Callable[[int], Any]] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of `query` ordered by (sort_column, id_column) after `cursor`.
+
+    The cursor only carries the id of the last row; the sort value is read
+    back from that row inside the WHERE clause, so comparisons are made
+    between database values (SQLite stores server-default timestamps in a
+    different text format than bound datetimes). When sort_column is an
+    aggregate of a grouped query, `anchor(after_id)` must build its value for
+    the cursor's row, and the condition goes in HAVING.
+    Returns the page and the next cursor, or None on the last page.
+    """
+    after_id = decode_cursor(cursor)
+    if after_id is not None:
+        after = (lambda column, value: column < value) if descending else (lambda column, value: column > value)
+        if sort_column is None:
+            query = query.filter(after(id_column, after_id))
+        else:
+            if anchor is None:
+                value, restrict = select(sort_column).where(id_column == after_id).scalar_subquery(), query.filter
+            else:
+                value, restrict = anchor(after_id), query.having
+            query = restrict(
+                or_(after(sort_column, value), and_(sort_column == value, after(id_column, after_id)))
+            )
+
+    order = [column.desc() if descending else column for column in (sort_column, id_column) if column is not None]
+    # One extra row tells whether there is a next page
+    rows = query.order_by(*order).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], id_column.key))
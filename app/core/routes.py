@@ -0,0 +1,7 @@
+def route_template(scope) -> str:
+    """Path template of the route matched for a request, e.g. /api/stages/{stage_id}"""
+    # Routers included lazily keep their prefix in the effective route context
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    return getattr(scope.get("route"), "path", None) or "unmatched"
@@ -1,28 +1,179 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Callable, Optional, Union
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+
+def make_password_context(
+    time_cost: Optional[int] = None,
+    memory_cost: Optional[int] = None,
+    parallelism: Optional[int] = None
+) -> CryptContext:
+    """Argon2 context; unset parameters keep the passlib defaults"""
+    options = {
+        "argon2__rounds": time_cost,
+        "argon2__memory_cost": memory_cost,
+        "argon2__parallelism": parallelism,
+    }
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        **{key: value for key, value in options.items() if value is not None}
+    )
+
+
+pwd_context = make_password_context(
+    settings.ARGON2_TIME_COST, settings.ARGON2_MEMORY_COST, settings.ARGON2_PARALLELISM
+)
+
+
+class PasswordHashingBusy(Exception):
+    """Too many password hashes queued, or one waited longer than the queue timeout"""
+
+
+class PasswordHasherPool:
+    """
+    Runs Argon2 on a small dedicated thread pool.
+
+    argon2-cffi releases the GIL while hashing, so threads hash in parallel
+    without tying up the request threadpool. At most `max_pending` hashes
+    may be queued or running; a hash that waited longer than `queue_timeout`
+    seconds is dropped before it starts. Both cases raise PasswordHashingBusy.
+    The threads start with the first hash and stop on shutdown().
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, queue_timeout: float = 5.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def submit(self, fn: Callable, *args) -> Future:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHashingBusy("Too many password hashes in progress")
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="argon2")
+            executor = self._executor
+        try:
+            return executor.submit(self._run, time.monotonic(), fn, *args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    def run(self, fn: Callable, *args):
+        """Run on the pool and wait for the result (for sync callers)"""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable, *args):
+        """Run on the pool without blocking the event loop or a threadpool slot"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def metrics(self) -> dict:
+        with self._lock:
+            pending = self._pending
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self) -> None:
+        """Finish queued hashes and stop the threads; the next hash starts new ones"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, submitted_at: float, fn: Callable, *args):
+        try:
+            if time.monotonic() - submitted_at > self.queue_timeout:
+                with self._lock:
+                    self.timed_out += 1
+                raise PasswordHashingBusy("Password hashing queue timeout")
+            result = fn(*args)
+            with self._lock:
+                self.completed += 1
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+password_hasher = PasswordHasherPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS,
+)
 
 ALGORITHM = "HS256"
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
+def _create_token(
+    subject: Union[str, Any], token_type: str, expires_delta: timedelta, claims: Optional[dict] = None
+) -> str:
+    to_encode = {
+        **(claims or {}),
+        "exp": datetime.utcnow() + expires_delta,
+        "sub": str(subject),
+        "jti": uuid.uuid4().hex,
+        "type": token_type,
+    }
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+def role_claims(user) -> dict:
+    """Signed role claims for an access token; `ver` is the user's token_version when issued"""
+    return {
+        "role": user.role,
+        "is_superuser": bool(user.is_superuser),
+        "is_professor": bool(user.is_professor),
+        "ver": user.token_version or 0,
+    }
 
 def create_access_token(
+    subject: Union[str, Any], expires_delta: timedelta = None, claims: Optional[dict] = None
+) -> str:
+    if not expires_delta:
+        expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return _create_token(subject, ACCESS_TOKEN_TYPE, expires_delta, claims)
+
+def create_refresh_token(
     subject: Union[str, Any], expires_delta: timedelta = None
 ) -> str:
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-        )
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    if not expires_delta:
+        expires_delta = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+    return _create_token(subject, REFRESH_TOKEN_TYPE, expires_delta)
+
+def decode_token(token: str) -> dict:
+    """Verify signature and expiry; raises jose.JWTError"""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.run(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.run(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run_async(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run_async(pwd_context.hash, password)
@@ -1,3 +1,3 @@
 from .crud_user import user
 from . import crud_stage, crud_category, crud_transfer
-from . import crud_feedback
+from . import crud_feedback, crud_progress, crud_token
@@ -1,9 +1,14 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, and_, or_, select, case
+from app.core.config import settings
+from app.core.pagination import keyset_page
 from app.models.category import Category
-from app.models.stage import Stage, UserStageProgress
+from app.models.stage import Stage, UserCategoryProgress, UserStageProgress
+from app.models.user import User
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryMetrics
+from app.services.category_metrics import category_metrics
 from typing import List, Optional, Tuple
+from datetime import datetime
 from difflib import SequenceMatcher
 
 def get_category(db: Session, category_id: int):
@@ -64,11 +69,14 @@ def get_categories_enhanced(
         order_column = Category.created_at
     elif order_by == "name":
         order_column = Category.name
+    elif order_by == "total_stages":
+        order_column = Category.active_stage_count
     
+    # id breaks ties so pages don't overlap
     if order_direction.lower() == "desc":
-        query = query.order_by(order_column.desc())
+        query = query.order_by(order_column.desc(), Category.id.desc())
     else:
-        query = query.order_by(order_column.asc())
+        query = query.order_by(order_column.asc(), Category.id.asc())
     
     # Apply pagination
     categories = query.offset(skip).limit(limit).all()
@@ -78,11 +86,6 @@ def get_categories_enhanced(
     all_category_names = [c.name for c in db.query(Category).all()] if detect_duplicates else []
     
     for category in categories:
-        # Count stages
-        stage_count = db.query(func.count(Stage.id)).filter(
-            and_(Stage.category_id == category.id, Stage.is_active == True)
-        ).scalar() or 0
-        
         # Calculate similarity if duplicate detection is enabled
         similarity_score = None
         if detect_duplicates:
@@ -103,7 +106,7 @@ def get_categories_enhanced(
             "description": category.description,
             "icon": category.icon,
             "created_at": category.created_at,
-            "total_stages": stage_count,
+            "total_stages": category.active_stage_count,
             "similarity_score": similarity_score
         })
     
@@ -140,9 +143,86 @@ def update_category(db: Session, db_category: Category, category: CategoryUpdate
 def delete_category(db: Session, db_category: Category):
     db.delete(db_category)
     db.commit()
+    category_metrics.invalidate(db_category.id)
     return db_category
 
 
+def _join_progress(query, category_id: int):
+    """
+    Join each student's (User) progress in a category to `query`, read from
+    the active progress store; the caller groups by student and counts
+    completed stages with _completed_stages().
+
+    Rows store: one joined Stage per progress row. Compact store: the
+    approved active stages up to the student's highest completed order,
+    outer joined so students who completed nothing still show up.
+    """
+    if settings.PROGRESS_STORE == "compact":
+        return query.join(
+            UserCategoryProgress,
+            and_(UserCategoryProgress.user_id == User.id, UserCategoryProgress.category_id == category_id)
+        ).outerjoin(
+            Stage,
+            and_(
+                Stage.category_id == category_id,
+                Stage.is_active == True,
+                Stage.approval_status == "approved",
+                Stage.order <= UserCategoryProgress.highest_completed_order
+            )
+        )
+    return query.join(
+        UserStageProgress, UserStageProgress.user_id == User.id
+    ).join(
+        Stage, and_(Stage.id == UserStageProgress.stage_id, Stage.category_id == category_id)
+    )
+
+
+def _completed_stages():
+    """Completed active stages of a student, over the rows joined by _join_progress"""
+    if settings.PROGRESS_STORE == "compact":
+        return func.count(Stage.id)
+    return func.count(case((and_(UserStageProgress.is_completed == True, Stage.is_active == True), 1)))
+
+
+def _active_stage_count(category_id: int):
+    stage = aliased(Stage)
+    return select(func.count(stage.id)).where(
+        stage.category_id == category_id, stage.is_active == True
+    ).scalar_subquery()
+
+
+def _compute_category_metrics(db: Session, category_id: int) -> CategoryMetrics:
+    """CategoryMetrics from a single aggregate over per-student completed stage counts"""
+    per_student = (
+        _join_progress(select(User.id.label("user_id"), _completed_stages().label("completed")), category_id)
+        .group_by(User.id)
+        .subquery()
+    )
+    total_stages = _active_stage_count(category_id)
+    row = db.execute(
+        select(
+            total_stages,
+            func.count(per_student.c.user_id),
+            func.count(case((per_student.c.completed == total_stages, 1))),
+            func.avg(per_student.c.completed)
+        )
+    ).one()
+    total_stages, total_students, students_completed, average_completed = row
+
+    if not total_stages:
+        return CategoryMetrics(total_stages=0, total_students=0, completion_rate=0.0, average_progress=0.0)
+    if not total_students:
+        return CategoryMetrics(
+            total_stages=total_stages, total_students=0, completion_rate=0.0, average_progress=0.0
+        )
+    return CategoryMetrics(
+        total_stages=total_stages,
+        total_students=total_students,
+        completion_rate=round(students_completed / total_students * 100, 2),
+        average_progress=round(float(average_completed) / total_stages * 100, 2)
+    )
+
+
 def get_category_metrics(db: Session, category_id: int) -> CategoryMetrics:
     """
     Calculate metrics for a specific category:
@@ -150,70 +230,148 @@ def get_category_metrics(db: Session, category_id: int) -> CategoryMetrics:
     - Total unique students who accessed the category
     - Completion rate (% of students who completed all stages)
     - Average progress across all students
+
+    Cached per category; stage and progress writes invalidate the entry.
     """
-    # Get total stages in category
-    total_stages = db.query(func.count(Stage.id)).filter(
-        and_(Stage.category_id == category_id, Stage.is_active == True)
-    ).scalar() or 0
-    
-    if total_stages == 0:
-        return CategoryMetrics(
-            total_stages=0,
-            total_students=0,
-            completion_rate=0.0,
-            average_progress=0.0
-        )
-    
-    # Get all unique students who have progress in this category
-    students_with_progress = db.query(
-        UserStageProgress.user_id
-    ).join(Stage).filter(
-        Stage.category_id == category_id
-    ).distinct().all()
-    
-    total_students = len(students_with_progress)
-    
-    if total_students == 0:
-        return CategoryMetrics(
-            total_stages=total_stages,
-            total_students=0,
-            completion_rate=0.0,
-            average_progress=0.0
-        )
-    
-    # Calculate completion rate and average progress
-    students_completed = 0
-    total_progress_sum = 0.0
-    
-    for (student_id,) in students_with_progress:
-        # Get student's progress for all stages in this category
-        student_progress = db.query(UserStageProgress).join(Stage).filter(
-            and_(
-                UserStageProgress.user_id == student_id,
-                Stage.category_id == category_id,
-                Stage.is_active == True
+    return category_metrics.get(category_id, lambda: _compute_category_metrics(db, category_id))
+
+
+def _category_students_query(db: Session, category_id: int, search: Optional[str]):
+    """One row per student with progress in the category, with their completed and total stage counts"""
+    query = _join_progress(db.query(
+        User.id, User.email, User.full_name,
+        _completed_stages().label("completed_stages"),
+        _active_stage_count(category_id).label("total_stages")
+    ), category_id).group_by(User.id, User.email, User.full_name)
+    if search:
+        query = query.filter(or_(User.email.ilike(f"%{search}%"), User.full_name.ilike(f"%{search}%")))
+    return query
+
+
+def _student_row(row) -> dict:
+    progress = row.completed_stages / row.total_stages * 100 if row.total_stages else 0
+    return {
+        "id": row.id,
+        "email": row.email,
+        "full_name": row.full_name,
+        "completed_stages": row.completed_stages,
+        "total_stages": row.total_stages,
+        "progress_percentage": round(progress, 2)
+    }
+
+
+def _student_sort_column(order_by: str):
+    # total_stages is the same for every row, so completed stages sort like progress
+    return _completed_stages() if order_by == "progress" else User.email
+
+
+def get_category_students(
+    db: Session,
+    category_id: int,
+    search: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    order_by: str = "email",
+    order_direction: str = "asc"
+) -> List[dict]:
+    """
+    Students with progress in a category and their completion, in a single
+    grouped query. `limit=None` returns every student after `skip`.
+    """
+    sort_column = _student_sort_column(order_by)
+    order = [sort_column, User.id] if order_direction == "asc" else [sort_column.desc(), User.id.desc()]
+    rows = _category_students_query(db, category_id, search).order_by(*order).offset(skip).limit(limit).all()
+    return [_student_row(row) for row in rows]
+
+
+def get_category_students_page(
+    db: Session,
+    category_id: int,
+    cursor: str,
+    search: Optional[str] = None,
+    limit: int = 100,
+    order_by: str = "email",
+    order_direction: str = "asc"
+) -> Tuple[List[dict], Optional[str]]:
+    """Keyset-paginated get_category_students"""
+    anchor = None
+    if order_by == "progress":
+        def anchor(user_id: int):
+            # Completed stages of the cursor's student, compared in HAVING; not
+            # correlated, since the outer query joins the same tables
+            return (
+                _join_progress(select(_completed_stages()).select_from(User), category_id)
+                .where(User.id == user_id)
+                .correlate(None)
+                .scalar_subquery()
             )
-        ).all()
-        
-        completed_stages = sum(1 for p in student_progress if p.is_completed)
-        student_percentage = (completed_stages / total_stages) * 100 if total_stages > 0 else 0
-        total_progress_sum += student_percentage
-        
-        # Check if student completed all stages
-        if completed_stages == total_stages:
-            students_completed += 1
-    
-    completion_rate = (students_completed / total_students) * 100 if total_students > 0 else 0.0
-    average_progress = total_progress_sum / total_students if total_students > 0 else 0.0
-    
-    return CategoryMetrics(
-        total_stages=total_stages,
-        total_students=total_students,
-        completion_rate=round(completion_rate, 2),
-        average_progress=round(average_progress, 2)
+    rows, next_cursor = keyset_page(
+        _category_students_query(db, category_id, search), User.id, cursor, limit,
+        sort_column=_student_sort_column(order_by), descending=order_direction == "desc", anchor=anchor
+    )
+    return [_student_row(row) for row in rows], next_cursor
+
+
+def bump_stage_version(db: Session, *category_ids: Optional[int]) -> None:
+    """
+    Mark the stages of these categories as changed (ETag/Last-Modified of stage listings).
+    Runs in the caller's transaction; does not commit.
+    """
+    ids = {category_id for category_id in category_ids if category_id is not None}
+    if not ids:
+        return
+    db.query(Category).filter(Category.id.in_(ids)).update(
+        {
+            Category.stage_version: Category.stage_version + 1,
+            Category.stages_updated_at: func.now()
+        },
+        synchronize_session=False
+    )
+    refresh_active_stage_count(db, *ids)
+
+
+def refresh_active_stage_count(db: Session, *category_ids: int) -> None:
+    """
+    Recount the active stages of these categories into active_stage_count.
+    Does not commit. Called after the version bump has locked the category
+    rows, so on PostgreSQL this statement's snapshot already includes the
+    stages of any concurrent writer that held the lock before us.
+    """
+    db.flush()
+    stage = aliased(Stage)
+    db.query(Category).filter(Category.id.in_(category_ids)).update(
+        {
+            Category.active_stage_count: select(func.count(stage.id)).where(
+                stage.category_id == Category.id, stage.is_active == True
+            ).scalar_subquery()
+        },
+        synchronize_session=False
+    )
+
+
+def bump_stage_version_for_professor(db: Session, professor_id: int) -> None:
+    """Mark every category containing stages owned by a professor as changed. Does not commit."""
+    category_ids = db.query(Stage.category_id).filter(Stage.professor_id == professor_id).distinct()
+    db.query(Category).filter(Category.id.in_(category_ids.scalar_subquery())).update(
+        {
+            Category.stage_version: Category.stage_version + 1,
+            Category.stages_updated_at: func.now()
+        },
+        synchronize_session=False
     )
 
 
+def get_stage_version(db: Session, category_id: int) -> Optional[Tuple[int, Optional[datetime]]]:
+    """
+    Current (stage_version, stages_updated_at) of a category, or None if it doesn't exist.
+    Reads two columns by primary key without loading any ORM objects.
+    """
+    row = db.execute(
+        select(Category.stage_version, Category.stages_updated_at).where(Category.id == category_id)
+    ).first()
+    return (row[0], row[1]) if row else None
+
+
 def get_category_stages(db: Session, category_id: int):
     """Get all stages for a category ordered by sequence"""
     return db.query(Stage).filter(
@@ -121,17 +121,17 @@ def create_attempt(
     )
     
     db.add(db_attempt)
-    db.commit()
-    db.refresh(db_attempt)
-    
-    # If successful, update user progress
+
+    # Fold the attempt into the stage analytics in the same transaction
+    _apply_attempt_to_analytics(db, db_attempt)
+
+    # If successful, update user progress as part of the same transaction
     if attempt.is_successful:
         from app.crud import crud_stage
-        crud_stage.complete_stage(db, user_id, attempt.stage_id)
+        crud_stage.complete_stage(db, user_id, attempt.stage_id, commit=False)
 
-    # Update analytics asynchronously (or synchronously for simplicity here)
-    update_stage_analytics(db, attempt.stage_id)
-    
+    db.commit()
+    db.refresh(db_attempt)
     return db_attempt
 
 
@@ -194,7 +194,8 @@ def record_feedback_view(
     
     # Update attempt counter
     attempt.hints_viewed += 1
-    
+    _apply_hint_view_to_analytics(db, attempt.stage_id, attempt.hints_viewed)
+
     db.commit()
     db.refresh(view)
     return view
@@ -202,53 +203,182 @@ def record_feedback_view(
 
 # ============= Analytics CRUD =============
 
+def _apply_attempt_to_analytics(db: Session, attempt: StudentAttempt) -> None:
+    """
+    Add a single attempt to the running totals of its stage.
+    Runs as one upsert against the current row values, backed by the unique
+    stage_id, so concurrent attempts (including the first ones on a stage)
+    neither overwrite each other nor collide. The caller is responsible for
+    committing.
+    """
+    success = 1 if attempt.is_successful else 0
+    hints = attempt.hints_viewed or 0
+    timed = attempt.time_spent_seconds is not None
+    new_total = StageAnalytics.total_attempts + 1
+    new_successful = StageAnalytics.successful_attempts + success
+    new_hints_sum = StageAnalytics.hints_sum + hints
+
+    values = {
+        StageAnalytics.total_attempts: new_total,
+        StageAnalytics.successful_attempts: new_successful,
+        StageAnalytics.failed_attempts: StageAnalytics.failed_attempts + (1 - success),
+        StageAnalytics.success_rate: new_successful * 100.0 / new_total,
+        StageAnalytics.hints_sum: new_hints_sum,
+        StageAnalytics.avg_hints_used: new_hints_sum * 1.0 / new_total,
+        StageAnalytics.max_hints_used: case(
+            (StageAnalytics.max_hints_used < hints, hints),
+            else_=StageAnalytics.max_hints_used
+        ),
+    }
+    if timed:
+        new_time_sum = StageAnalytics.time_sum + attempt.time_spent_seconds
+        new_timed = StageAnalytics.timed_attempts + 1
+        values[StageAnalytics.time_sum] = new_time_sum
+        values[StageAnalytics.timed_attempts] = new_timed
+        values[StageAnalytics.avg_time_seconds] = new_time_sum * 1.0 / new_timed
+
+    # Row for the first attempt on this stage
+    first = dict(
+        stage_id=attempt.stage_id,
+        total_attempts=1,
+        successful_attempts=success,
+        failed_attempts=1 - success,
+        success_rate=success * 100.0,
+        hints_sum=hints,
+        avg_hints_used=float(hints),
+        max_hints_used=hints,
+        time_sum=attempt.time_spent_seconds if timed else 0,
+        timed_attempts=1 if timed else 0,
+        avg_time_seconds=float(attempt.time_spent_seconds) if timed else 0.0
+    )
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        # Generic fallback: update-then-insert inside the caller's transaction
+        updated = (
+            db.query(StageAnalytics)
+            .filter(StageAnalytics.stage_id == attempt.stage_id)
+            .update(values, synchronize_session=False)
+        )
+        if not updated:
+            db.add(StageAnalytics(**first))
+            db.flush()
+        return
+
+    update = {column.key: value for column, value in values.items()}
+    update["last_updated"] = func.now()
+    stmt = dialect_insert(StageAnalytics).values(**first)
+    db.execute(stmt.on_conflict_do_update(index_elements=["stage_id"], set_=update))
+
+
+def _apply_hint_view_to_analytics(db: Session, stage_id: int, hints_viewed: int) -> None:
+    """Account for one more hint viewed on an already recorded attempt"""
+    new_hints_sum = StageAnalytics.hints_sum + 1
+    (
+        db.query(StageAnalytics)
+        .filter(StageAnalytics.stage_id == stage_id, StageAnalytics.total_attempts > 0)
+        .update({
+            StageAnalytics.hints_sum: new_hints_sum,
+            StageAnalytics.avg_hints_used: new_hints_sum * 1.0 / StageAnalytics.total_attempts,
+            StageAnalytics.max_hints_used: case(
+                (StageAnalytics.max_hints_used < hints_viewed, hints_viewed),
+                else_=StageAnalytics.max_hints_used
+            ),
+        }, synchronize_session=False)
+    )
+
+
+def _lock_analytics_row(db: Session, stage_id: int) -> None:
+    """
+    Take the write lock on a stage's analytics row, creating it if missing.
+    A no-op UPDATE locks the row on PostgreSQL and makes SQLite's single
+    writer own the transaction. Does not commit.
+    """
+    def touch():
+        return (
+            db.query(StageAnalytics)
+            .filter(StageAnalytics.stage_id == stage_id)
+            .update({StageAnalytics.last_updated: func.now()}, synchronize_session=False)
+        )
+
+    if touch():
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        db.add(StageAnalytics(stage_id=stage_id))
+        db.flush()
+        return
+    db.execute(dialect_insert(StageAnalytics).values(stage_id=stage_id).on_conflict_do_nothing(
+        index_elements=["stage_id"]
+    ))
+    touch()
+
+
 def update_stage_analytics(db: Session, stage_id: int) -> StageAnalytics:
     """
-    Recalculate analytics for a stage based on all attempts.
-    This is an expensive operation, ideally should be a background task.
+    Rebuild analytics for a stage from all of its attempts.
+    Normal traffic keeps the row up to date incrementally; this full
+    recomputation is meant for repairs (rebuild_analytics.py, or the
+    reconciliation worker on an admin request).
+
+    The row is locked before counting, so the count sees every attempt whose
+    increment committed first, and increments arriving meanwhile wait and
+    land on top of the rebuilt totals instead of being overwritten.
     """
-    # Get all attempts
-    attempts_query = db.query(StudentAttempt).filter(StudentAttempt.stage_id == stage_id)
-    total = attempts_query.count()
-    
-    if total == 0:
-        return _get_or_create_analytics(db, stage_id)
-    
-    failed = attempts_query.filter(StudentAttempt.is_successful == False).count()
-    successful = attempts_query.filter(StudentAttempt.is_successful == True).count()
-    
-    # Calculate averages
-    avg_hints = db.query(func.avg(StudentAttempt.hints_viewed)).filter(StudentAttempt.stage_id == stage_id).scalar() or 0.0
-    max_hints = db.query(func.max(StudentAttempt.hints_viewed)).filter(StudentAttempt.stage_id == stage_id).scalar() or 0
-    avg_time = db.query(func.avg(StudentAttempt.time_spent_seconds)).filter(StudentAttempt.stage_id == stage_id).scalar() or 0.0
-    
-    # Get or create analytics record
-    analytics = _get_or_create_analytics(db, stage_id)
-    
+    _lock_analytics_row(db, stage_id)
+
+    total, successful, hints_sum, max_hints, time_sum, timed = db.query(
+        func.count(StudentAttempt.id),
+        func.sum(case((StudentAttempt.is_successful == True, 1), else_=0)),
+        func.sum(StudentAttempt.hints_viewed),
+        func.max(StudentAttempt.hints_viewed),
+        func.sum(StudentAttempt.time_spent_seconds),
+        func.count(StudentAttempt.time_spent_seconds)
+    ).filter(StudentAttempt.stage_id == stage_id).one()
+
+    successful = successful or 0
+    hints_sum = hints_sum or 0
+    time_sum = time_sum or 0
+
+    analytics = db.query(StageAnalytics).filter(StageAnalytics.stage_id == stage_id).one()
+
     analytics.total_attempts = total
-    analytics.failed_attempts = failed
+    analytics.failed_attempts = total - successful
     analytics.successful_attempts = successful
-    analytics.success_rate = (successful / total) * 100 if total > 0 else 0.0
-    analytics.avg_hints_used = float(avg_hints)
-    analytics.max_hints_used = int(max_hints)
-    analytics.avg_time_seconds = float(avg_time)
-    
+    analytics.success_rate = (successful / total) * 100 if total else 0.0
+    analytics.hints_sum = hints_sum
+    analytics.avg_hints_used = hints_sum / total if total else 0.0
+    analytics.max_hints_used = int(max_hints or 0)
+    analytics.time_sum = time_sum
+    analytics.timed_attempts = timed
+    analytics.avg_time_seconds = (time_sum / timed) if timed else 0.0
+
     # Simple error analysis (aggregating error types from JSON)
     # This is a simplified version; in production, you'd want more robust JSON aggregation
-    
+
     db.commit()
     db.refresh(analytics)
     return analytics
 
 
-def _get_or_create_analytics(db: Session, stage_id: int) -> StageAnalytics:
-    analytics = db.query(StageAnalytics).filter(StageAnalytics.stage_id == stage_id).first()
-    if not analytics:
-        analytics = StageAnalytics(stage_id=stage_id)
-        db.add(analytics)
-        db.commit()
-        db.refresh(analytics)
-    return analytics
+def get_stage_ids_with_attempts(db: Session) -> List[int]:
+    return [stage_id for (stage_id,) in db.query(StudentAttempt.stage_id).distinct().all()]
+
+
+def rebuild_all_stage_analytics(db: Session) -> int:
+    """Rebuild analytics for every stage that has attempts. Returns the number of stages processed."""
+    stage_ids = get_stage_ids_with_attempts(db)
+    for stage_id in stage_ids:
+        update_stage_analytics(db, stage_id)
+    return len(stage_ids)
 
 
 def get_stage_analytics(db: Session, stage_id: int) -> StageAnalytics:
@@ -0,0 +1,219 @@
+"""
+Compact progress store: one UserCategoryProgress row per (user, category)
+holding the order of the highest completed stage. Locked/completed flags are
+derived on read from the approved stage sequence of the category.
+
+Stages outside that sequence (pending, rejected or inactive) have no
+progress here, as in the rows store: they read as missing and can't be
+completed.
+
+The pointer tracks `order`, not stage ids, so stages sharing an order are
+completed together, and changing a stage's order changes the progress
+derived for it. Keep orders unique within a category when using this store.
+"""
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, exists, func, insert, select
+
+from app.models.stage import Stage, UserStageProgress, UserCategoryProgress
+from app.schemas.stage import UserStageProgress as UserStageProgressSchema
+from app.services.category_metrics import category_metrics
+from app.services.stage_sequence import stage_sequence
+
+
+def _ensure_category_progress(db: Session, user_id: int, category_id: int) -> None:
+    """Create the (user, category) row if it doesn't exist yet. Does not commit."""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        db.execute(
+            dialect_insert(UserCategoryProgress)
+            .values(user_id=user_id, category_id=category_id, highest_completed_order=0)
+            .on_conflict_do_nothing(index_elements=["user_id", "category_id"])
+        )
+    elif not get_category_progress(db, user_id, category_id):
+        db.add(UserCategoryProgress(user_id=user_id, category_id=category_id, highest_completed_order=0))
+        db.flush()
+
+
+def get_category_progress(db: Session, user_id: int, category_id: int) -> Optional[UserCategoryProgress]:
+    return (
+        db.query(UserCategoryProgress)
+        .filter(
+            UserCategoryProgress.user_id == user_id,
+            UserCategoryProgress.category_id == category_id
+        )
+        .first()
+    )
+
+
+def _progress_view(
+    user_id: int,
+    stage_id: int,
+    order: int,
+    previous_order: Optional[int],
+    highest_completed_order: int
+) -> UserStageProgressSchema:
+    """Derive a stage's progress from the category pointer. previous_order is None for the first stage."""
+    is_completed = order <= highest_completed_order
+    is_unlocked = (
+        previous_order is None
+        or is_completed
+        or previous_order <= highest_completed_order
+    )
+    return UserStageProgressSchema(
+        user_id=user_id,
+        stage_id=stage_id,
+        is_completed=is_completed,
+        is_unlocked=is_unlocked
+    )
+
+
+def get_stages_with_progress(
+    db: Session,
+    user_id: int,
+    category_id: int,
+    fields: Optional[Sequence[str]] = None
+) -> List[Tuple[Stage, UserStageProgressSchema]]:
+    """Approved stages of a category with derived progress, in one query"""
+    from app.crud.crud_stage import with_stage_fields  # crud_stage imports this module
+
+    rows = (
+        with_stage_fields(db.query(Stage, UserCategoryProgress.highest_completed_order), fields)
+        .outerjoin(
+            UserCategoryProgress,
+            and_(
+                UserCategoryProgress.category_id == Stage.category_id,
+                UserCategoryProgress.user_id == user_id
+            )
+        )
+        .filter(
+            Stage.category_id == category_id,
+            Stage.is_active == True,
+            Stage.approval_status == "approved"
+        )
+        .order_by(Stage.order, Stage.id)
+        .all()
+    )
+
+    result = []
+    previous_order = None
+    for stage, highest_completed_order in rows:
+        progress = _progress_view(user_id, stage.id, stage.order, previous_order, highest_completed_order or 0)
+        result.append((stage, progress))
+        previous_order = stage.order
+    return result
+
+
+# _previous_order result for a stage that is not in the approved sequence
+NOT_IN_SEQUENCE = object()
+
+
+def _previous_order(db: Session, stage: Stage):
+    """
+    Order of the stage before `stage` in the approved sequence; None for the
+    first stage, NOT_IN_SEQUENCE if `stage` isn't in the sequence or its
+    predecessor vanished meanwhile.
+    """
+    sequence = stage_sequence.get(db, stage.category_id)
+    if stage.id not in sequence:
+        return NOT_IN_SEQUENCE
+    position = sequence.index(stage.id)
+    if position == 0:
+        return None
+    previous_order = db.query(Stage.order).filter(Stage.id == sequence[position - 1]).scalar()
+    return NOT_IN_SEQUENCE if previous_order is None else previous_order
+
+
+def get_stage_progress(db: Session, user_id: int, stage: Stage) -> Optional[UserStageProgressSchema]:
+    """Derived progress of a single stage; None if it is not in the approved sequence"""
+    previous_order = _previous_order(db, stage)
+    if previous_order is NOT_IN_SEQUENCE:
+        return None
+    progress = get_category_progress(db, user_id, stage.category_id)
+    return _progress_view(
+        user_id,
+        stage.id,
+        stage.order,
+        previous_order,
+        progress.highest_completed_order if progress else 0
+    )
+
+
+def complete_stage(
+    db: Session,
+    user_id: int,
+    stage: Stage,
+    commit: bool = True
+) -> Optional[UserStageProgressSchema]:
+    """
+    Advance the category pointer to this stage.
+    The conditional UPDATE only moves forward, and only from the previous
+    stage, so concurrent or repeated completions are harmless. Stages outside
+    the approved sequence are left alone and return None.
+    With commit=False the caller owns the transaction.
+    """
+    previous_order = _previous_order(db, stage)
+    if previous_order is NOT_IN_SEQUENCE:
+        return None
+    _ensure_category_progress(db, user_id, stage.category_id)
+    (
+        db.query(UserCategoryProgress)
+        .filter(
+            UserCategoryProgress.user_id == user_id,
+            UserCategoryProgress.category_id == stage.category_id,
+            UserCategoryProgress.highest_completed_order < stage.order,
+            UserCategoryProgress.highest_completed_order >= (previous_order or 0)
+        )
+        .update({UserCategoryProgress.highest_completed_order: stage.order}, synchronize_session=False)
+    )
+
+    if not commit:
+        category_metrics.invalidate_on_commit(db, stage.category_id)
+        return None
+    db.commit()
+    category_metrics.invalidate(stage.category_id)
+    return get_stage_progress(db, user_id, stage)
+
+
+def initialize_user_progress_for_category(
+    db: Session,
+    user_id: int,
+    category_id: int
+) -> List[UserStageProgressSchema]:
+    _ensure_category_progress(db, user_id, category_id)
+    db.commit()
+    category_metrics.invalidate(category_id)
+    return [progress for _, progress in get_stages_with_progress(db, user_id, category_id)]
+
+
+def migrate_from_stage_rows(db: Session) -> int:
+    """
+    Build compact progress from the UserStageProgress table with a single
+    INSERT ... SELECT. Pairs that already have a compact row are skipped.
+    Returns the number of rows created.
+    """
+    highest_completed = func.coalesce(
+        func.max(case((UserStageProgress.is_completed == True, Stage.order))), 0
+    )
+    source = (
+        select(UserStageProgress.user_id, Stage.category_id, highest_completed)
+        .join(Stage, Stage.id == UserStageProgress.stage_id)
+        .where(
+            ~exists().where(
+                UserCategoryProgress.user_id == UserStageProgress.user_id,
+                UserCategoryProgress.category_id == Stage.category_id
+            )
+        )
+        .group_by(UserStageProgress.user_id, Stage.category_id)
+    )
+    result = db.execute(
+        insert(UserCategoryProgress).from_select(
+            ["user_id", "category_id", "highest_completed_order"], source
+        )
+    )
+    db.commit()
+    return result.rowcount
@@ -1,14 +1,52 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import and_, desc, exists, false, insert, literal, select
 
+from app.core.config import settings
+from app.core.pagination import keyset_page
+from app.crud import crud_category, crud_progress
 from app.models.stage import Stage, UserStageProgress
 from app.schemas.stage import StageCreate, StageUpdate
+from app.services.category_metrics import category_metrics
+from app.services.stage_sequence import stage_sequence
 
 
-def get_stage(db: Session, stage_id: int) -> Optional[Stage]:
+# Column names accepted by sparse fieldsets (`fields=`)
+STAGE_FIELDS = tuple(column.key for column in Stage.__mapper__.column_attrs)
+# Columns of the summary schema; the large text and JSON columns are left out
+STAGE_SUMMARY_FIELDS = (
+    "id", "category_id", "order", "title", "description",
+    "media_type", "approval_status", "is_active", "is_archived",
+)
+
+
+def with_stage_fields(query, fields: Optional[Sequence[str]]):
+    """
+    Restrict the Stage columns loaded by a query to `fields` (None loads all).
+    id, category_id and order are always loaded since sequencing relies on them.
+    """
+    if fields is None:
+        return query
+    keys = dict.fromkeys(("id", "category_id", "order", *fields))
+    return query.options(load_only(*(getattr(Stage, key) for key in keys)))
+
+
+def get_stage(db: Session, stage_id: int, fields: Optional[Sequence[str]] = None) -> Optional[Stage]:
     """Get a stage by ID"""
-    return db.query(Stage).filter(Stage.id == stage_id).first()
+    return with_stage_fields(db.query(Stage), fields).filter(Stage.id == stage_id).first()
+
+
+def _stages_by_category_query(
+    db: Session,
+    category_id: int,
+    status: Optional[str],
+    fields: Optional[Sequence[str]]
+):
+    query = with_stage_fields(db.query(Stage), fields)
+    query = query.filter(Stage.category_id == category_id, Stage.is_active == True)
+    if status:
+        query = query.filter(Stage.approval_status == status)
+    return query
 
 
 def get_stages_by_category(
@@ -16,33 +54,57 @@ def get_stages_by_category(
     category_id: int, 
     skip: int = 0, 
     limit: int = 100,
-    status: Optional[str] = "approved"
+    status: Optional[str] = "approved",
+    fields: Optional[Sequence[str]] = None
 ) -> List[Stage]:
     """Get stages for a category, filtered by status if provided"""
-    query = db.query(Stage).filter(Stage.category_id == category_id, Stage.is_active == True)
-    if status:
-        query = query.filter(Stage.approval_status == status)
-    
     return (
-        query.order_by(Stage.order)
+        _stages_by_category_query(db, category_id, status, fields)
+        .order_by(Stage.order, Stage.id)
         .offset(skip)
         .limit(limit)
         .all()
     )
 
 
+def get_stages_by_category_page(
+    db: Session,
+    category_id: int,
+    cursor: str,
+    limit: int = 100,
+    status: Optional[str] = "approved",
+    fields: Optional[Sequence[str]] = None
+) -> Tuple[List[Stage], Optional[str]]:
+    """Keyset-paginated get_stages_by_category, ordered by (order, id)"""
+    return keyset_page(
+        _stages_by_category_query(db, category_id, status, fields),
+        Stage.id, cursor, limit, sort_column=Stage.order
+    )
+
+
+def _pending_stages_query(db: Session):
+    return db.query(Stage).filter(Stage.approval_status == "pending", Stage.is_active == True)
+
+
 def get_pending_stages(db: Session, skip: int = 0, limit: int = 100) -> List[Stage]:
     """Get all stages pending approval (Admin only)"""
     return (
-        db.query(Stage)
-        .filter(Stage.approval_status == "pending", Stage.is_active == True)
-        .order_by(Stage.submitted_at.desc())
+        _pending_stages_query(db)
+        .order_by(Stage.submitted_at.desc(), Stage.id.desc())
         .offset(skip)
         .limit(limit)
         .all()
     )
 
 
+def get_pending_stages_page(db: Session, cursor: str, limit: int = 100) -> Tuple[List[Stage], Optional[str]]:
+    """Keyset-paginated get_pending_stages, newest submissions first"""
+    return keyset_page(
+        _pending_stages_query(db), Stage.id, cursor, limit,
+        sort_column=Stage.submitted_at, descending=True
+    )
+
+
 def create_stage(db: Session, stage: StageCreate, professor_id: Optional[int] = None) -> Stage:
     """Create a new stage with professor tracking and pending status"""
     db_stage = Stage(**stage.model_dump())
@@ -54,8 +116,11 @@ def create_stage(db: Session, stage: StageCreate, professor_id: Optional[int] =
     db_stage.approval_status = "pending"
     
     db.add(db_stage)
+    crud_category.bump_stage_version(db, db_stage.category_id)
     db.commit()
     db.refresh(db_stage)
+    stage_sequence.invalidate(db_stage.category_id)
+    category_metrics.invalidate(db_stage.category_id)
     return db_stage
 
 
@@ -74,8 +139,11 @@ def set_approval_status(
     if comment:
         db_stage.approval_comment = comment
     
+    crud_category.bump_stage_version(db, db_stage.category_id)
     db.commit()
     db.refresh(db_stage)
+    stage_sequence.invalidate(db_stage.category_id)
+    category_metrics.invalidate(db_stage.category_id)
     return db_stage
 
 
@@ -85,12 +153,16 @@ def update_stage(db: Session, stage_id: int, stage_update: StageUpdate) -> Optio
     if not db_stage:
         return None
     
+    previous_category_id = db_stage.category_id
     update_data = stage_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_stage, field, value)
     
+    crud_category.bump_stage_version(db, previous_category_id, db_stage.category_id)
     db.commit()
     db.refresh(db_stage)
+    stage_sequence.invalidate(previous_category_id, db_stage.category_id)
+    category_metrics.invalidate(previous_category_id, db_stage.category_id)
     return db_stage
 
 
@@ -101,7 +173,10 @@ def delete_stage(db: Session, stage_id: int) -> bool:
         return False
     
     db_stage.is_active = False
+    crud_category.bump_stage_version(db, db_stage.category_id)
     db.commit()
+    stage_sequence.invalidate(db_stage.category_id)
+    category_metrics.invalidate(db_stage.category_id)
     return True
 
 
@@ -125,6 +200,17 @@ def get_user_stage_progress(
     )
 
 
+def get_stage_progress(db: Session, user_id: int, stage: Stage):
+    """
+    Get user progress for a stage from the configured progress store.
+    Returns a UserStageProgress row, a derived progress schema in compact mode,
+    or None if the user has no progress for the stage.
+    """
+    if settings.PROGRESS_STORE == "compact":
+        return crud_progress.get_stage_progress(db, user_id, stage)
+    return get_user_stage_progress(db, user_id, stage.id)
+
+
 def get_user_progress_by_category(
     db: Session, 
     user_id: int, 
@@ -145,6 +231,48 @@ def get_user_progress_by_category(
     )
 
 
+def _upsert_user_progress(
+    db: Session,
+    user_id: int,
+    stage_id: int,
+    is_completed: bool,
+    is_unlocked: bool,
+    update: dict
+) -> None:
+    """
+    Insert a progress row, or apply `update` to the existing one, in a single
+    statement backed by the unique (user_id, stage_id) index. Does not commit.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        # Generic fallback: read-then-write inside the caller's transaction
+        db_progress = get_user_stage_progress(db, user_id, stage_id)
+        if db_progress:
+            for field, value in update.items():
+                setattr(db_progress, field, value)
+        else:
+            db.add(UserStageProgress(
+                user_id=user_id,
+                stage_id=stage_id,
+                is_completed=is_completed,
+                is_unlocked=is_unlocked
+            ))
+        db.flush()
+        return
+
+    stmt = dialect_insert(UserStageProgress).values(
+        user_id=user_id,
+        stage_id=stage_id,
+        is_completed=is_completed,
+        is_unlocked=is_unlocked
+    )
+    db.execute(stmt.on_conflict_do_update(index_elements=["user_id", "stage_id"], set_=update))
+
+
 def create_or_update_user_progress(
     db: Session,
     user_id: int,
@@ -153,62 +281,98 @@ def create_or_update_user_progress(
     is_unlocked: bool = False
 ) -> UserStageProgress:
     """Create or update user progress for a stage"""
-    db_progress = get_user_stage_progress(db, user_id, stage_id)
-    
-    if db_progress:
-        # Update existing progress
-        db_progress.is_completed = is_completed
-        db_progress.is_unlocked = is_unlocked
-    else:
-        # Create new progress
-        db_progress = UserStageProgress(
-            user_id=user_id,
-            stage_id=stage_id,
-            is_completed=is_completed,
-            is_unlocked=is_unlocked
-        )
-        db.add(db_progress)
-    
+    _upsert_user_progress(
+        db, user_id, stage_id,
+        is_completed=is_completed,
+        is_unlocked=is_unlocked,
+        update={"is_completed": is_completed, "is_unlocked": is_unlocked}
+    )
     db.commit()
-    db.refresh(db_progress)
-    return db_progress
+    # The category isn't at hand here; this path is rare enough to drop every entry
+    category_metrics.clear()
+    return get_user_stage_progress(db, user_id, stage_id)
 
 
-def complete_stage(db: Session, user_id: int, stage_id: int) -> Optional[UserStageProgress]:
+def complete_stage(
+    db: Session,
+    user_id: int,
+    stage_id: int,
+    commit: bool = True
+) -> Optional[UserStageProgress]:
     """
     Mark a stage as completed and unlock the next stage.
+    Both writes are upserts applied in the same transaction, so concurrent
+    completions can neither duplicate rows nor leave the next stage locked.
     Returns the updated progress or None if stage doesn't exist.
+    With commit=False the caller owns the transaction.
     """
     # Get the current stage
     current_stage = get_stage(db, stage_id)
     if not current_stage:
         return None
     
+    if settings.PROGRESS_STORE == "compact":
+        return crud_progress.complete_stage(db, user_id, current_stage, commit=commit)
+    
+    # Next approved stage in the category sequence, skipping gaps in `order`
+    next_stage_id = stage_sequence.next_stage_id(db, current_stage.category_id, stage_id)
+    
     # Mark current stage as completed
-    current_progress = create_or_update_user_progress(
-        db, user_id, stage_id, is_completed=True, is_unlocked=True
+    _upsert_user_progress(
+        db, user_id, stage_id,
+        is_completed=True,
+        is_unlocked=True,
+        update={"is_completed": True, "is_unlocked": True}
     )
     
-    # Find and unlock the next stage
-    next_stage = (
-        db.query(Stage)
-        .filter(
-            and_(
-                Stage.category_id == current_stage.category_id,
-                Stage.order == current_stage.order + 1,
-                Stage.is_active == True
+    if next_stage_id:
+        # Unlock the next stage without touching its completion state
+        _upsert_user_progress(
+            db, user_id, next_stage_id,
+            is_completed=False,
+            is_unlocked=True,
+            update={"is_unlocked": True}
+        )
+    
+    if not commit:
+        category_metrics.invalidate_on_commit(db, current_stage.category_id)
+        return None
+    db.commit()
+    category_metrics.invalidate(current_stage.category_id)
+    return get_user_stage_progress(db, user_id, stage_id)
+
+
+def _insert_missing_progress(db: Session, user_id: int, category_id: int) -> None:
+    """
+    Create the missing progress rows for every approved stage of a category
+    with a single INSERT ... SELECT. Does not commit.
+    """
+    first_stage_id = stage_sequence.first_stage_id(db, category_id)
+    if first_stage_id is None:
+        return
+
+    missing_stages = (
+        select(
+            literal(user_id),
+            Stage.id,
+            false(),
+            Stage.id == first_stage_id  # First stage is unlocked, others are locked
+        )
+        .where(
+            Stage.category_id == category_id,
+            Stage.is_active == True,
+            Stage.approval_status == "approved",
+            ~exists().where(
+                UserStageProgress.user_id == user_id,
+                UserStageProgress.stage_id == Stage.id
             )
         )
-        .first()
     )
-    
-    if next_stage:
-        # Unlock the next stage
-        create_or_update_user_progress(
-            db, user_id, next_stage.id, is_completed=False, is_unlocked=True
+    db.execute(
+        insert(UserStageProgress).from_select(
+            ["user_id", "stage_id", "is_completed", "is_unlocked"], missing_stages
         )
-    
-    return current_progress
+    )
 
 
 def initialize_user_progress_for_category(
@@ -218,23 +382,68 @@ def initialize_user_progress_for_category(
 ) -> List[UserStageProgress]:
     """
     Initialize user progress for all stages in a category.
-    Only the first stage (order=1) is unlocked, all others are locked.
+    Only the first approved stage is unlocked, all others are locked.
+    Existing progress is left untouched.
     """
-    # Only initialize for approved stages
-    stages = get_stages_by_category(db, category_id, status="approved")
-    progress_list = []
-    
-    for stage in stages:
-        # Check if progress already exists
-        existing_progress = get_user_stage_progress(db, user_id, stage.id)
-        if not existing_progress:
-            # First stage is unlocked, others are locked
-            is_unlocked = (stage.order == 1)
-            progress = create_or_update_user_progress(
-                db, user_id, stage.id, is_completed=False, is_unlocked=is_unlocked
+    if settings.PROGRESS_STORE == "compact":
+        return crud_progress.initialize_user_progress_for_category(db, user_id, category_id)
+
+    _insert_missing_progress(db, user_id, category_id)
+    db.commit()
+    category_metrics.invalidate(category_id)
+
+    return (
+        db.query(UserStageProgress)
+        .join(Stage)
+        .filter(
+            UserStageProgress.user_id == user_id,
+            Stage.category_id == category_id,
+            Stage.is_active == True,
+            Stage.approval_status == "approved"
+        )
+        .order_by(Stage.order)
+        .all()
+    )
+
+
+def get_stages_with_progress(
+    db: Session,
+    user_id: int,
+    category_id: int,
+    initialize: bool = True,
+    fields: Optional[Sequence[str]] = None
+) -> List[Tuple[Stage, Optional[UserStageProgress]]]:
+    """
+    Get the approved stages of a category together with the user's progress
+    in one query. When `initialize` is set, missing progress rows are created
+    first so every stage comes back with its progress.
+    `fields` limits the Stage columns fetched (see STAGE_FIELDS).
+    """
+    if settings.PROGRESS_STORE == "compact":
+        return crud_progress.get_stages_with_progress(db, user_id, category_id, fields=fields)
+
+    def fetch():
+        return (
+            with_stage_fields(db.query(Stage, UserStageProgress), fields)
+            .outerjoin(
+                UserStageProgress,
+                and_(
+                    UserStageProgress.stage_id == Stage.id,
+                    UserStageProgress.user_id == user_id
+                )
             )
-            progress_list.append(progress)
-        else:
-            progress_list.append(existing_progress)
-    
-    return progress_list
+            .filter(
+                Stage.category_id == category_id,
+                Stage.is_active == True,
+                Stage.approval_status == "approved"
+            )
+            .order_by(Stage.order)
+            .all()
+        )
+
+    rows = fetch()
+    if initialize and any(progress is None for _, progress in rows):
+        _insert_missing_progress(db, user_id, category_id)
+        db.commit()
+        rows = fetch()
+    return rows
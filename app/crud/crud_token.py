@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.token import RevokedToken
+from app.services.revocation import revocation_list
+
+
+def revoke_token(db: Session, jti: str, user_id: Optional[int], token_type: str, exp: int) -> bool:
+    """
+    Persist a token revocation and add it to the in-memory revocation list.
+    Returns False if the token was already revoked (the unique jti makes a
+    concurrent reuse of the same refresh token lose the race).
+    """
+    db.add(RevokedToken(
+        jti=jti,
+        user_id=user_id,
+        token_type=token_type,
+        expires_at=datetime.utcfromtimestamp(exp)
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    revocation_list.revoke_token(jti, exp)
+    return True
+
+
+def purge_expired(db: Session) -> int:
+    """Delete revocations of tokens that have expired anyway"""
+    deleted = db.query(RevokedToken).filter(RevokedToken.expires_at <= datetime.utcnow()).delete()
+    db.commit()
+    return deleted
@@ -1,9 +1,11 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
+from app.core.pagination import keyset_page
 from app.models.transfer import TopicTransferRequest, Notification
 from app.models.user import User
 from app.models.stage import Stage
+from app.crud import crud_category
 
 def create_transfer_request(db: Session, sender_id: int, receiver_email: str) -> Optional[TopicTransferRequest]:
     receiver = db.query(User).filter(User.email == receiver_email).first()
@@ -48,6 +50,7 @@ def accept_transfer_request(db: Session, request_id: int, user_id: int) -> bool:
         return False
     
     # Perform transfer
+    crud_category.bump_stage_version_for_professor(db, request.sender_id)
     db.query(Stage).filter(Stage.professor_id == request.sender_id).update(
         {Stage.professor_id: request.receiver_id}
     )
@@ -91,7 +94,12 @@ def reject_transfer_request(db: Session, request_id: int, user_id: int) -> bool:
     return True
 
 def get_notifications(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Notification]:
-    return db.query(Notification).filter(Notification.user_id == user_id).order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
+    return db.query(Notification).filter(Notification.user_id == user_id).order_by(Notification.created_at.desc(), Notification.id.desc()).offset(skip).limit(limit).all()
+
+def get_notifications_page(db: Session, user_id: int, cursor: str, limit: int = 100) -> Tuple[List[Notification], Optional[str]]:
+    """Keyset-paginated get_notifications, newest first"""
+    query = db.query(Notification).filter(Notification.user_id == user_id)
+    return keyset_page(query, Notification.id, cursor, limit, sort_column=Notification.created_at, descending=True)
 
 def mark_notification_as_read(db: Session, notification_id: int, user_id: int):
     notification = db.query(Notification).filter(Notification.id == notification_id, Notification.user_id == user_id).first()
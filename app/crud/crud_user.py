@@ -1,9 +1,18 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session 
-from app.core.security import get_password_hash, verify_password
+from app.core.pagination import keyset_page
+from app.core.security import get_password_hash, verify_password, verify_password_async
 from app.models.user import User
 from app.models.audit import AuditLog
 from app.schemas.user import UserCreate, UserUpdate
+from app.services.category_metrics import category_metrics
+from app.services.principal_cache import principal_cache
+from app.services.revocation import revocation_list
+
+# Changing any of these invalidates the role claims of issued access tokens
+ROLE_FIELDS = ("role", "is_superuser", "is_professor")
+
 
 class CRUDUser:
     def get(self, db: Session, id: int) -> Optional[User]:
@@ -13,12 +22,17 @@ class CRUDUser:
         return db.query(User).filter(User.email == email).first()
     
     def get_multi(self, db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-        return db.query(User).offset(skip).limit(limit).all()
+        return db.query(User).order_by(User.id).offset(skip).limit(limit).all()
+
+    def get_multi_page(self, db: Session, *, cursor: str, limit: int = 100) -> Tuple[List[User], Optional[str]]:
+        """Keyset-paginated get_multi, ordered by id"""
+        return keyset_page(db.query(User), User.id, cursor, limit)
 
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
+    def create(self, db: Session, *, obj_in: UserCreate, hashed_password: Optional[str] = None) -> User:
+        """Create a user. Pass hashed_password when the caller already hashed obj_in.password."""
         db_obj = User(
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=hashed_password or get_password_hash(obj_in.password),
             full_name=obj_in.full_name,
             role=obj_in.role,
             is_superuser=obj_in.is_superuser,
@@ -81,6 +95,10 @@ class CRUDUser:
         # 3. Delete the user (cascades to StudentAttempt and StudentFeedbackView)
         db.delete(user)
         db.commit()
+        principal_cache.invalidate(user_id)
+        # Their progress rows went with them
+        category_metrics.clear()
+        revocation_list.revoke_user(user_id)
         return True
 
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
@@ -91,6 +109,15 @@ class CRUDUser:
             return None
         return user
 
+    async def authenticate_async(self, db: Session, *, email: str, password: str) -> Optional[User]:
+        """authenticate for async endpoints: the lookup runs in the threadpool, Argon2 on the hashing pool"""
+        user = await run_in_threadpool(self.get_by_email, db, email=email)
+        if not user:
+            return None
+        if not await verify_password_async(password, user.hashed_password):
+            return None
+        return user
+
     def update(self, db: Session, *, db_obj: User, obj_in: UserUpdate) -> User:
         update_data = obj_in.dict(exclude_unset=True)
         if update_data.get("password"):
@@ -98,12 +125,25 @@ class CRUDUser:
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
         
+        roles_changed = any(
+            field in update_data and update_data[field] != getattr(db_obj, field) for field in ROLE_FIELDS
+        )
         for field in update_data:
             setattr(db_obj, field, update_data[field])
+        if roles_changed:
+            # Incremented in SQL, not from the row read earlier, so concurrent role changes can't collapse
+            db_obj.token_version = User.token_version + 1
             
         db.add(db_obj)
+        db.flush()
+        # The flush expired the attribute; this reads the incremented value inside the write transaction
+        token_version = db_obj.token_version
         db.commit()
         db.refresh(db_obj)
+        principal_cache.invalidate(db_obj.id)
+        revocation_list.sync_user(db_obj)
+        if roles_changed:
+            revocation_list.set_token_version(db_obj.id, token_version)
         return db_obj
 
     def block_user(self, db: Session, *, db_obj: User, reason: str, admin_id: int) -> User:
@@ -124,6 +164,8 @@ class CRUDUser:
         
         db.commit()
         db.refresh(db_obj)
+        principal_cache.invalidate(db_obj.id)
+        revocation_list.revoke_user(db_obj.id)
         
         # Mock Email Notification
         print(f"MOCK EMAIL: Sending block notification to {db_obj.email}. Reason: {reason}")
@@ -148,6 +190,10 @@ class CRUDUser:
         
         db.delete(user)
         db.commit()
+        principal_cache.invalidate(id)
+        # Their progress rows went with them
+        category_metrics.clear()
+        revocation_list.revoke_user(id)
         return user
 
 user = CRUDUser()
@@ -0,0 +1,203 @@
+"""
+Versioned schema migrations.
+
+Applied versions are recorded in the schema_version table. A fresh database
+is created from the models and stamped with every version; an existing one
+runs the migrations it hasn't seen yet, in order. Databases from before
+versioning start at version 0, which is why the first migrations check what
+already exists.
+
+To change the schema, update the models and append a Migration that brings a
+database at the previous version to the new one.
+"""
+import logging
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex
+
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.core.config import settings
+from app.db.base import Base
+
+logger = logging.getLogger(__name__)
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+    # Run outside a transaction where the database builds indexes online
+    # (CREATE INDEX CONCURRENTLY on PostgreSQL); in a transaction elsewhere
+    transactional: bool = True
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str, backfill: Optional[str] = None) -> None:
+    """ALTER TABLE ... ADD COLUMN unless the column is already there"""
+    if column in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return
+    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    if backfill:
+        conn.exec_driver_sql(backfill)
+
+
+def create_index(conn: Connection, table: str, name: str) -> None:
+    """Create a model index unless it exists, without blocking writes on PostgreSQL"""
+    index = next(ix for ix in Base.metadata.tables[table].indexes if ix.name == name)
+    sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+    autocommit = conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+    if conn.dialect.name == "postgresql" and autocommit:
+        sql = sql.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+    conn.exec_driver_sql(sql)
+
+
+def _create_missing_tables(conn: Connection) -> None:
+    Base.metadata.create_all(bind=conn)
+
+
+def _add_legacy_columns(conn: Connection) -> None:
+    # Columns the ad hoc ALTER TABLE scripts used to add
+    add_column(conn, "users", "role", "VARCHAR DEFAULT 'student'",
+               "UPDATE users SET role = 'admin' WHERE is_superuser = TRUE")
+    add_column(conn, "users", "is_professor", "BOOLEAN DEFAULT FALSE")
+    add_column(conn, "users", "token_version", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "stages", "professor_id", "INTEGER REFERENCES users(id)")
+    add_column(conn, "stages", "is_archived", "BOOLEAN DEFAULT FALSE")
+    add_column(conn, "stages", "approval_status", "VARCHAR(20) DEFAULT 'approved'",
+               "UPDATE stages SET approval_status = 'approved' WHERE approval_status IS NULL")
+    add_column(conn, "stages", "approval_comment", "VARCHAR")
+    add_column(conn, "stages", "submitted_at", "TIMESTAMP",
+               "UPDATE stages SET submitted_at = CURRENT_TIMESTAMP")
+    add_column(conn, "stage_analytics", "hints_sum", "INTEGER DEFAULT 0",
+               "UPDATE stage_analytics SET hints_sum = (SELECT COALESCE(SUM(hints_viewed), 0) "
+               "FROM student_attempts WHERE student_attempts.stage_id = stage_analytics.stage_id)")
+    add_column(conn, "stage_analytics", "time_sum", "INTEGER DEFAULT 0",
+               "UPDATE stage_analytics SET time_sum = (SELECT COALESCE(SUM(time_spent_seconds), 0) "
+               "FROM student_attempts WHERE student_attempts.stage_id = stage_analytics.stage_id)")
+    add_column(conn, "stage_analytics", "timed_attempts", "INTEGER DEFAULT 0",
+               "UPDATE stage_analytics SET timed_attempts = (SELECT COUNT(time_spent_seconds) "
+               "FROM student_attempts WHERE student_attempts.stage_id = stage_analytics.stage_id)")
+    add_column(conn, "categories", "stage_version", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "categories", "stages_updated_at", "TIMESTAMP",
+               "UPDATE categories SET stages_updated_at = CURRENT_TIMESTAMP")
+
+
+def _unique_stage_progress(conn: Connection) -> None:
+    names = {ix["name"] for ix in inspect(conn).get_indexes("user_stage_progress")}
+    if "ix_user_stage_progress_user_stage" in names:
+        return
+    # Merge duplicated progress rows into the oldest one before enforcing uniqueness
+    conn.exec_driver_sql(
+        """UPDATE user_stage_progress SET
+            is_completed = (SELECT MAX(p.is_completed) FROM user_stage_progress p
+                            WHERE p.user_id = user_stage_progress.user_id
+                            AND p.stage_id = user_stage_progress.stage_id),
+            is_unlocked = (SELECT MAX(p.is_unlocked) FROM user_stage_progress p
+                           WHERE p.user_id = user_stage_progress.user_id
+                           AND p.stage_id = user_stage_progress.stage_id)
+        WHERE id IN (SELECT MIN(id) FROM user_stage_progress
+                     GROUP BY user_id, stage_id HAVING COUNT(*) > 1)"""
+    )
+    conn.exec_driver_sql(
+        """DELETE FROM user_stage_progress WHERE id NOT IN
+           (SELECT MIN(id) FROM user_stage_progress GROUP BY user_id, stage_id)"""
+    )
+    create_index(conn, "user_stage_progress", "ix_user_stage_progress_user_stage")
+
+
+def _hot_path_indexes(conn: Connection) -> None:
+    create_index(conn, "stages", "ix_stages_category_status_order")
+    create_index(conn, "stages", "ix_stages_status_submitted")
+    create_index(conn, "student_attempts", "ix_student_attempts_user_stage_number")
+    create_index(conn, "notifications", "ix_notifications_user_created")
+    create_index(conn, "topic_transfer_requests", "ix_topic_transfer_requests_receiver_status")
+
+
+def _category_active_stage_count(conn: Connection) -> None:
+    add_column(conn, "categories", "active_stage_count", "INTEGER NOT NULL DEFAULT 0",
+               "UPDATE categories SET active_stage_count = (SELECT COUNT(*) FROM stages "
+               "WHERE stages.category_id = categories.id AND stages.is_active = TRUE)")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Tables missing from databases created before versioning", _create_missing_tables),
+    Migration(2, "Columns added before versioning", _add_legacy_columns),
+    Migration(3, "Unique (user_id, stage_id) progress rows", _unique_stage_progress),
+    Migration(4, "Composite indexes for hot queries", _hot_path_indexes, transactional=False),
+    Migration(5, "Denormalized active stage count on categories", _category_active_stage_count),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn: Connection) -> Optional[int]:
+    """Latest applied version; None if the database isn't versioned yet"""
+    if not inspect(conn).has_table(schema_version.name):
+        return None
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(schema_version.insert().values(version=migration.version, description=migration.description))
+
+
+def upgrade(engine: Engine) -> List[Migration]:
+    """Bring the database to LATEST_VERSION; returns the migrations that ran"""
+    with engine.begin() as conn:
+        version = current_version(conn)
+        if version is None:
+            fresh = not inspect(conn).get_table_names()
+            schema_version.create(bind=conn)
+            if fresh:
+                # Nothing to migrate: build the current schema and stamp it
+                Base.metadata.create_all(bind=conn)
+                for migration in MIGRATIONS:
+                    _record(conn, migration)
+                logger.info("Created database schema at version %s", LATEST_VERSION)
+                return []
+            version = 0
+
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        if migration.transactional or engine.dialect.name != "postgresql":
+            with engine.begin() as conn:
+                migration.upgrade(conn)
+                _record(conn, migration)
+        else:
+            with engine.connect() as conn:
+                conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+                migration.upgrade(conn)
+                _record(conn, migration)
+        logger.info("Applied schema migration %s: %s", migration.version, migration.description)
+        applied.append(migration)
+    return applied
+
+
+def ensure_schema(engine: Engine) -> None:
+    """
+    Startup check. A current schema costs a table lookup and one SELECT; an
+    outdated one is upgraded when SCHEMA_AUTO_MIGRATE is on, and refused
+    otherwise (run `python migrate.py` before starting the workers).
+    """
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version == LATEST_VERSION:
+        return
+    if version is not None and version > LATEST_VERSION:
+        logger.warning("Database schema version %s is newer than this code (%s)", version, LATEST_VERSION)
+        return
+    if not settings.SCHEMA_AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema is at version {version or 0}, expected {LATEST_VERSION}: run `python migrate.py`"
+        )
+    upgrade(engine)
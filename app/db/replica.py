@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class ReadReplica:
+    """
+    Hands out sessions on the read replica for read-only routes. When the
+    replica can't be reached the session comes from the primary instead, and
+    the replica is left alone for `retry_seconds` before it is tried again.
+
+    Replica sessions may lag behind the primary; only use them where a
+    slightly stale answer is acceptable (dashboards, exports, listings).
+    """
+
+    def __init__(
+        self,
+        replica_factory: Optional[Callable[[], Session]],
+        primary_factory: Callable[[], Session],
+        retry_seconds: float = 30.0,
+    ):
+        self.replica_factory = replica_factory
+        self.primary_factory = primary_factory
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._unavailable_until = 0.0
+        self.replica_sessions = 0
+        self.primary_sessions = 0
+        self.failures = 0
+
+    @property
+    def available(self) -> bool:
+        return self.replica_factory is not None and time.monotonic() >= self._unavailable_until
+
+    def session(self) -> Session:
+        if self.available:
+            db = self.replica_factory()
+            try:
+                # Connect now so an unreachable replica falls back before the route runs
+                db.connection()
+            except DBAPIError as exc:
+                db.close()
+                self._mark_unavailable(exc)
+            else:
+                with self._lock:
+                    self.replica_sessions += 1
+                return db
+        with self._lock:
+            self.primary_sessions += 1
+        return self.primary_factory()
+
+    def _mark_unavailable(self, exc: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+            self._unavailable_until = time.monotonic() + self.retry_seconds
+        logger.warning(
+            "Read replica unavailable, using the primary for %.0f s: %s", self.retry_seconds, exc
+        )
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "configured": self.replica_factory is not None,
+                "available": self.available,
+                "replica_sessions": self.replica_sessions,
+                "primary_sessions": self.primary_sessions,
+                "failures": self.failures,
+            }
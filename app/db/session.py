@@ -1,14 +1,99 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
+from app.db.replica import ReadReplica
+from app.db.sqlite import SingleWriterSession, apply_sqlite_profile, uses_sqlite_profile
+from app.services.metrics import TimedAsyncQueuePool, TimedQueuePool
+
 # SQLite specific check
 connect_args = {"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+sqlite_profile = uses_sqlite_profile(settings.DATABASE_URL)
+
+# Pool settings for the reader and the single writer engines of the SQLite profile
+reader_pool = dict(
+    pool_size=settings.SQLITE_READER_POOL_SIZE,
+    max_overflow=settings.SQLITE_READER_MAX_OVERFLOW,
+) if sqlite_profile else {}
+writer_pool = dict(pool_size=1, max_overflow=0, pool_timeout=settings.SQLITE_WRITER_TIMEOUT_SECONDS)
+
+
+def timed_pool(url: str, name: str, use_async: bool = False) -> dict:
+    """Checkout-timed queue pool (for /metrics) wherever SQLAlchemy would pick a queue pool"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return dict(poolclass=TimedAsyncQueuePool if use_async else TimedQueuePool, pool_logging_name=name)
+
 
 engine = create_engine(
-    settings.DATABASE_URL, connect_args=connect_args
+    settings.DATABASE_URL, connect_args=connect_args,
+    **reader_pool, **timed_pool(settings.DATABASE_URL, "primary")
+)
+writer_engine = None
+if sqlite_profile:
+    writer_engine = create_engine(
+        settings.DATABASE_URL, connect_args=connect_args,
+        **writer_pool, **timed_pool(settings.DATABASE_URL, "writer")
+    )
+    apply_sqlite_profile(engine)
+    apply_sqlite_profile(writer_engine, writer=True)
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine,
+    class_=SingleWriterSession, writer=writer_engine
+)
+
+read_engine = None
+ReadSessionLocal = None
+if settings.DATABASE_READ_URL:
+    read_engine = create_engine(
+        settings.DATABASE_READ_URL,
+        connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_READ_URL else {},
+        # Drop connections the replica closed while it was away
+        pool_pre_ping=True,
+        **timed_pool(settings.DATABASE_READ_URL, "replica"),
+    )
+    if uses_sqlite_profile(settings.DATABASE_READ_URL):
+        apply_sqlite_profile(read_engine)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+read_replica = ReadReplica(ReadSessionLocal, SessionLocal, settings.DATABASE_READ_RETRY_SECONDS)
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """Swap the driver of a sync database URL for its async counterpart"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}', set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(async_url, **reader_pool, **timed_pool(async_url, "async", use_async=True))
+async_writer_engine = None
+if sqlite_profile:
+    # The async side has its own writer; busy_timeout covers contention with the sync one
+    async_writer_engine = create_async_engine(
+        async_url, **writer_pool, **timed_pool(async_url, "async_writer", use_async=True)
+    )
+    apply_sqlite_profile(async_engine.sync_engine)
+    apply_sqlite_profile(async_writer_engine.sync_engine, writer=True)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False,
+    sync_session_class=SingleWriterSession,
+    writer=async_writer_engine.sync_engine if async_writer_engine else None
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+async def dispose_async_engines():
+    """Pooled async connections belong to the event loop that opened them"""
+    for pool in (async_engine, async_writer_engine):
+        if pool is not None:
+            await pool.dispose()
 
 def get_db():
     db = SessionLocal()
@@ -16,3 +101,23 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """
+    Session for read-only routes: the replica when DATABASE_READ_URL is set
+    and reachable, otherwise the primary. Don't write through it.
+    """
+    db = read_replica.session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """
+    AsyncSession for async endpoints. The CRUD functions are sync; call them
+    through `await db.run_sync(crud_fn, *args)`, which runs them on the async
+    driver so waiting on the database never blocks the event loop.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,91 @@
+from sqlalchemy import Delete, Insert, Update, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+def uses_sqlite_profile(url: str) -> bool:
+    """The profile needs a database file: WAL and a second connection mean nothing for :memory:"""
+    parsed = make_url(url)
+    return (
+        settings.SQLITE_PERFORMANCE_PROFILE
+        and parsed.get_backend_name() == "sqlite"
+        and parsed.database not in (None, "", ":memory:")
+    )
+
+
+def sqlite_pragmas() -> list:
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def apply_sqlite_profile(engine: Engine, writer: bool = False) -> None:
+    """
+    Run the profile pragmas on every new connection of `engine` (the sync
+    engine of an AsyncEngine works too). Writer connections also open their
+    transactions with BEGIN IMMEDIATE, so the write lock is taken up front and
+    waited for under busy_timeout, instead of failing with "database is
+    locked" when a read transaction tries to upgrade.
+    """
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        if writer:
+            # Let SQLAlchemy's begin event emit BEGIN instead of the driver
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    if writer:
+        @event.listens_for(engine, "begin")
+        def _on_begin(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+class SingleWriterSession(Session):
+    """
+    Routes reads to the session's pooled (reader) bind and every write to
+    `writer`, an engine with a single connection. Concurrent writers queue on
+    that connection's pool (up to its pool_timeout) instead of racing for the
+    SQLite write lock.
+
+    Once a transaction has written, its remaining statements stay on the
+    writer, so it reads its own uncommitted changes; the next transaction
+    starts on the readers again.
+    """
+
+    def __init__(self, *args, writer: Engine = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writer = writer
+        self.writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.writer is not None and (self.writing or isinstance(clause, (Insert, Update, Delete))):
+            self.writing = True
+            return self.writer
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+@event.listens_for(SingleWriterSession, "before_flush")
+def _flush_on_writer(session, flush_context, instances):
+    # Fires before the flush asks for a connection, and only when there are pending changes
+    if session.writer is not None:
+        session.writing = True
+
+
+@event.listens_for(SingleWriterSession, "after_transaction_end")
+def _release_writer(session, transaction):
+    # Only the outermost transaction holds the writer connection
+    if transaction.parent is None:
+        session.writing = False
@@ -1,16 +1,52 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.db.base import Base
-from app.db.session import engine
+from app.core.security import PasswordHashingBusy, password_hasher
+from app.db import migrations
+from app.db.session import SessionLocal, dispose_async_engines, engine, writer_engine
+from app.crud import crud_token
+from app.services.analytics_worker import analytics_worker
+from app.services.category_metrics import category_metrics
+from app.services.event_loop_monitor import EventLoopStallMiddleware, event_loop_monitor, log_blocking_routes
+from app.services.grading import answer_keys
+from app.services.metrics import Collected, PrometheusMiddleware, register_cache, registry
+from app.services.principal_cache import principal_cache
+from app.services.query_counter import QueryCounterMiddleware
+from app.services.revocation import revocation_list
+from app.services.stage_sequence import stage_sequence
 import os
 from app.api.endpoints import login, users, categories, stages, feedback, oauth, analytics, transfer
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cheap version check; pending migrations run here when SCHEMA_AUTO_MIGRATE is on
+    migrations.ensure_schema(writer_engine or engine)
+    # Revoked tokens and blocked users are checked in memory on every request
+    db = SessionLocal()
+    try:
+        crud_token.purge_expired(db)
+        revocation_list.load(db)
+    finally:
+        db.close()
+    analytics_worker.start()
+    # Picks up revocations made by other worker processes
+    revocation_list.start()
+    # Warn about async routes that call blocking code, then measure loop lag
+    log_blocking_routes(app.routes)
+    event_loop_monitor.start()
+    yield
+    await event_loop_monitor.stop()
+    revocation_list.stop()
+    password_hasher.shutdown()
+    # Flush pending analytics refreshes before the worker exits
+    analytics_worker.stop(flush=True)
+    # Pooled async connections belong to this event loop
+    await dispose_async_engines()
 
-app = FastAPI(title=settings.PROJECT_NAME)
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 # Mount uploads directory to serve media files
 uploads_dir = "uploads"
@@ -33,6 +69,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(EventLoopStallMiddleware, monitor=event_loop_monitor)
+if settings.QUERY_COUNTER_ENABLED:
+    app.add_middleware(QueryCounterMiddleware, repeat_threshold=settings.QUERY_REPEAT_THRESHOLD)
+if settings.METRICS_ENABLED:
+    # Outermost, so latency covers the other middlewares too
+    app.add_middleware(PrometheusMiddleware)
+
+register_cache("principal", lambda: (principal_cache.hits, principal_cache.misses))
+register_cache("answer_keys", lambda: (answer_keys.hits, answer_keys.misses))
+register_cache("category_metrics", lambda: (category_metrics.hits, category_metrics.misses))
+register_cache("stage_sequence", lambda: (stage_sequence.hits, stage_sequence.misses))
+registry.register(Collected(
+    "event_loop_lag_seconds", "Lag of the latest event-loop tick", (), lambda: event_loop_monitor.lag_samples("last_lag")
+))
+registry.register(Collected(
+    "event_loop_max_lag_seconds", "Largest event-loop lag since start", (), lambda: event_loop_monitor.lag_samples("max_lag")
+))
+registry.register(Collected(
+    "event_loop_stalled_requests_total", "Requests that waited at least the stall threshold on a blocked event loop",
+    ("method", "route"), event_loop_monitor.stalled_samples, "counter"
+))
+
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    # Shed load during login storms instead of queueing without bound
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
 app.include_router(login.router, tags=["login"])
 app.include_router(oauth.router, prefix="/auth", tags=["oauth"])
 app.include_router(users.router, prefix="/users", tags=["users"])
@@ -51,3 +118,7 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,6 +1,7 @@
 from app.models.user import User
 from app.models.audit import AuditLog
 from app.models.category import Category
-from app.models.stage import Stage, UserStageProgress
+from app.models.stage import Stage, UserStageProgress, UserCategoryProgress
 from app.models.feedback import StageFeedback, StudentAttempt, StudentFeedbackView, StageAnalytics
 from app.models.transfer import Notification, TopicTransferRequest
+from app.models.token import RevokedToken
@@ -10,3 +10,9 @@ class Category(Base):
     description = Column(String, nullable=True)
     icon = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # Bumped on every write to the category's stages; backs ETag/Last-Modified on stage listings
+    stage_version = Column(Integer, nullable=False, default=0, server_default="0")
+    stages_updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Active stages of the category, kept current by the stage writes (bump_stage_version)
+    active_stage_count = Column(Integer, nullable=False, default=0, server_default="0")
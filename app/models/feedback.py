@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float, JSON, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float, JSON, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -49,6 +49,10 @@ class StudentAttempt(Base):
     Used for analytics and understanding student difficulties.
     """
     __tablename__ = "student_attempts"
+    __table_args__ = (
+        # Attempt history and the next attempt number of a student on a stage
+        Index("ix_student_attempts_user_stage_number", "user_id", "stage_id", "attempt_number"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -94,7 +98,8 @@ class StudentFeedbackView(Base):
 class StageAnalytics(Base):
     """
     Aggregated analytics for stages to identify difficult challenges.
-    This table can be updated periodically or on-demand.
+    Maintained incrementally on every attempt; can be rebuilt from
+    student_attempts with rebuild_analytics.py.
     """
     __tablename__ = "stage_analytics"
 
@@ -116,7 +121,12 @@ class StageAnalytics(Base):
     
     # Average time to complete
     avg_time_seconds = Column(Float, nullable=True)
-    
+
+    # Running totals used to keep the averages up to date without rescanning attempts
+    hints_sum = Column(Integer, default=0)
+    time_sum = Column(Integer, default=0)
+    timed_attempts = Column(Integer, default=0)  # Attempts that reported time_spent_seconds
+
     last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
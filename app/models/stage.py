@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -9,6 +9,20 @@ class Stage(Base):
     Stages are sequential and can be locked/unlocked based on completion.
     """
     __tablename__ = "stages"
+    __table_args__ = (
+        # Only active stages are ever listed, so the listing indexes are partial
+        # where the dialect supports it (a plain index elsewhere).
+        # Category listings: active stages by status, in sequence
+        Index(
+            "ix_stages_category_status_order", "category_id", "approval_status", "order", "id",
+            sqlite_where=text("is_active = 1"), postgresql_where=text("is_active"),
+        ),
+        # Review queue: pending stages, newest submissions first
+        Index(
+            "ix_stages_status_submitted", "approval_status", "submitted_at", "id",
+            sqlite_where=text("is_active = 1"), postgresql_where=text("is_active"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
@@ -44,6 +58,10 @@ class UserStageProgress(Base):
     A user can only unlock stage n+1 after completing stage n.
     """
     __tablename__ = "user_stage_progress"
+    __table_args__ = (
+        # One progress row per user and stage; completion relies on it for upserts
+        Index("ix_user_stage_progress_user_stage", "user_id", "stage_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -54,3 +72,22 @@ class UserStageProgress(Base):
     # Relationships
     user = relationship("User", back_populates="stage_progress")
     stage = relationship("Stage", back_populates="user_progress")
+
+
+class UserCategoryProgress(Base):
+    """
+    Compact progress store: one row per (user, category).
+    Stages unlock strictly in sequence, so the order of the highest completed
+    stage is enough to derive the locked/completed state of every stage on read.
+    Used instead of UserStageProgress when PROGRESS_STORE is "compact".
+    """
+    __tablename__ = "user_category_progress"
+    __table_args__ = (
+        Index("ix_user_category_progress_user_category", "user_id", "category_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    highest_completed_order = Column(Integer, nullable=False, default=0)  # 0 = nothing completed yet
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # A user's notifications, newest first (keyset pages on created_at, id)
+        Index("ix_notifications_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -19,6 +23,10 @@ class Notification(Base):
 
 class TopicTransferRequest(Base):
     __tablename__ = "topic_transfer_requests"
+    __table_args__ = (
+        # Pending requests received by a professor
+        Index("ix_topic_transfer_requests_receiver_status", "receiver_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
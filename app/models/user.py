@@ -13,6 +13,8 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
     is_professor = Column(Boolean, default=False)
+    # Bumped on role changes; access tokens carrying an older `ver` claim are rejected
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # OAuth fields
     oauth_provider = Column(String, nullable=True)
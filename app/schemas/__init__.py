@@ -1,6 +1,7 @@
 from .user import User, UserCreate, UserInDB, UserUpdate, BlockUserRequest
-from .token import Token, TokenPayload
+from .token import Token, TokenPayload, TokenPrincipal, RefreshTokenRequest
 from .transfer import TransferRequest, TransferRequestCreate, NotificationBase
+from .pagination import CursorPage
 from .category import Category, CategoryCreate, CategoryUpdate
 from .stage import (
     Stage, 
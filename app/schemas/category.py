@@ -53,6 +53,16 @@ class CategoryMetrics(BaseModel):
     average_progress: float = Field(..., description="Average completion percentage across all students (0-100)")
 
 
+# Student of a category with their progress in it
+class CategoryStudent(BaseModel):
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    completed_stages: int = Field(..., description="Active stages of the category the student completed")
+    total_stages: int = Field(..., description="Active stages in the category")
+    progress_percentage: float = Field(..., description="completed_stages over total_stages (0-100)")
+
+
 # Detailed category view with stages and metrics
 class CategoryDetail(CategoryBase):
     id: int
@@ -40,6 +40,7 @@ class InteractiveConfig(BaseModel):
     matching_pairs: Optional[List[MatchingPair]] = None
     classification_categories: Optional[List[ClassificationCategory]] = None
     correct_order: Optional[List[str]] = None  # List of element IDs in order
+    correct_option_ids: Optional[List[str]] = None  # Element IDs of the right options (multiple choice)
     
     # UI/UX Settings
     show_confetti: bool = Field(True, description="Whether to show animations on success")
@@ -47,3 +48,32 @@ class InteractiveConfig(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class ChallengeSubmission(BaseModel):
+    """A student's answer to an interactive challenge; fill the field matching the challenge type"""
+    order: Optional[List[str]] = Field(None, description="Element IDs in the submitted order (ordering)")
+    pairs: Optional[List[MatchingPair]] = Field(None, description="Submitted pairs (matching)")
+    classification: Optional[Dict[str, List[str]]] = Field(
+        None, description="Category ID -> element IDs placed in it (classification)"
+    )
+    selected_ids: Optional[List[str]] = Field(None, description="Selected element IDs (multiple_choice)")
+
+
+class GradeRequest(ChallengeSubmission):
+    """Submission to grade, optionally recorded as an attempt"""
+    record_attempt: bool = Field(False, description="Record a StudentAttempt with the graded result")
+    time_spent_seconds: Optional[int] = Field(None, ge=0)
+
+
+class BatchGradeRequest(BaseModel):
+    submissions: List[ChallengeSubmission] = Field(..., max_length=1000)
+
+
+class GradeResult(BaseModel):
+    is_correct: bool
+    score: float = Field(..., description="Fraction of correctly answered items (0.0 - 1.0)")
+    correct_count: int
+    total_count: int
+    incorrect_ids: List[str] = Field(default_factory=list, description="Element IDs answered incorrectly or missing")
+    attempt_id: Optional[int] = Field(None, description="Recorded attempt, if record_attempt was set")
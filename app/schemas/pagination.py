@@ -0,0 +1,11 @@
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel, Field
+
+T = TypeVar("T")
+
+
+class CursorPage(BaseModel, Generic[T]):
+    """A page of a keyset-paginated listing"""
+    items: List[T]
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page")
@@ -57,6 +57,64 @@ class Stage(StageBase):
         from_attributes = True
 
 
+class StageSummary(BaseModel):
+    """
+    Lightweight stage schema for menus and listings (fields=summary).
+    Leaves out content, challenge_description, media and interactive_config.
+    """
+    id: int
+    category_id: int
+    order: int
+    title: str
+    description: Optional[str] = None
+    media_type: Optional[str] = None
+    approval_status: str = "pending"
+    is_active: bool = True
+    is_archived: bool = False
+
+    class Config:
+        from_attributes = True
+
+
+class StageSummaryWithProgress(StageSummary):
+    """Stage summary with user progress information"""
+    is_unlocked: bool = Field(..., description="Whether this stage is unlocked for the user")
+    is_completed: bool = Field(..., description="Whether the user has completed this stage")
+
+
+class StagePartial(BaseModel):
+    """
+    Sparse stage returned with fields=a,b,c: `id` plus the requested fields.
+    Fields that were not requested are left out of the response.
+    """
+    id: int
+    category_id: Optional[int] = None
+    order: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    content: Optional[str] = None
+    challenge_description: Optional[str] = None
+    media_url: Optional[str] = None
+    media_type: Optional[str] = None
+    media_filename: Optional[str] = None
+    interactive_config: Optional[InteractiveConfig] = None
+    professor_id: Optional[int] = None
+    approval_status: Optional[str] = None
+    approval_comment: Optional[str] = None
+    submitted_at: Optional[datetime] = None
+    is_active: Optional[bool] = None
+    is_archived: Optional[bool] = None
+
+    class Config:
+        from_attributes = True
+
+
+class StagePartialWithProgress(StagePartial):
+    """Sparse stage with user progress information"""
+    is_unlocked: bool = Field(..., description="Whether this stage is unlocked for the user")
+    is_completed: bool = Field(..., description="Whether the user has completed this stage")
+
+
 class UserStageProgressBase(BaseModel):
     """Base schema for UserStageProgress"""
     user_id: int
@@ -75,7 +133,7 @@ class UserStageProgressUpdate(BaseModel):
 
 class UserStageProgress(UserStageProgressBase):
     """Schema for returning user stage progress"""
-    id: int
+    id: Optional[int] = Field(None, description="Progress row ID (not set when progress is derived from the compact store)")
 
     class Config:
         from_attributes = True
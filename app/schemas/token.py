@@ -4,9 +4,29 @@ from pydantic import BaseModel
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # Access token lifetime in seconds
     user_email: str
     user_role: str
     user_name: Optional[str] = None
 
 class TokenPayload(BaseModel):
     sub: Optional[str] = None
+    exp: Optional[int] = None
+    jti: Optional[str] = None
+    type: Optional[str] = None  # "access" or "refresh"; tokens issued before refresh tokens have none
+    # Role claims, access tokens only
+    role: Optional[str] = None
+    is_superuser: Optional[bool] = None
+    is_professor: Optional[bool] = None
+    ver: Optional[int] = None
+
+class TokenPrincipal(BaseModel):
+    """Caller identity and roles read from the signed access token, without loading the user"""
+    id: int
+    role: Optional[str] = None
+    is_superuser: bool = False
+    is_professor: bool = False
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
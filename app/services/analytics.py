@@ -1,10 +1,11 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from sqlalchemy import and_, func, case
 from typing import List, Dict, Any, Optional
 import datetime
 
 from app.models.feedback import StudentAttempt, StageFeedback
-from app.models.stage import UserStageProgress, Stage
+from app.core.config import settings
+from app.models.stage import UserCategoryProgress, UserStageProgress, Stage
 from app.models.category import Category
 
 class AnalyticsService:
@@ -24,9 +25,22 @@ class AnalyticsService:
         total_students = db.query(User).filter(User.is_active == True, User.is_superuser == False).count()
         
         # 2. Completion Rate
-        # Count all UserStageProgress where is_completed=True vs Total UserStageProgress
-        total_progress_records = db.query(UserStageProgress).count()
-        completed_records = db.query(UserStageProgress).filter(UserStageProgress.is_completed == True).count()
+        if settings.PROGRESS_STORE == "compact":
+            # Every (student, approved stage) pair of the categories they started vs the completed ones
+            pairs = db.query(UserCategoryProgress).join(
+                Stage,
+                and_(
+                    Stage.category_id == UserCategoryProgress.category_id,
+                    Stage.is_active == True,
+                    Stage.approval_status == "approved"
+                )
+            )
+            total_progress_records = pairs.count()
+            completed_records = pairs.filter(Stage.order <= UserCategoryProgress.highest_completed_order).count()
+        else:
+            # Count all UserStageProgress where is_completed=True vs Total UserStageProgress
+            total_progress_records = db.query(UserStageProgress).count()
+            completed_records = db.query(UserStageProgress).filter(UserStageProgress.is_completed == True).count()
         
         completion_rate = 0.0
         if total_progress_records > 0:
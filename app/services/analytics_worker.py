@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsRefreshWorker:
+    """
+    In-process background worker that rebuilds StageAnalytics rows from the
+    attempts table, for reconciliation only.
+
+    Attempts keep the counters up to date incrementally inside their own
+    transaction and never mark stages here; an admin request
+    (POST /api/analytics/reconcile) does. Marks for the same stage are
+    coalesced and debounced, so repeated requests result in a single rebuild
+    once the stage has been quiet for `debounce_seconds` (or at most
+    `max_delay_seconds` after its first mark).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        debounce_seconds: float = 5.0,
+        max_pending: int = 1000,
+        max_delay_seconds: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds or debounce_seconds * 6
+        self.max_pending = max_pending
+
+        # stage_id -> (first mark, last mark) as monotonic timestamps
+        self._pending: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.marked = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.refreshed = 0
+        self.errors = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="analytics-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, flush: bool = True) -> None:
+        """Stop the worker, refreshing every pending stage first if `flush` is set."""
+        if not self.is_running:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        if flush:
+            self._refresh(self._take_due(force=True))
+
+    def mark_dirty(self, stage_id: int) -> bool:
+        """
+        Schedule a refresh of a stage's analytics.
+        Returns False if the mark was rejected because the worker is not
+        running or the queue is full.
+        """
+        if not self.is_running:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if stage_id in self._pending:
+                first_mark, _ = self._pending[stage_id]
+                self._pending[stage_id] = (first_mark, now)
+                self.coalesced += 1
+                return True
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending[stage_id] = (now, now)
+            self.marked += 1
+        self._wakeup.set()
+        return True
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            depth = len(self._pending)
+            oldest = min((first for first, _ in self._pending.values()), default=None)
+        return {
+            "running": self.is_running,
+            "queue_depth": depth,
+            "max_pending": self.max_pending,
+            "oldest_pending_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+            "marked": self.marked,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "refreshed": self.refreshed,
+            "errors": self.errors,
+            "last_lag_seconds": round(self.last_lag_seconds, 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+        }
+
+    def _take_due(self, force: bool = False) -> Dict[int, float]:
+        """Pop the stages whose debounce window has elapsed. Returns stage_id -> first mark."""
+        now = time.monotonic()
+        due = {}
+        with self._lock:
+            for stage_id, (first_mark, last_mark) in list(self._pending.items()):
+                if (
+                    force
+                    or now - last_mark >= self.debounce_seconds
+                    or now - first_mark >= self.max_delay_seconds
+                ):
+                    due[stage_id] = first_mark
+                    del self._pending[stage_id]
+        return due
+
+    def _next_deadline(self) -> Optional[float]:
+        with self._lock:
+            if not self._pending:
+                return None
+            deadline = min(
+                min(last + self.debounce_seconds, first + self.max_delay_seconds)
+                for first, last in self._pending.values()
+            )
+        return max(0.0, deadline - time.monotonic())
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(timeout=self._next_deadline())
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            due = self._take_due()
+            if due:
+                self._refresh(due)
+
+    def _refresh(self, due: Dict[int, float]) -> None:
+        if not due:
+            return
+        from app.crud import crud_feedback
+
+        db = self.session_factory()
+        try:
+            for stage_id, first_mark in due.items():
+                try:
+                    crud_feedback.update_stage_analytics(db, stage_id)
+                    self.refreshed += 1
+                except Exception:
+                    db.rollback()
+                    self.errors += 1
+                    logger.exception("Could not refresh analytics for stage %s", stage_id)
+                    continue
+                lag = time.monotonic() - first_mark
+                self.last_lag_seconds = lag
+                self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        finally:
+            db.close()
+
+
+analytics_worker = AnalyticsRefreshWorker(
+    debounce_seconds=settings.ANALYTICS_REFRESH_DEBOUNCE_SECONDS,
+    max_pending=settings.ANALYTICS_REFRESH_MAX_PENDING,
+)
@@ -0,0 +1,86 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.schemas.category import CategoryMetrics
+
+# Session.info key of the categories to invalidate when the session commits
+_PENDING = "category_metrics_pending"
+
+
+class CategoryMetricsCache:
+    """
+    In-memory cache of the CategoryMetrics of each category (admin detail page).
+
+    Stage and progress writes call `invalidate` after committing, or
+    `invalidate_on_commit` when the caller owns the transaction. As in the
+    stage sequence cache, a load that raced with an invalidation is not
+    cached, and entries expire after `ttl_seconds` so other worker processes
+    pick up changes they were not notified about.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        # category_id -> (version, loaded_at, metrics)
+        self._metrics: Dict[int, Tuple[Tuple[int, int], float, CategoryMetrics]] = {}
+        self._versions: Dict[int, int] = {}
+        # Bumped by clear(), so loads racing with it aren't cached either
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, *category_ids: Optional[int]) -> None:
+        with self._lock:
+            for category_id in category_ids:
+                if category_id is None:
+                    continue
+                self._versions[category_id] = self._versions.get(category_id, 0) + 1
+                self._metrics.pop(category_id, None)
+
+    def invalidate_on_commit(self, db: Session, *category_ids: Optional[int]) -> None:
+        """Invalidate once `db` commits; dropped if it rolls back"""
+        db.info.setdefault(_PENDING, set()).update(category_ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+            self._generation += 1
+
+    def get(self, category_id: int, load: Callable[[], CategoryMetrics]) -> CategoryMetrics:
+        """Cached metrics of a category, computed with `load` on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            version = (self._generation, self._versions.get(category_id, 0))
+            cached = self._metrics.get(category_id)
+            if cached and cached[0] == version and now - cached[1] < self.ttl_seconds:
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+
+        metrics = load()
+
+        with self._lock:
+            # Only cache if nothing was invalidated while we were loading
+            if (self._generation, self._versions.get(category_id, 0)) == version:
+                self._metrics[category_id] = (version, now, metrics)
+        return metrics
+
+
+category_metrics = CategoryMetricsCache(ttl_seconds=settings.CATEGORY_METRICS_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        category_metrics.invalidate(*pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_rolled_back(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING, None)
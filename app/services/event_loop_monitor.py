@@ -0,0 +1,298 @@
+import ast
+import asyncio
+import inspect
+import logging
+import textwrap
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, NamedTuple, Optional, Set
+
+from fastapi import routing
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.routes import route_template
+
+logger = logging.getLogger(__name__)
+
+# Calls that block the calling thread on database or disk I/O
+BLOCKING_MODULES = ("app.crud",)
+BLOCKING_FUNCTIONS = {
+    "app.core.media.save_upload_file",
+    "app.core.media.compress_image",
+    "app.core.media.delete_file",
+}
+
+
+class BlockingRoute(NamedTuple):
+    route: str
+    endpoint: str
+    calls: List[str]
+
+
+def _call_chain(node: ast.AST) -> Optional[List[str]]:
+    """`a.b.c` -> ["a", "b", "c"]; None for anything that isn't a plain dotted name"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return parts[::-1]
+
+
+def _is_blocking(target) -> bool:
+    if inspect.iscoroutinefunction(target):
+        return False
+    if inspect.ismodule(target):
+        return target.__name__.startswith(BLOCKING_MODULES)
+    module = getattr(target, "__module__", None) or ""
+    name = f"{module}.{getattr(target, '__qualname__', '')}"
+    return module.startswith(BLOCKING_MODULES) or name in BLOCKING_FUNCTIONS
+
+
+def _blocking_calls(fn: Callable, seen: Set[Callable], depth: int = 0) -> List[str]:
+    """
+    Direct blocking calls made by `fn`, following plain helper functions of
+    the app a few levels down. Functions only passed around (to run_sync or
+    run_in_threadpool) are not calls and are not reported.
+    """
+    fn = inspect.unwrap(fn)
+    if fn in seen or depth > 3:
+        return []
+    seen.add(fn)
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(fn)))
+    except (OSError, TypeError, SyntaxError):
+        return []
+
+    # Parameters holding a sync Session (e.g. `db: Session = Depends(get_db)`)
+    sessions = {
+        name for name, parameter in inspect.signature(fn).parameters.items()
+        if parameter.annotation is Session
+    }
+    calls = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        chain = _call_chain(node.func)
+        if not chain:
+            continue
+        if chain[0] in sessions and len(chain) > 1:
+            calls.append(".".join(chain))
+            continue
+        target = fn.__globals__.get(chain[0])
+        for attr in chain[1:]:
+            target = getattr(target, attr, None)
+        if target is None:
+            continue
+        if _is_blocking(target):
+            calls.append(".".join(chain))
+        elif (
+            inspect.isfunction(target)
+            and not inspect.iscoroutinefunction(target)
+            and target.__module__.startswith("app.")
+        ):
+            calls += [f"{chain[-1]} -> {call}" for call in _blocking_calls(target, seen, depth + 1)]
+    return calls
+
+
+def _api_routes(routes):
+    """(full path, APIRoute) pairs, including the routes of included routers"""
+    if hasattr(routing, "iter_route_contexts"):
+        for context in routing.iter_route_contexts(routes):
+            if isinstance(context.original_route, APIRoute):
+                yield context.path, context.original_route
+    else:
+        for route in routes:
+            if isinstance(route, APIRoute):
+                yield route.path, route
+
+
+def audit_blocking_routes(routes) -> List[BlockingRoute]:
+    """
+    Find `async def` routes that call the sync CRUD layer, a sync Session or
+    blocking media helpers directly, which stalls the event loop for every
+    request in the worker. Such routes should be plain `def` (run in the
+    threadpool) or hand the work to run_in_threadpool / AsyncSession.run_sync.
+    """
+    findings = []
+    for path, route in _api_routes(routes):
+        if not inspect.iscoroutinefunction(route.endpoint):
+            continue
+        calls = _blocking_calls(route.endpoint, set())
+        if calls:
+            methods = ",".join(sorted(route.methods))
+            findings.append(BlockingRoute(f"{methods} {path}", route.endpoint.__qualname__, calls))
+    return findings
+
+
+def log_blocking_routes(routes) -> List[BlockingRoute]:
+    findings = audit_blocking_routes(routes)
+    for finding in findings:
+        logger.warning(
+            "Async route %s (%s) blocks the event loop: %s",
+            finding.route, finding.endpoint, ", ".join(finding.calls)
+        )
+    return findings
+
+
+class RouteStalls:
+    __slots__ = ("requests", "stalled", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        self.requests = 0
+        self.stalled = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class EventLoopMonitor:
+    """
+    Measures event-loop lag with a ticker task: each tick sleeps `interval`
+    seconds and records how late it woke up. A request is charged the lag of
+    every tick that ended while it was in flight, so a route that blocks the
+    loop shows up in its own stats and in those of the requests it delayed.
+    Requests stalled for at least `stall_threshold` seconds are logged.
+    """
+
+    def __init__(self, interval: float = 0.1, stall_threshold: float = 0.1, max_samples: int = 10000):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        # (tick end on the perf_counter clock, lag seconds); only late ticks are kept
+        self._samples: "deque[tuple]" = deque(maxlen=max_samples)
+        self._routes: Dict[str, RouteStalls] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # When the pending tick is due; a loop busy past it is stalling right now
+        self._due = 0.0
+        self.ticks = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start ticking on the running event loop"""
+        if not self.running and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._tick())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _tick(self) -> None:
+        # Lag below a millisecond is scheduling noise, not a stall
+        noise = 0.001
+        while True:
+            start = time.perf_counter()
+            self._due = start + self.interval
+            await asyncio.sleep(self.interval)
+            end = time.perf_counter()
+            lag = max(end - start - self.interval, 0.0)
+            with self._lock:
+                self.ticks += 1
+                self.last_lag = lag
+                self.total_lag += lag
+                self.max_lag = max(self.max_lag, lag)
+                if lag >= noise:
+                    self._samples.append((end, lag))
+
+    def stall_between(self, start: float, end: float) -> float:
+        """
+        Loop lag between two perf_counter readings. When `end` is now, the
+        pending tick may not have fired yet because the loop is still busy;
+        that overdue time counts too.
+        """
+        recorded = 0.0
+        with self._lock:
+            # Samples are in tick order: walk back from the newest one
+            for tick_end, lag in reversed(self._samples):
+                if tick_end < start:
+                    break
+                if tick_end <= end:
+                    recorded += lag
+        return recorded + max(0.0, end - max(self._due, start))
+
+    def record_request(self, route: str, start: float, end: float) -> float:
+        stall = self.stall_between(start, end)
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStalls()
+            stats.requests += 1
+            stats.total_seconds += stall
+            stats.max_seconds = max(stats.max_seconds, stall)
+            if stall >= self.stall_threshold:
+                stats.stalled += 1
+        if stall >= self.stall_threshold:
+            logger.warning("%s waited %.0f ms on a blocked event loop", route, stall * 1000)
+        return stall
+
+    def lag_samples(self, attribute: str) -> List[tuple]:
+        """`last_lag` or `max_lag` as a single Prometheus sample"""
+        with self._lock:
+            return [(getattr(self, attribute),)]
+
+    def stalled_samples(self) -> List[tuple]:
+        """(method, route, stalled requests) for every route seen"""
+        with self._lock:
+            return [(*route.split(" ", 1), stats.stalled) for route, stats in sorted(self._routes.items())]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            routes = {
+                route: {
+                    "requests": stats.requests,
+                    "stalled_requests": stats.stalled,
+                    "avg_stall_ms": round(stats.total_seconds / stats.requests * 1000, 2),
+                    "max_stall_ms": round(stats.max_seconds * 1000, 2),
+                }
+                for route, stats in sorted(self._routes.items())
+            }
+            return {
+                "running": self.running,
+                "interval_ms": self.interval * 1000,
+                "stall_threshold_ms": self.stall_threshold * 1000,
+                "ticks": self.ticks,
+                "last_lag_ms": round(self.last_lag * 1000, 2),
+                "avg_lag_ms": round(self.total_lag / self.ticks * 1000, 2) if self.ticks else 0.0,
+                "max_lag_ms": round(self.max_lag * 1000, 2),
+                "routes": routes,
+            }
+
+
+class EventLoopStallMiddleware:
+    """ASGI middleware charging each request the event-loop lag seen while it ran"""
+
+    def __init__(self, app, monitor: EventLoopMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.monitor.running:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.record_request(f"{scope['method']} {route_template(scope)}", start, time.perf_counter())
+
+
+event_loop_monitor = EventLoopMonitor(
+    interval=settings.EVENT_LOOP_MONITOR_INTERVAL_SECONDS,
+    stall_threshold=settings.EVENT_LOOP_STALL_THRESHOLD_SECONDS,
+)
@@ -0,0 +1,215 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_category
+from app.models.stage import Stage
+from app.schemas.interactive import (
+    ChallengeSubmission,
+    GradeResult,
+    InteractiveConfig,
+    InteractiveType,
+)
+
+
+class GradingError(ValueError):
+    """The stage has no gradable challenge, or the submission doesn't fit it"""
+
+
+def _result(correct_count: int, total_count: int, incorrect_ids: List[str], is_correct: bool) -> GradeResult:
+    return GradeResult(
+        is_correct=is_correct,
+        score=correct_count / total_count if total_count else 0.0,
+        correct_count=correct_count,
+        total_count=total_count,
+        incorrect_ids=incorrect_ids,
+    )
+
+
+def _require(value, field: str, challenge_type: InteractiveType):
+    if value is None:
+        raise GradingError(f"A {challenge_type.value} submission needs '{field}'")
+    return value
+
+
+class OrderingKey:
+    challenge_type = InteractiveType.ORDERING
+
+    def __init__(self, correct_order: List[str]):
+        # element id -> expected index
+        self.position: Dict[str, int] = {element_id: index for index, element_id in enumerate(correct_order)}
+        self.order = list(correct_order)
+
+    def grade(self, submission: ChallengeSubmission) -> GradeResult:
+        submitted = _require(submission.order, "order", self.challenge_type)
+        placed = {
+            element_id for index, element_id in enumerate(submitted)
+            if self.position.get(element_id) == index
+        }
+        incorrect = [element_id for element_id in self.order if element_id not in placed]
+        incorrect += [element_id for element_id in submitted if element_id not in self.position]
+        return _result(len(placed), len(self.order), incorrect, not incorrect and len(submitted) == len(self.order))
+
+
+class MatchingKey:
+    challenge_type = InteractiveType.MATCHING
+
+    def __init__(self, pairs: List[Tuple[str, str]]):
+        # left id -> right id
+        self.pairs: Dict[str, str] = dict(pairs)
+
+    def grade(self, submission: ChallengeSubmission) -> GradeResult:
+        submitted = _require(submission.pairs, "pairs", self.challenge_type)
+        matched = set()
+        wrong = []
+        for pair in submitted:
+            if self.pairs.get(pair.left_id) == pair.right_id and pair.left_id not in matched:
+                matched.add(pair.left_id)
+            else:
+                wrong.append(pair.left_id)
+        incorrect = [left_id for left_id in self.pairs if left_id not in matched]
+        incorrect += [left_id for left_id in wrong if left_id not in self.pairs or left_id in matched]
+        return _result(len(matched), len(self.pairs), incorrect, not incorrect and not wrong)
+
+
+class ClassificationKey:
+    challenge_type = InteractiveType.CLASSIFICATION
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        # element id -> categories it belongs to
+        self.allowed: Dict[str, FrozenSet[str]] = {}
+        for category_id, element_ids in categories.items():
+            for element_id in element_ids:
+                self.allowed[element_id] = self.allowed.get(element_id, frozenset()) | {category_id}
+
+    def grade(self, submission: ChallengeSubmission) -> GradeResult:
+        submitted = _require(submission.classification, "classification", self.challenge_type)
+        placed = set()
+        wrong = []
+        for category_id, element_ids in submitted.items():
+            for element_id in element_ids:
+                if category_id in self.allowed.get(element_id, ()):
+                    placed.add(element_id)
+                else:
+                    wrong.append(element_id)
+        incorrect = [element_id for element_id in self.allowed if element_id not in placed]
+        incorrect += [element_id for element_id in wrong if element_id in placed or element_id not in self.allowed]
+        return _result(len(placed), len(self.allowed), incorrect, not incorrect and not wrong)
+
+
+class MultipleChoiceKey:
+    challenge_type = InteractiveType.MULTIPLE_CHOICE
+
+    def __init__(self, option_ids: List[str], correct_ids: List[str]):
+        self.option_ids = list(option_ids)
+        self.correct: FrozenSet[str] = frozenset(correct_ids)
+
+    def grade(self, submission: ChallengeSubmission) -> GradeResult:
+        selected = set(_require(submission.selected_ids, "selected_ids", self.challenge_type))
+        # Every option is an item: right when its selected state matches the key
+        mismatched = [
+            option_id for option_id in self.option_ids
+            if (option_id in selected) != (option_id in self.correct)
+        ]
+        unknown = sorted(selected.difference(self.option_ids))
+        correct_count = len(self.option_ids) - len(mismatched)
+        return _result(correct_count, len(self.option_ids), mismatched + unknown, not mismatched and not unknown)
+
+
+def compile_answer_key(config: InteractiveConfig):
+    """Build the lookup structures used to grade submissions for a challenge"""
+    challenge_type = config.challenge_type
+    if challenge_type == InteractiveType.ORDERING:
+        if not config.correct_order:
+            raise GradingError("Ordering challenge has no correct_order")
+        return OrderingKey(config.correct_order)
+    if challenge_type == InteractiveType.MATCHING:
+        if not config.matching_pairs:
+            raise GradingError("Matching challenge has no matching_pairs")
+        return MatchingKey([(pair.left_id, pair.right_id) for pair in config.matching_pairs])
+    if challenge_type == InteractiveType.CLASSIFICATION:
+        if not config.classification_categories:
+            raise GradingError("Classification challenge has no classification_categories")
+        return ClassificationKey({
+            category.id: category.correct_element_ids for category in config.classification_categories
+        })
+    if not config.correct_option_ids:
+        raise GradingError("Multiple choice challenge has no correct_option_ids")
+    return MultipleChoiceKey([element.id for element in config.elements], config.correct_option_ids)
+
+
+class AnswerKeyCache:
+    """
+    Bounded LRU of compiled answer keys per stage.
+
+    Entries are tagged with the category's persisted stage_version (bumped
+    on every stage write), so an edited challenge is recompiled on the next
+    submission in every worker process.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        # stage_id -> ((category_id, stage_version), key)
+        self._keys: "OrderedDict[int, Tuple[Tuple[int, int], object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+
+    def get(self, db: Session, stage: Stage):
+        version = crud_category.get_stage_version(db, stage.category_id)
+        tag = (stage.category_id, version[0] if version else 0)
+        with self._lock:
+            cached = self._keys.get(stage.id)
+            if cached and cached[0] == tag:
+                self._keys.move_to_end(stage.id)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        if not stage.interactive_config:
+            raise GradingError("This stage has no interactive challenge")
+        key = compile_answer_key(InteractiveConfig.model_validate(stage.interactive_config))
+        with self._lock:
+            self._keys[stage.id] = (tag, key)
+            self._keys.move_to_end(stage.id)
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+        return key
+
+
+answer_keys = AnswerKeyCache(max_entries=settings.ANSWER_KEY_CACHE_SIZE)
+
+
+def grade_submission(db: Session, stage: Stage, submission: ChallengeSubmission) -> GradeResult:
+    return answer_keys.get(db, stage).grade(submission)
+
+
+def has_answer_key(db: Session, stage: Stage) -> bool:
+    """Whether the stage's challenge is graded on the server, so success can't be self-reported"""
+    if not stage.interactive_config:
+        return False
+    try:
+        answer_keys.get(db, stage)
+    except ValueError:
+        # No gradable key, or a config that doesn't validate: nothing to grade against
+        return False
+    return True
+
+
+def grade_batch(db: Session, stage: Stage, submissions: List[ChallengeSubmission]) -> List[GradeResult]:
+    """Grade many submissions against one stage; the key is looked up once"""
+    key = answer_keys.get(db, stage)
+    results = []
+    for index, submission in enumerate(submissions):
+        try:
+            results.append(key.grade(submission))
+        except GradingError as e:
+            raise GradingError(f"Submission {index}: {e}")
+    return results
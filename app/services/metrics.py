@@ -0,0 +1,264 @@
+import bisect
+import threading
+import time
+import weakref
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.routes import route_template
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = self.header()
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Collected(_Metric):
+    """Gauge or counter whose samples are read from elsewhere at scrape time"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable[[], Iterable[tuple]], kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, sample[:-1])} {_number(sample[-1])}" for sample in self.collect()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by method, route template and status", ("method", "route", "status")
+))
+LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to the end of the response body", ("method", "route")
+))
+IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "Requests being handled"))
+REQUEST_SIZE = registry.register(Histogram(
+    "http_request_size_bytes", "Request body size (Content-Length)", ("method", "route"), SIZE_BUCKETS
+))
+RESPONSE_SIZE = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size", ("method", "route"), SIZE_BUCKETS
+))
+POOL_WAIT = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection", ("pool",), POOL_WAIT_BUCKETS
+))
+
+# Pools created with a timed pool class, for the checked-out gauge
+_pools: "weakref.WeakSet" = weakref.WeakSet()
+
+
+class _TimedPoolMixin:
+    """Records how long each checkout waited; label from create_engine(pool_logging_name=...)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.add(self)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start, self._orig_logging_name or "default")
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_samples():
+    for name, checked_out in sorted((pool._orig_logging_name or "default", pool.checkedout()) for pool in list(_pools)):
+        yield name, checked_out
+
+
+registry.register(Collected(
+    "db_pool_checked_out_connections", "Connections currently checked out of each pool", ("pool",), _pool_samples
+))
+
+
+# cache name -> callable returning (hits, misses)
+_caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], Tuple[int, int]]) -> None:
+    """Expose hits, misses and hit ratio of a cache; `stats` returns (hits, misses)"""
+    _caches[name] = stats
+
+
+def _cache_samples(index: int):
+    for name, stats in sorted(_caches.items()):
+        yield name, stats()[index]
+
+
+def _cache_ratios():
+    for name, stats in sorted(_caches.items()):
+        hits, misses = stats()
+        yield name, hits / (hits + misses) if hits + misses else 0.0
+
+
+registry.register(Collected("cache_hits_total", "Cache hits", ("cache",), lambda: _cache_samples(0), "counter"))
+registry.register(Collected("cache_misses_total", "Cache misses", ("cache",), lambda: _cache_samples(1), "counter"))
+registry.register(Collected("cache_hit_ratio", "Hits over lookups since start", ("cache",), _cache_ratios))
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording request count, latency, in-flight requests and
+    request/response sizes per route template. Unmatched paths share the
+    "unmatched" route so scanners can't blow up the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = "500"
+        response_size = 0
+
+        async def send_and_measure(message):
+            nonlocal status, response_size
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            IN_FLIGHT.dec()
+            method, route = scope["method"], route_template(scope)
+            REQUESTS.inc(method, route, status)
+            LATENCY.observe(time.perf_counter() - start, method, route)
+            RESPONSE_SIZE.observe(response_size, method, route)
+            request_size = _content_length(scope)
+            if request_size is not None:
+                REQUEST_SIZE.observe(request_size, method, route)
+
+
+def _content_length(scope) -> Optional[int]:
+    for name, value in scope.get("headers", ()):
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.schemas.token import TokenPayload
+from app.schemas.user import User as UserSnapshot
+
+
+class PrincipalCache:
+    """
+    Bounded TTL/LRU cache of verified access tokens -> user snapshots.
+
+    A hit skips both the JWT decode and the SELECT on users; the decoded
+    claims are kept with the snapshot so callers can still run the in-memory
+    revocation checks on every request. Entries expire after `ttl_seconds` or
+    when the token itself expires, whichever is first. Changes to a user's
+    flags must call `invalidate(user_id)`; other worker processes see them
+    through the revocation list or once their own entries expire. A TTL of 0
+    disables the cache.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # token -> (expires_at wall clock, user snapshot, decoded claims)
+        self._entries: "OrderedDict[str, Tuple[float, UserSnapshot, TokenPayload]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        # Bumped by invalidate; a lookup that raced with it is not stored
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def generation(self, user_id: int) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def get(self, token: str) -> Optional[Tuple[UserSnapshot, TokenPayload]]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, snapshot, token_data = entry
+            if expires_at <= now:
+                self._remove(token, snapshot.id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return snapshot, token_data
+
+    def put(self, token: str, snapshot: UserSnapshot, token_data: TokenPayload, generation: int) -> None:
+        """Store a snapshot loaded while the user's generation was `generation`"""
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_data.exp is not None:
+            expires_at = min(expires_at, token_data.exp)
+        with self._lock:
+            if self._generations.get(snapshot.id, 0) != generation:
+                return
+            self._entries[token] = (expires_at, snapshot, token_data)
+            self._entries.move_to_end(token)
+            self._tokens_by_user.setdefault(snapshot.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                old_token, (_, old_snapshot, _) = self._entries.popitem(last=False)
+                self._forget_token(old_token, old_snapshot.id)
+                self.evictions += 1
+
+    def discard(self, token: str) -> None:
+        """Drop one cached token (revoked on its own, e.g. by a logout elsewhere)"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                self._remove(token, entry[1].id)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop every cached token of a user (blocked, deleted, deactivated or updated)"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for token in self._tokens_by_user.pop(user_id, ()):
+                self._entries.pop(token, None)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, token: str, user_id: int) -> None:
+        self._entries.pop(token, None)
+        self._forget_token(token, user_id)
+
+    def _forget_token(self, token: str, user_id: int) -> None:
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_SIZE,
+)
@@ -0,0 +1,132 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.routes import route_template
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """SQL statements run on behalf of one request (or one count_queries block)"""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # Parameterized SQL -> times run; an N+1 loop repeats one statement
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        """(statement, times) run more than `threshold` times, most repeated first"""
+        return [(statement, times) for statement, times in self.statements.most_common() if times > threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+
+# Stats of the request being handled; copied into threadpool workers and greenlets with the context
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# count_queries blocks see every statement, whatever request or thread runs it
+_captures: List[QueryStats] = []
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None or _captures:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None and not _captures:
+        return
+    starts = conn.info.get("query_start")
+    elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for capture in _captures:
+        capture.record(statement, elapsed)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Count every statement run on any engine while the block runs (for tests and scripts)"""
+    stats = QueryStats()
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    Fail when the block runs more than `limit` statements, e.g.
+
+        with assert_max_queries(3):
+            client.get("/categories/1/students", headers=admin)
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        lines = "\n".join(
+            f"  {times}x {' '.join(statement.split())}" for statement, times in stats.statements.most_common()
+        )
+        raise AssertionError(f"{stats.count} queries run, at most {limit} expected:\n{lines}")
+
+
+class QueryCounterMiddleware:
+    """
+    ASGI middleware counting the SQL statements and database time of each
+    request. Both go out in a Server-Timing header, and statements repeated
+    more than `repeat_threshold` times (the N+1 pattern) are logged.
+    Statements run after the response has started are only in the log.
+    """
+
+    def __init__(self, app, repeat_threshold: int = 10):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and stats.count:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            for statement, times in stats.repeated(self.repeat_threshold):
+                logger.warning(
+                    "Possible N+1 in %s %s: statement run %s times (%s queries in the request): %s",
+                    scope["method"], route_template(scope), times, stats.count, " ".join(statement.split())
+                )
@@ -0,0 +1,149 @@
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.token import RevokedToken
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+def _jti_key(jti: str) -> int:
+    # 64-bit digest: a compact int per revoked token, collisions are negligible
+    return int.from_bytes(hashlib.blake2b(jti.encode(), digest_size=8).digest(), "big")
+
+
+class RevocationList:
+    """
+    In-memory set of revoked token ids and revoked (blocked or inactive) users,
+    so token checks on the request path never touch the database.
+
+    It also holds each user's current token_version (only users whose version
+    was ever bumped), so role claims in older access tokens can be rejected.
+
+    Revocations are written to the database first (revoked_tokens, users) and
+    the set is rebuilt from there at startup, then every `reload_seconds` by a
+    background thread (started in the app lifespan), which is how other worker
+    processes pick up revocations made elsewhere. Checks never reload.
+    """
+
+    def __init__(self, session_factory=SessionLocal, reload_seconds: float = 30.0):
+        self.session_factory = session_factory
+        self.reload_seconds = reload_seconds
+        # jti digest -> expiry (unix time)
+        self._tokens: Dict[int, float] = {}
+        self._users: Set[int] = set()
+        # user id -> current token_version, when above 0
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reload_errors = 0
+
+    def load(self, db: Session) -> None:
+        """Rebuild the set from the database; expired tokens drop out here"""
+        now = datetime.utcnow()
+        tokens = {
+            _jti_key(jti): expires_at.replace(tzinfo=timezone.utc).timestamp()
+            for jti, expires_at in db.query(RevokedToken.jti, RevokedToken.expires_at)
+            .filter(RevokedToken.expires_at > now)
+        }
+        users = {
+            user_id for (user_id,) in db.query(User.id)
+            .filter(or_(User.is_blocked == True, User.is_active == False))
+        }
+        versions = dict(db.query(User.id, User.token_version).filter(User.token_version > 0))
+        with self._lock:
+            self._tokens = tokens
+            self._users = users
+            self._versions = versions
+
+    def reload(self) -> None:
+        db = self.session_factory()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Reload every `reload_seconds` on a background thread until `stop`"""
+        if self.is_running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="revocation-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self.is_running:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.reload_seconds):
+            try:
+                self.reload()
+            except Exception:
+                # Keep serving the last loaded set; the next reload may succeed
+                self.reload_errors += 1
+                logger.exception("Reloading the revocation list failed")
+
+    def revoke_token(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._tokens[_jti_key(jti)] = expires_at
+
+    def revoke_user(self, user_id: int) -> None:
+        with self._lock:
+            self._users.add(user_id)
+
+    def restore_user(self, user_id: int) -> None:
+        with self._lock:
+            self._users.discard(user_id)
+
+    def sync_user(self, user) -> None:
+        """Track a user after its is_blocked / is_active flags changed"""
+        if user.is_blocked or not user.is_active:
+            self.revoke_user(user.id)
+        else:
+            self.restore_user(user.id)
+
+    def set_token_version(self, user_id: int, version: int) -> None:
+        with self._lock:
+            self._versions[user_id] = version
+
+    def is_token_revoked(self, jti: str) -> bool:
+        with self._lock:
+            return _jti_key(jti) in self._tokens
+
+    def is_user_revoked(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._users
+
+    def is_version_stale(self, user_id: int, version: int) -> bool:
+        """True when the user's roles changed after a token with `version` was issued"""
+        with self._lock:
+            return version < self._versions.get(user_id, 0)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "revoked_tokens": len(self._tokens),
+                "revoked_users": len(self._users),
+                "versioned_users": len(self._versions),
+                "reload_errors": self.reload_errors,
+            }
+
+
+revocation_list = RevocationList(reload_seconds=settings.REVOCATION_RELOAD_SECONDS)
@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.stage import Stage
+
+
+class StageSequenceCache:
+    """
+    In-memory, versioned cache of the ordered approved and active stage ids
+    of each category.
+
+    Next/previous/first stage lookups are answered from the cached sequence,
+    so gaps in `order` (soft deletes, rejections) are skipped naturally.
+    Stage writes call `invalidate`, which bumps the category version; a load
+    that raced with an invalidation is discarded instead of being cached.
+    Entries also expire after `ttl_seconds` so other worker processes pick up
+    changes they were not notified about.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        # category_id -> (version, loaded_at, stage ids)
+        self._sequences: Dict[int, Tuple[int, float, List[int]]] = {}
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, category_id: int) -> int:
+        with self._lock:
+            return self._versions.get(category_id, 0)
+
+    def invalidate(self, *category_ids: Optional[int]) -> None:
+        with self._lock:
+            for category_id in category_ids:
+                if category_id is None:
+                    continue
+                self._versions[category_id] = self._versions.get(category_id, 0) + 1
+                self._sequences.pop(category_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sequences.clear()
+
+    def get(self, db: Session, category_id: int) -> List[int]:
+        """Ordered ids of the approved, active stages of a category"""
+        now = time.monotonic()
+        with self._lock:
+            version = self._versions.get(category_id, 0)
+            cached = self._sequences.get(category_id)
+            if cached and cached[0] == version and now - cached[1] < self.ttl_seconds:
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+
+        stage_ids = [
+            stage_id for (stage_id,) in db.query(Stage.id)
+            .filter(
+                Stage.category_id == category_id,
+                Stage.is_active == True,
+                Stage.approval_status == "approved"
+            )
+            .order_by(Stage.order, Stage.id)
+            .all()
+        ]
+
+        with self._lock:
+            # Only cache if nothing was invalidated while we were loading
+            if self._versions.get(category_id, 0) == version:
+                self._sequences[category_id] = (version, now, stage_ids)
+        return stage_ids
+
+    def first_stage_id(self, db: Session, category_id: int) -> Optional[int]:
+        sequence = self.get(db, category_id)
+        return sequence[0] if sequence else None
+
+    def next_stage_id(self, db: Session, category_id: int, stage_id: int) -> Optional[int]:
+        sequence = self.get(db, category_id)
+        try:
+            position = sequence.index(stage_id)
+        except ValueError:
+            return None
+        return sequence[position + 1] if position + 1 < len(sequence) else None
+
+    def previous_stage_id(self, db: Session, category_id: int, stage_id: int) -> Optional[int]:
+        sequence = self.get(db, category_id)
+        try:
+            position = sequence.index(stage_id)
+        except ValueError:
+            return None
+        return sequence[position - 1] if position > 0 else None
+
+
+stage_sequence = StageSequenceCache(ttl_seconds=settings.STAGE_SEQUENCE_CACHE_TTL_SECONDS)
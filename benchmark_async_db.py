@@ -0,0 +1,169 @@
+"""
+Benchmark the student endpoints on the async session against the old blocking pattern.
+Run with: python benchmark_async_db.py [requests] [concurrency] [students]
+
+Seeds a throwaway SQLite database and fires concurrent
+GET /api/categories/{id}/stages/progress and POST /api/stages/{id}/attempts
+requests through the ASGI app twice:
+
+- blocking: get_async_db is overridden with a session whose run_sync calls the
+  CRUD function directly, i.e. sync SQLAlchemy inside `async def` as before.
+- async: the real AsyncSession (aiosqlite).
+
+Reports requests per second, latency percentiles and the worst event-loop
+stall seen by a ticker task running next to the requests.
+"""
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.api import deps
+from app.db import session as db_session
+from app.db.base import Base
+from app.core import security
+from app.services.revocation import revocation_list
+from app.models.category import Category
+from app.models.stage import Stage
+from app.models.user import User
+
+STAGES = 10
+TICK_SECONDS = 0.005
+
+
+class BlockingSession:
+    """Stands in for AsyncSession but runs the CRUD call on the event loop"""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.session, *args, **kwargs)
+
+
+def seed(db, students: int):
+    category = Category(name="Benchmark")
+    db.add(category)
+    db.flush()
+    stages = [
+        Stage(category_id=category.id, order=order, title=f"Stage {order}", approval_status="approved")
+        for order in range(1, STAGES + 1)
+    ]
+    users = [User(email=f"bench{i}@example.com", is_active=True) for i in range(students)]
+    db.add_all(stages + users)
+    db.commit()
+    headers = [
+        {"Authorization": f"Bearer {security.create_access_token(user.id, claims=security.role_claims(user))}"}
+        for user in users
+    ]
+    return category.id, stages[0].id, headers
+
+
+async def watch_loop(stop: asyncio.Event, stalls: list):
+    """Record how late each tick fires; a blocked loop shows up as a long stall"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        stalls.append((time.perf_counter() - start - TICK_SECONDS) * 1000)
+
+
+async def fire(category_id: int, stage_id: int, headers, requests: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, statuses, stalls = [], [], []
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def call(i):
+            auth = headers[i % len(headers)]
+            async with semaphore:
+                start = time.perf_counter()
+                if i % 2:
+                    r = await client.post(
+                        f"/api/stages/{stage_id}/attempts",
+                        json={"stage_id": stage_id, "is_successful": False},
+                        headers=auth
+                    )
+                else:
+                    r = await client.get(f"/api/categories/{category_id}/stages/progress", headers=auth)
+                timings.append((time.perf_counter() - start) * 1000)
+                statuses.append(r.status_code)
+
+        watcher = asyncio.create_task(watch_loop(stop, stalls))
+        start = time.perf_counter()
+        await asyncio.gather(*(call(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await watcher
+    return elapsed, sorted(timings), statuses, max(stalls, default=0.0)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    students = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    db_path = f"{tempfile.mkdtemp()}/bench.db"
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False},
+        pool_size=concurrency,
+    )
+    Base.metadata.create_all(bind=engine)
+    SyncSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", pool_size=concurrency)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False)
+
+    def override_get_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def blocking_get_async_db():
+        db = SyncSession()
+        try:
+            yield BlockingSession(db)
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    db = SyncSession()
+    category_id, stage_id, headers = seed(db, students)
+    db.close()
+
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_db] = override_get_db
+    # Revocation checks read the database outside the request's session
+    revocation_list.session_factory = SyncSession
+    print(f"{requests} requests, {concurrency} concurrent, {students} students\n")
+    print(f"{'session':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max stall ms':>14}{'errors':>8}")
+    try:
+        for name, dependency in (("blocking", blocking_get_async_db), ("async", override_get_async_db)):
+            app.dependency_overrides[db_session.get_async_db] = dependency
+            elapsed, timings, statuses, stall = asyncio.run(
+                fire(category_id, stage_id, headers, requests, concurrency)
+            )
+            asyncio.run(async_engine.dispose())
+            print(
+                f"{name:<10}{len(timings) / elapsed:>10.1f}{statistics.median(timings):>10.1f}"
+                f"{timings[int(len(timings) * 0.95)]:>10.1f}{stall:>14.1f}"
+                f"{sum(1 for code in statuses if code != 200):>8}"
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
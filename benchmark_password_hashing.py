@@ -0,0 +1,118 @@
+"""
+Benchmark login throughput with different hashing pool sizes and Argon2 parameters.
+Run with: python benchmark_password_hashing.py [logins] [concurrency] [pool sizes, comma separated]
+
+Seeds a throwaway SQLite database with users hashed using each Argon2 preset
+and fires concurrent POST /login/access-token requests through the ASGI app.
+Reports logins per second, latency percentiles and rejected (503) logins.
+"""
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.api import deps
+from app.db import session as db_session
+from app.db.base import Base
+from app.core import security
+from app.services.revocation import revocation_list
+from app.core.config import settings
+from app.models.user import User
+
+USERS = 20
+PASSWORD = "benchmark-password"
+
+# name -> (time_cost, memory_cost KiB, parallelism); None keeps the passlib default
+ARGON2_PRESETS = {
+    "passlib default": (None, None, None),
+    "owasp minimum": (2, 19456, 1),
+}
+
+
+async def fire_logins(emails, logins: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, statuses = [], []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login(i):
+            async with semaphore:
+                start = time.perf_counter()
+                r = await client.post(
+                    "/login/access-token",
+                    data={"username": emails[i % len(emails)], "password": PASSWORD}
+                )
+                timings.append((time.perf_counter() - start) * 1000)
+                statuses.append(r.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(logins)))
+        elapsed = time.perf_counter() - start
+    return elapsed, sorted(timings), statuses
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    pool_sizes = [int(n) for n in sys.argv[3].split(",")] if len(sys.argv) > 3 else [1, 2, 4, 8]
+
+    engine = create_engine(
+        f"sqlite:///{tempfile.mkdtemp()}/bench.db",
+        connect_args={"check_same_thread": False},
+        pool_size=concurrency,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_db] = override_get_db
+    # Revocation checks read the database outside the request's session
+    revocation_list.session_factory = TestingSessionLocal
+
+    original_context, original_hasher = security.pwd_context, security.password_hasher
+    print(f"{logins} logins, {concurrency} concurrent\n")
+    print(f"{'argon2 preset':<18}{'pool':>6}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'503s':>6}")
+    try:
+        for preset_index, (preset, params) in enumerate(ARGON2_PRESETS.items()):
+            security.pwd_context = security.make_password_context(*params)
+            hashed = security.pwd_context.hash(PASSWORD)
+            db = TestingSessionLocal()
+            emails = [f"bench{preset_index}-{i}@example.com" for i in range(USERS)]
+            db.add_all([User(email=email, hashed_password=hashed, is_active=True) for email in emails])
+            db.commit()
+            db.close()
+
+            for pool_size in pool_sizes:
+                security.password_hasher = security.PasswordHasherPool(
+                    max_workers=pool_size,
+                    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+                    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS,
+                )
+                elapsed, timings, statuses = asyncio.run(fire_logins(emails, logins, concurrency))
+                security.password_hasher.shutdown()
+                ok = statuses.count(200)
+                print(
+                    f"{preset:<18}{pool_size:>6}{ok / elapsed:>10.1f}"
+                    f"{statistics.median(timings):>10.1f}{timings[int(len(timings) * 0.95)]:>10.1f}"
+                    f"{statuses.count(503):>6}"
+                )
+    finally:
+        security.pwd_context, security.password_hasher = original_context, original_hasher
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark the row-per-stage progress store against the compact store.
+Run with: python benchmark_progress.py [students] [stages] [requests]
+
+Seeds a throwaway SQLite database with one category, migrates its progress
+to the compact store and times GET /api/categories/{id}/stages/progress
+with PROGRESS_STORE set to "rows" and to "compact".
+"""
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.api import deps
+from app.db import session as db_session
+from app.db.base import Base
+from app.core import security
+from app.services.revocation import revocation_list
+from app.core.config import settings
+from app.crud import crud_progress
+from app.models.category import Category
+from app.models.stage import Stage, UserStageProgress, UserCategoryProgress
+from app.models.user import User
+
+
+def seed(db, students: int, stages: int):
+    category = Category(name="Benchmark")
+    db.add(category)
+    db.flush()
+    stage_objs = [
+        Stage(category_id=category.id, order=order, title=f"Stage {order}",
+              content="x" * 500, approval_status="approved")
+        for order in range(1, stages + 1)
+    ]
+    users = [User(email=f"bench{i}@example.com", is_active=True) for i in range(students)]
+    db.add_all(stage_objs + users)
+    db.flush()
+
+    rng = random.Random(42)
+    progress = []
+    for user in users:
+        completed = rng.randint(0, stages)
+        for index, stage in enumerate(stage_objs):
+            progress.append({
+                "user_id": user.id,
+                "stage_id": stage.id,
+                "is_completed": index < completed,
+                "is_unlocked": index <= completed,
+            })
+    db.bulk_insert_mappings(UserStageProgress, progress)
+    db.commit()
+    return category.id, [user.id for user in users]
+
+
+def run(client, category_id, user_ids, requests: int):
+    headers = {
+        user_id: {"Authorization": f"Bearer {security.create_access_token(user_id, claims={'role': 'student', 'ver': 0})}"}
+        for user_id in user_ids
+    }
+    timings = []
+    responses = {}
+    for i in range(requests):
+        user_id = user_ids[i % len(user_ids)]
+        start = time.perf_counter()
+        r = client.get(f"/api/categories/{category_id}/stages/progress", headers=headers[user_id])
+        timings.append((time.perf_counter() - start) * 1000)
+        assert r.status_code == 200, r.text
+        responses[user_id] = [(s["id"], s["is_unlocked"], s["is_completed"]) for s in r.json()]
+    return timings, responses
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    stages = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+
+    db_path = f"{tempfile.mkdtemp()}/bench.db"
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # TestClient runs each request on its own event loop, so don't pool async connections
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_async_db] = override_get_async_db
+    # Revocation checks read the database outside the request's session
+    revocation_list.session_factory = TestingSessionLocal
+
+    db = TestingSessionLocal()
+    category_id, user_ids = seed(db, students, stages)
+    crud_progress.migrate_from_stage_rows(db)
+    row_counts = {
+        "rows": db.query(UserStageProgress).count(),
+        "compact": db.query(UserCategoryProgress).count(),
+    }
+    db.close()
+
+    print(f"{students} students x {stages} stages, {requests} requests per store\n")
+    print(f"{'store':<10}{'progress rows':>15}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+
+    original_store = settings.PROGRESS_STORE
+    results = {}
+    client = TestClient(app)
+    try:
+        for store in ("rows", "compact"):
+            settings.PROGRESS_STORE = store
+            run(client, category_id, user_ids[:10], 10)  # warm-up
+            timings, results[store] = run(client, category_id, user_ids, requests)
+            timings.sort()
+            print(
+                f"{store:<10}{row_counts[store]:>15}{statistics.mean(timings):>10.2f}"
+                f"{timings[len(timings) // 2]:>10.2f}{timings[int(len(timings) * 0.95)]:>10.2f}"
+            )
+    finally:
+        settings.PROGRESS_STORE = original_store
+        app.dependency_overrides.clear()
+
+    mismatches = [user_id for user_id in results["rows"] if results["rows"][user_id] != results["compact"].get(user_id)]
+    print(f"\nStores agree for {len(results['rows']) - len(mismatches)}/{len(results['rows'])} students.")
+
+
+if __name__ == "__main__":
+    main()
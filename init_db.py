@@ -2,81 +2,28 @@
 Database initialization script: migrations + seeds.
 Run with: poe init-db
 
-1. Creates/updates all tables (migrations).
-2. Applies manual column migrations for SQLite.
-3. Seeds default users (admin, professor, students).
+1. Creates/upgrades the schema (versioned migrations, app/db/migrations.py).
+2. Seeds default users (admin, professor, students).
 """
-import sqlite3
-import os
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal, engine
-from app.db.base import Base
+from app.db import migrations
+from app.db.session import SessionLocal, engine, writer_engine
 from app.core.security import get_password_hash
-from app.core.config import settings
 from app.models.user import User
 
-# Ensure ALL models are imported for metadata
-from app.models import user, audit, category, stage, feedback, transfer
-
 
 # ──────────────────────────────────────────────
 # 1. MIGRATIONS
 # ──────────────────────────────────────────────
 
 def run_migrations():
-    """Create tables and apply manual column migrations for SQLite."""
+    """Create or upgrade the schema with the versioned migrations."""
     print("\n🔄 Ejecutando migraciones...")
 
-    # Create all tables from models
-    Base.metadata.create_all(bind=engine)
-    print("  ✅ Tablas creadas/verificadas.")
-
-    # SQLite manual column migrations (ALTER TABLE)
-    if "sqlite" in settings.DATABASE_URL:
-        _sqlite_migrations()
-
-
-def _sqlite_migrations():
-    """Apply column additions that SQLAlchemy create_all won't handle on existing tables."""
-    db_path = settings.DATABASE_URL.replace("sqlite:///", "").replace("./", "")
-    
-    # Check if DB file exists before connecting
-    if not os.path.exists(db_path):
-        return
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    migrations = [
-        {
-            "table": "users",
-            "column": "role",
-            "sql": "ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'student'",
-            "post": "UPDATE users SET role = 'admin' WHERE is_superuser = 1",
-        },
-        {
-            "table": "users",
-            "column": "is_professor",
-            "sql": "ALTER TABLE users ADD COLUMN is_professor BOOLEAN DEFAULT 0",
-        },
-    ]
-
-    for m in migrations:
-        try:
-            cursor.execute(f"PRAGMA table_info({m['table']})")
-            columns = [col[1] for col in cursor.fetchall()]
-            if m["column"] not in columns:
-                cursor.execute(m["sql"])
-                if m.get("post"):
-                    cursor.execute(m["post"])
-                conn.commit()
-                print(f"  ✅ Columna '{m['column']}' añadida a '{m['table']}'.")
-            else:
-                print(f"  ✅ Columna '{m['column']}' ya existe en '{m['table']}'.")
-        except Exception as e:
-            print(f"  ⚠️ Error en migración para '{m['table']}.{m['column']}': {e}")
-
-    conn.close()
+    applied = migrations.upgrade(writer_engine or engine)
+    for migration in applied:
+        print(f"  ✅ Migración {migration.version}: {migration.description}")
+    print(f"  ✅ Esquema en la versión {migrations.LATEST_VERSION}.")
 
 
 # ──────────────────────────────────────────────
@@ -0,0 +1,34 @@
+"""
+Apply pending schema migrations.
+Run with: python migrate.py [--status]
+
+Brings the database at DATABASE_URL to the latest schema version (see
+app/db/migrations.py). Safe to run more than once. Run it before starting
+the workers when SCHEMA_AUTO_MIGRATE is off. --status only reports the
+current version.
+"""
+import sys
+
+from app.db import migrations
+from app.db.session import engine, writer_engine
+
+
+def main():
+    with engine.connect() as conn:
+        version = migrations.current_version(conn)
+    print(f"Schema version: {'unversioned' if version is None else version} (latest {migrations.LATEST_VERSION})")
+    if "--status" in sys.argv[1:]:
+        return
+
+    try:
+        applied = migrations.upgrade(writer_engine or engine)
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+    for migration in applied:
+        print(f"✅ {migration.version}: {migration.description}")
+    print(f"✅ Database at schema version {migrations.LATEST_VERSION}.")
+
+
+if __name__ == "__main__":
+    main()
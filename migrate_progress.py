@@ -0,0 +1,36 @@
+"""
+Migrate student progress to the compact store.
+Run with: python migrate_progress.py
+
+Builds one user_category_progress row per (user, category) from the
+user_stage_progress table. Safe to run more than once: pairs that already
+have a compact row are skipped. Set PROGRESS_STORE="compact" afterwards.
+"""
+from app.db.session import SessionLocal, engine
+from app.crud import crud_progress
+from app.models.stage import UserStageProgress, UserCategoryProgress
+
+
+def main():
+    # Make sure the compact table exists on databases created before it was added
+    UserCategoryProgress.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        stage_rows = db.query(UserStageProgress).count()
+        created = crud_progress.migrate_from_stage_rows(db)
+        compact_rows = db.query(UserCategoryProgress).count()
+
+        print(f"✅ {created} compact progress rows created.")
+        print(f"   user_stage_progress:    {stage_rows} rows")
+        print(f"   user_category_progress: {compact_rows} rows")
+        print('\nSet PROGRESS_STORE="compact" in .env to read and write the compact store.')
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
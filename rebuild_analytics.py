@@ -0,0 +1,32 @@
+"""
+Rebuild stage analytics from scratch.
+Run with: poe rebuild-analytics  (or python rebuild_analytics.py [stage_id ...])
+
+StageAnalytics rows are updated incrementally on every attempt. Use this
+script to repair them after manual data fixes or imports that bypass the API.
+"""
+import sys
+from app.db.session import SessionLocal
+from app.crud import crud_feedback
+
+
+def main():
+    db = SessionLocal()
+    try:
+        stage_ids = [int(arg) for arg in sys.argv[1:]]
+        if stage_ids:
+            for stage_id in stage_ids:
+                analytics = crud_feedback.update_stage_analytics(db, stage_id)
+                print(f"✅ Stage {stage_id}: {analytics.total_attempts} attempts, {analytics.success_rate:.1f}% success")
+        else:
+            count = crud_feedback.rebuild_all_stage_analytics(db)
+            print(f"✅ Rebuilt analytics for {count} stages.")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
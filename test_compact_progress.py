@@ -0,0 +1,206 @@
+"""
+Compact progress store test (PROGRESS_STORE=compact).
+Run with: python test_compact_progress.py  (or pytest test_compact_progress.py)
+
+Against a throwaway SQLite database, checks that locked stages and stages
+outside the approved sequence (pending) can't be completed through the API,
+that a rejected completion leaves the category pointer untouched, and that
+the admin metrics and student listing read the compact progress.
+"""
+import tempfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.crud import crud_progress
+from app.db import session as db_session
+from app.db.base import Base
+from app.models.category import Category
+from app.models.stage import Stage
+from app.models.user import User
+from app.services.principal_cache import principal_cache
+from app.services.revocation import revocation_list
+from app.services.stage_sequence import stage_sequence
+
+_tmp_dir = tempfile.mkdtemp()
+engine = create_engine(f"sqlite:///{_tmp_dir}/compact.db", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# TestClient runs each request on its own event loop, so don't pool async connections
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{_tmp_dir}/compact.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+def use_test_database():
+    """Point the app at this module's database; other test modules point it at theirs"""
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_async_db] = override_get_async_db
+    # Revocation checks read the database outside the request's session
+    revocation_list.session_factory = TestingSessionLocal
+    revocation_list.reload()
+    principal_cache.clear()
+    stage_sequence.clear()
+
+
+def seed(prefix: str):
+    """Category with approved stages at orders 1-2 and a pending one at order 3; returns ids and auth headers"""
+    db = TestingSessionLocal()
+    try:
+        category = Category(name=f"Compact {prefix}")
+        student = User(email=f"{prefix}@example.com", is_active=True)
+        db.add_all([category, student])
+        db.flush()
+        stages = [
+            Stage(category_id=category.id, order=order, title=f"Stage {order}", approval_status=status)
+            for order, status in ((1, "approved"), (2, "approved"), (3, "pending"))
+        ]
+        db.add_all(stages)
+        db.commit()
+        token = security.create_access_token(student.id, claims=security.role_claims(student))
+        return category.id, [stage.id for stage in stages], student.id, {"Authorization": f"Bearer {token}"}
+    finally:
+        db.close()
+
+
+def highest_completed_order(user_id: int, category_id: int) -> int:
+    db = TestingSessionLocal()
+    try:
+        progress = crud_progress.get_category_progress(db, user_id, category_id)
+        return progress.highest_completed_order if progress else 0
+    finally:
+        db.close()
+
+
+Base.metadata.create_all(bind=engine)
+client = TestClient(app)
+
+
+def _with_compact_store(test):
+    def run():
+        previous, settings.PROGRESS_STORE = settings.PROGRESS_STORE, "compact"
+        try:
+            use_test_database()
+            test()
+        finally:
+            settings.PROGRESS_STORE = previous
+    run.__name__ = test.__name__
+    return run
+
+
+@_with_compact_store
+def test_locked_stage_cannot_be_completed():
+    category_id, (first, second, _), user_id, headers = seed("locked")
+    r = client.post(f"/api/categories/{category_id}/initialize", headers=headers)
+    assert r.status_code == 200, r.text
+    assert [p["is_unlocked"] for p in r.json()] == [True, False], r.json()
+
+    r = client.post(f"/api/stages/{second}/complete", headers=headers)
+    assert r.status_code == 403, r.text
+    assert highest_completed_order(user_id, category_id) == 0
+
+    r = client.post(f"/api/stages/{first}/complete", headers=headers)
+    assert r.status_code == 200 and r.json()["is_completed"], r.text
+    r = client.post(f"/api/stages/{second}/complete", headers=headers)
+    assert r.status_code == 200 and r.json()["is_completed"], r.text
+    assert highest_completed_order(user_id, category_id) == 2
+
+
+@_with_compact_store
+def test_pending_stage_cannot_be_completed():
+    category_id, (first, second, pending), user_id, headers = seed("pending")
+    client.post(f"/api/categories/{category_id}/initialize", headers=headers)
+
+    r = client.post(f"/api/stages/{pending}/complete", headers=headers)
+    assert r.status_code == 403, r.text
+    assert highest_completed_order(user_id, category_id) == 0
+
+    # Nor through the CRUD layer, which successful attempts use
+    db = TestingSessionLocal()
+    try:
+        stage = db.get(Stage, pending)
+        assert crud_progress.get_stage_progress(db, user_id, stage) is None
+        assert crud_progress.complete_stage(db, user_id, stage) is None
+    finally:
+        db.close()
+    assert highest_completed_order(user_id, category_id) == 0
+
+    r = client.get(f"/api/categories/{category_id}/stages/progress", headers=headers)
+    assert r.status_code == 200, r.text
+    assert not any(p["is_completed"] for p in r.json()), r.json()
+
+
+@_with_compact_store
+def test_admin_views_read_compact_progress():
+    category_id, (first, second, _), _, ahead = seed("views-ahead")
+    db = TestingSessionLocal()
+    try:
+        behind = User(email="views-behind@example.com", is_active=True)
+        admin = User(email="views-admin@example.com", is_active=True, is_superuser=True, role="admin")
+        db.add_all([behind, admin])
+        db.commit()
+        behind = {"Authorization": f"Bearer {security.create_access_token(behind.id, claims=security.role_claims(behind))}"}
+        admin = {"Authorization": f"Bearer {security.create_access_token(admin.id, claims=security.role_claims(admin))}"}
+    finally:
+        db.close()
+
+    for headers in (ahead, behind):
+        assert client.post(f"/api/categories/{category_id}/initialize", headers=headers).status_code == 200
+    # Read once so the completions below must invalidate the cached metrics
+    assert client.get(f"/categories/{category_id}/detail", headers=admin).json()["metrics"]["total_students"] == 2
+    for stage_id in (first, second):
+        r = client.post(f"/api/stages/{stage_id}/complete", headers=ahead)
+        assert r.status_code == 200, r.text
+
+    # Two approved stages done out of three active ones (the pending stage counts, as with rows)
+    r = client.get(f"/categories/{category_id}/detail", headers=admin)
+    assert r.status_code == 200, r.text
+    metrics = r.json()["metrics"]
+    assert metrics["total_stages"] == 3 and metrics["total_students"] == 2, metrics
+    assert metrics["average_progress"] == round(2 / 3 / 2 * 100, 2), metrics
+
+    r = client.get(f"/categories/{category_id}/students", params={"order_by": "progress", "order_direction": "desc"}, headers=admin)
+    assert r.status_code == 200, r.text
+    assert [(s["email"], s["completed_stages"]) for s in r.json()] == [
+        ("views-ahead@example.com", 2), ("views-behind@example.com", 0)
+    ], r.json()
+
+    r = client.get(
+        f"/categories/{category_id}/students",
+        params={"order_by": "progress", "order_direction": "desc", "limit": 1, "cursor": ""},
+        headers=admin
+    )
+    page = r.json()
+    assert [s["completed_stages"] for s in page["items"]] == [2], page
+    r = client.get(
+        f"/categories/{category_id}/students",
+        params={"order_by": "progress", "order_direction": "desc", "limit": 1, "cursor": page["next_cursor"]},
+        headers=admin
+    )
+    assert [s["email"] for s in r.json()["items"]] == ["views-behind@example.com"], r.json()
+
+
+if __name__ == "__main__":
+    test_locked_stage_cannot_be_completed()
+    test_pending_stage_cannot_be_completed()
+    test_admin_views_read_compact_progress()
+    print("Compact progress rejects locked and pending stages")
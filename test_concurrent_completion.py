@@ -0,0 +1,201 @@
+"""
+Concurrency stress test for stage completion.
+Run with: python test_concurrent_completion.py  (or pytest test_concurrent_completion.py)
+
+Fires parallel completions and successful attempts through the ASGI app, then
+races complete_stage from several threads, against a throwaway SQLite
+database. Every (user, stage) pair must end up with exactly one progress row,
+and racing first attempts must share a single stage analytics row.
+"""
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from sqlalchemy import create_engine, func
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.api import deps
+from app.db import session as db_session
+from app.db.base import Base
+from app.core import security
+from app.services.revocation import revocation_list
+from app.services.principal_cache import principal_cache
+from app.crud import crud_feedback, crud_stage
+from app.models.category import Category
+from app.models.feedback import StageAnalytics
+from app.models.stage import Stage, UserStageProgress
+from app.models.user import User
+from app.schemas.feedback import StudentAttemptCreate
+
+STUDENTS = 5
+PARALLEL_REQUESTS = 10
+# Each in-flight request holds a pooled connection and a threadpool slot for its
+# dependencies, so keep the ASGI burst below the default threadpool size (40)
+ASGI_PARALLEL_REQUESTS = 3
+
+_tmp_dir = tempfile.mkdtemp()
+# The async endpoints block the event loop while waiting for a pooled connection,
+# so the pool must fit the whole burst or the test stalls until the pool timeout
+engine = create_engine(
+    f"sqlite:///{_tmp_dir}/stress.db",
+    connect_args={"check_same_thread": False},
+    pool_size=STUDENTS * ASGI_PARALLEL_REQUESTS * 2,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{_tmp_dir}/stress.db")
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+def seed(db, prefix: str):
+    category = Category(name=f"Stress {prefix}")
+    db.add(category)
+    db.flush()
+    stages = [
+        Stage(category_id=category.id, order=order, title=f"Stage {order}", approval_status="approved")
+        for order in (1, 2, 3)
+    ]
+    users = [User(email=f"{prefix}{i}@example.com", is_active=True) for i in range(STUDENTS)]
+    db.add_all(stages + users)
+    db.commit()
+    return category.id, [s.id for s in stages], [u.id for u in users]
+
+
+def assert_single_rows(db, user_ids, first_stage_id, second_stage_id):
+    duplicates = (
+        db.query(UserStageProgress.user_id, UserStageProgress.stage_id)
+        .filter(UserStageProgress.user_id.in_(user_ids))
+        .group_by(UserStageProgress.user_id, UserStageProgress.stage_id)
+        .having(func.count(UserStageProgress.id) > 1)
+        .all()
+    )
+    assert not duplicates, f"Duplicated progress rows: {duplicates}"
+    for user_id in user_ids:
+        first = crud_stage.get_user_stage_progress(db, user_id, first_stage_id)
+        second = crud_stage.get_user_stage_progress(db, user_id, second_stage_id)
+        assert first.is_completed and first.is_unlocked
+        assert second.is_unlocked and not second.is_completed
+
+
+async def _fire_completions(category_id, stage_ids, user_ids):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {
+            user_id: {"Authorization": f"Bearer {security.create_access_token(user_id)}"}
+            for user_id in user_ids
+        }
+        for user_id in user_ids:
+            r = await client.post(f"/api/categories/{category_id}/initialize", headers=headers[user_id])
+            assert r.status_code == 200, r.text
+
+        requests = []
+        for user_id in user_ids:
+            for _ in range(ASGI_PARALLEL_REQUESTS):
+                requests.append(client.post(f"/api/stages/{stage_ids[0]}/complete", headers=headers[user_id]))
+                requests.append(client.post(
+                    f"/api/stages/{stage_ids[0]}/attempts",
+                    json={"stage_id": stage_ids[0], "is_successful": True},
+                    headers=headers[user_id]
+                ))
+        responses = await asyncio.gather(*requests)
+        failed = [r.text for r in responses if r.status_code != 200]
+        assert not failed, failed
+
+
+def test_parallel_completions_through_asgi():
+    use_test_database()
+    db = TestingSessionLocal()
+    try:
+        category_id, stage_ids, user_ids = seed(db, "asgi")
+        asyncio.run(_fire_completions(category_id, stage_ids, user_ids))
+        assert_single_rows(db, user_ids, stage_ids[0], stage_ids[1])
+    finally:
+        db.close()
+
+
+def test_parallel_completions_from_threads():
+    db = TestingSessionLocal()
+    try:
+        _, stage_ids, user_ids = seed(db, "threads")
+
+        def complete(user_id):
+            thread_db = TestingSessionLocal()
+            try:
+                return crud_stage.complete_stage(thread_db, user_id, stage_ids[0]) is not None
+            finally:
+                thread_db.close()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(complete, user_ids * PARALLEL_REQUESTS))
+        assert all(results)
+        assert_single_rows(db, user_ids, stage_ids[0], stage_ids[1])
+    finally:
+        db.close()
+
+
+def test_parallel_first_attempts_share_one_analytics_row():
+    db = TestingSessionLocal()
+    try:
+        _, stage_ids, user_ids = seed(db, "analytics")
+
+        def attempt(args):
+            user_id, successful = args
+            thread_db = TestingSessionLocal()
+            try:
+                crud_feedback.create_attempt(
+                    thread_db, user_id, StudentAttemptCreate(stage_id=stage_ids[2], is_successful=successful)
+                )
+            finally:
+                thread_db.close()
+
+        attempts = [(user_id, i % 2 == 0) for i, user_id in enumerate(user_ids * PARALLEL_REQUESTS)]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(attempt, attempts))
+        rows = db.query(StageAnalytics).filter(StageAnalytics.stage_id == stage_ids[2]).all()
+        assert len(rows) == 1
+        assert rows[0].total_attempts == len(attempts)
+        assert rows[0].successful_attempts == sum(1 for _, successful in attempts if successful)
+
+        # A reconciliation rebuild from the attempts table agrees with the increments
+        incremental = (rows[0].total_attempts, rows[0].successful_attempts, rows[0].hints_sum)
+        rebuilt = crud_feedback.update_stage_analytics(db, stage_ids[2])
+        assert (rebuilt.total_attempts, rebuilt.successful_attempts, rebuilt.hints_sum) == incremental
+    finally:
+        db.close()
+
+
+def use_test_database():
+    """Point the app at this module's database; other test modules point it at theirs"""
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_async_db] = override_get_async_db
+    # Revocation checks read the database outside the request's session
+    revocation_list.session_factory = TestingSessionLocal
+    revocation_list.reload()
+    principal_cache.clear()
+
+
+Base.metadata.create_all(bind=engine)
+
+if __name__ == "__main__":
+    test_parallel_completions_through_asgi()
+    print("✅ Parallel completions through the ASGI app: no duplicated progress rows")
+    test_parallel_completions_from_threads()
+    print("✅ Parallel completions from threads: no duplicated progress rows")
+    test_parallel_first_attempts_share_one_analytics_row()
+    print("✅ Parallel first attempts: one analytics row with every attempt counted")
@@ -0,0 +1,318 @@
+"""
+Server-side grading tests.
+Run with: python test_grading.py  (or pytest test_grading.py)
+
+Checks each compiled answer key against correct, partial, duplicate,
+extra-id and missing-field submissions, that AnswerKeyCache recompiles a
+key once the category's stage_version moves, and that a self-reported
+successful attempt is refused for stages with an answer key.
+"""
+import tempfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.api import deps
+from app.core import security
+from app.crud import crud_category
+from app.db import session as db_session
+from app.db.base import Base
+from app.models.category import Category
+from app.models.stage import Stage
+from app.models.user import User
+from app.schemas.interactive import ChallengeSubmission, InteractiveConfig
+from app.services.grading import (
+    AnswerKeyCache,
+    ClassificationKey,
+    GradingError,
+    MatchingKey,
+    MultipleChoiceKey,
+    OrderingKey,
+    compile_answer_key,
+)
+from app.services.principal_cache import principal_cache
+from app.services.revocation import revocation_list
+from app.services.stage_sequence import stage_sequence
+
+_tmp_dir = tempfile.mkdtemp()
+engine = create_engine(f"sqlite:///{_tmp_dir}/grading.db", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# TestClient runs each request on its own event loop, so don't pool async connections
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{_tmp_dir}/grading.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+def use_test_database():
+    """Point the app at this module's database; other test modules point it at theirs"""
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_async_db] = override_get_async_db
+    # Revocation checks read the database outside the request's session
+    revocation_list.session_factory = TestingSessionLocal
+    revocation_list.reload()
+    principal_cache.clear()
+    stage_sequence.clear()
+
+
+Base.metadata.create_all(bind=engine)
+client = TestClient(app)
+
+
+def submit(**answer) -> ChallengeSubmission:
+    return ChallengeSubmission(**answer)
+
+
+def assert_missing_field(key, field: str):
+    try:
+        key.grade(submit())
+    except GradingError as e:
+        assert field in str(e), e
+    else:
+        raise AssertionError(f"{type(key).__name__} graded a submission without '{field}'")
+
+
+def test_ordering_key():
+    key = OrderingKey(["a", "b", "c"])
+
+    result = key.grade(submit(order=["a", "b", "c"]))
+    assert result.is_correct and result.score == 1.0 and result.incorrect_ids == []
+
+    result = key.grade(submit(order=["a", "c", "b"]))
+    assert not result.is_correct
+    assert (result.correct_count, result.total_count) == (1, 3)
+    assert result.incorrect_ids == ["b", "c"]
+
+    # A repeated element only counts at its right position
+    result = key.grade(submit(order=["a", "a", "c"]))
+    assert not result.is_correct and result.correct_count == 2 and result.incorrect_ids == ["b"]
+
+    # Every position right, but an element the challenge doesn't have was appended
+    result = key.grade(submit(order=["a", "b", "c", "x"]))
+    assert not result.is_correct and result.correct_count == 3 and result.incorrect_ids == ["x"]
+
+    # A short answer is never correct, even with nothing misplaced
+    result = key.grade(submit(order=["a", "b"]))
+    assert not result.is_correct and result.incorrect_ids == ["c"]
+
+    assert_missing_field(key, "order")
+
+
+def test_matching_key():
+    key = MatchingKey([("l1", "r1"), ("l2", "r2")])
+    pair = lambda left, right: {"left_id": left, "right_id": right}
+
+    result = key.grade(submit(pairs=[pair("l1", "r1"), pair("l2", "r2")]))
+    assert result.is_correct and result.score == 1.0
+
+    result = key.grade(submit(pairs=[pair("l1", "r1"), pair("l2", "r1")]))
+    assert not result.is_correct and result.correct_count == 1 and result.incorrect_ids == ["l2"]
+
+    # Submitting the same right pair twice doesn't make up for the missing one
+    result = key.grade(submit(pairs=[pair("l1", "r1"), pair("l1", "r1")]))
+    assert not result.is_correct and result.correct_count == 1
+    assert result.incorrect_ids == ["l2", "l1"]
+
+    result = key.grade(submit(pairs=[pair("l1", "r1"), pair("l2", "r2"), pair("lx", "r1")]))
+    assert not result.is_correct and result.correct_count == 2 and result.incorrect_ids == ["lx"]
+
+    assert_missing_field(key, "pairs")
+
+
+def test_classification_key():
+    # "both" may go in either category
+    key = ClassificationKey({"fruit": ["apple", "both"], "veg": ["carrot", "both"]})
+
+    result = key.grade(submit(classification={"fruit": ["apple", "both"], "veg": ["carrot"]}))
+    assert result.is_correct and (result.correct_count, result.total_count) == (3, 3)
+
+    result = key.grade(submit(classification={"fruit": ["apple", "carrot"], "veg": ["both"]}))
+    assert not result.is_correct and result.correct_count == 2 and result.incorrect_ids == ["carrot"]
+
+    # Placing an element in a right and a wrong category is still wrong
+    result = key.grade(submit(classification={"fruit": ["apple", "both", "carrot"], "veg": ["carrot"]}))
+    assert not result.is_correct and result.correct_count == 3 and result.incorrect_ids == ["carrot"]
+
+    result = key.grade(submit(classification={"fruit": ["apple", "both", "stone"], "veg": ["carrot"]}))
+    assert not result.is_correct and result.correct_count == 3 and result.incorrect_ids == ["stone"]
+
+    assert_missing_field(key, "classification")
+
+
+def test_multiple_choice_key():
+    key = MultipleChoiceKey(["o1", "o2", "o3", "o4"], ["o1", "o3"])
+
+    result = key.grade(submit(selected_ids=["o3", "o1"]))
+    assert result.is_correct and (result.correct_count, result.total_count) == (4, 4)
+
+    # Every option is scored, so a missed right option and a picked wrong one both count
+    result = key.grade(submit(selected_ids=["o1", "o2"]))
+    assert not result.is_correct and result.correct_count == 2 and result.incorrect_ids == ["o2", "o3"]
+
+    result = key.grade(submit(selected_ids=["o1", "o1", "o3"]))
+    assert result.is_correct
+
+    result = key.grade(submit(selected_ids=["o1", "o3", "o9"]))
+    assert not result.is_correct and result.correct_count == 4 and result.incorrect_ids == ["o9"]
+
+    assert_missing_field(key, "selected_ids")
+
+
+def ordering_config(correct_order):
+    return {
+        "challenge_type": "ordering",
+        "instructions": "Put them in order",
+        "elements": [{"id": element_id, "type": "text", "content": element_id} for element_id in "abc"],
+        "correct_order": correct_order,
+    }
+
+
+def test_compile_answer_key_requires_a_key():
+    for challenge_type, field in (
+        ("ordering", "correct_order"),
+        ("matching", "matching_pairs"),
+        ("classification", "classification_categories"),
+        ("multiple_choice", "correct_option_ids"),
+    ):
+        config = InteractiveConfig.model_validate({**ordering_config(None), "challenge_type": challenge_type})
+        try:
+            compile_answer_key(config)
+        except GradingError as e:
+            assert field in str(e), e
+        else:
+            raise AssertionError(f"{challenge_type} compiled without {field}")
+
+
+def seed(prefix: str, interactive_config=None):
+    """Category with one approved stage (answer key from `interactive_config`) and a student"""
+    db = TestingSessionLocal()
+    try:
+        category = Category(name=f"Grading {prefix}")
+        student = User(email=f"{prefix}@example.com", is_active=True)
+        db.add_all([category, student])
+        db.flush()
+        stage = Stage(
+            category_id=category.id, order=1, title="Stage 1",
+            approval_status="approved", interactive_config=interactive_config
+        )
+        db.add(stage)
+        db.commit()
+        token = security.create_access_token(student.id, claims=security.role_claims(student))
+        return category.id, stage.id, student.id, {"Authorization": f"Bearer {token}"}
+    finally:
+        db.close()
+
+
+def test_answer_key_cache_follows_stage_version():
+    use_test_database()
+    category_id, stage_id, _, _ = seed("cache", ordering_config(["a", "b", "c"]))
+    cache = AnswerKeyCache(max_entries=8)
+
+    db = TestingSessionLocal()
+    try:
+        stage = db.get(Stage, stage_id)
+        first = cache.get(db, stage)
+        assert cache.get(db, stage) is first
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # Editing the challenge bumps the category's stage_version in the same transaction
+        stage.interactive_config = ordering_config(["c", "b", "a"])
+        crud_category.bump_stage_version(db, category_id)
+        db.commit()
+
+        key = cache.get(db, stage)
+        assert key is not first and cache.misses == 2
+        assert key.grade(submit(order=["c", "b", "a"])).is_correct
+    finally:
+        db.close()
+
+
+def test_cache_evicts_least_recently_used():
+    use_test_database()
+    cache = AnswerKeyCache(max_entries=2)
+    stage_ids = [seed(f"lru{index}", ordering_config(["a", "b", "c"]))[1] for index in range(3)]
+
+    db = TestingSessionLocal()
+    try:
+        stages = [db.get(Stage, stage_id) for stage_id in stage_ids]
+        cache.get(db, stages[0])
+        cache.get(db, stages[1])
+        cache.get(db, stages[0])
+        cache.get(db, stages[2])  # evicts stages[1]
+        cache.get(db, stages[0])
+        assert (cache.hits, cache.misses) == (2, 3)
+        cache.get(db, stages[1])
+        assert cache.misses == 4
+    finally:
+        db.close()
+
+
+def test_self_reported_success_needs_grading():
+    use_test_database()
+    category_id, stage_id, _, headers = seed("attempt", ordering_config(["a", "b", "c"]))
+    client.post(f"/api/categories/{category_id}/initialize", headers=headers)
+
+    def completed():
+        r = client.get(f"/api/categories/{category_id}/stages/progress", headers=headers)
+        assert r.status_code == 200, r.text
+        return r.json()[0]["is_completed"]
+
+    r = client.post(f"/api/stages/{stage_id}/attempts", json={"stage_id": stage_id, "is_successful": True}, headers=headers)
+    assert r.status_code == 403, r.text
+    assert not completed()
+
+    # Failed attempts are still logged as reported
+    r = client.post(f"/api/stages/{stage_id}/attempts", json={"stage_id": stage_id, "is_successful": False}, headers=headers)
+    assert r.status_code == 200 and r.json()["attempt_number"] == 1, r.text
+
+    r = client.post(
+        f"/api/stages/{stage_id}/grade",
+        json={"order": ["a", "b", "c"], "record_attempt": True},
+        headers=headers
+    )
+    assert r.status_code == 200 and r.json()["is_correct"], r.text
+    assert completed()
+
+
+def test_attempt_is_recorded_against_the_path_stage():
+    use_test_database()
+    _, graded_stage, _, headers = seed("path", ordering_config(["a", "b", "c"]))
+    _, plain_stage, _, _ = seed("path-plain")
+
+    # The body can't name a graded stage to complete it through an ungraded one
+    r = client.post(
+        f"/api/stages/{plain_stage}/attempts",
+        json={"stage_id": graded_stage, "is_successful": True},
+        headers=headers
+    )
+    assert r.status_code == 200, r.text
+    assert r.json()["stage_id"] == plain_stage
+
+
+if __name__ == "__main__":
+    test_ordering_key()
+    test_matching_key()
+    test_classification_key()
+    test_multiple_choice_key()
+    test_compile_answer_key_requires_a_key()
+    test_answer_key_cache_follows_stage_version()
+    test_cache_evicts_least_recently_used()
+    test_self_reported_success_needs_grading()
+    test_attempt_is_recorded_against_the_path_stage()
+    print("Grading OK")
@@ -0,0 +1,179 @@
+"""
+Conditional GET test for the stage listing (ETag / Last-Modified).
+Run with: python test_http_cache.py  (or pytest test_http_cache.py)
+
+Against a throwaway SQLite database, checks that a matching If-None-Match
+or If-Modified-Since gets an empty 304, that a stage write makes the old
+ETag stale, and that listings with a different status filter or field
+selection get their own ETag.
+"""
+import tempfile
+from datetime import timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from starlette.requests import Request
+
+from app.main import app
+from app.api import deps
+from app.core import http_cache, security
+from app.db import session as db_session
+from app.db.base import Base
+from app.models.category import Category
+from app.models.stage import Stage
+from app.models.user import User
+from app.services.principal_cache import principal_cache
+from app.services.revocation import revocation_list
+
+_tmp_dir = tempfile.mkdtemp()
+engine = create_engine(f"sqlite:///{_tmp_dir}/http_cache.db", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# TestClient runs each request on its own event loop, so don't pool async connections
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{_tmp_dir}/http_cache.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+def use_test_database():
+    """Point the app at this module's database; other test modules point it at theirs"""
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_async_db] = override_get_async_db
+    # Revocation checks read the database outside the request's session
+    revocation_list.session_factory = TestingSessionLocal
+    revocation_list.reload()
+    principal_cache.clear()
+
+
+def auth(user: User) -> dict:
+    token = security.create_access_token(user.id, claims=security.role_claims(user))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed(prefix: str):
+    """Category with an approved and a pending stage; returns its id, the approved stage id and auth headers"""
+    db = TestingSessionLocal()
+    try:
+        category = Category(name=f"Cache {prefix}")
+        admin = User(email=f"{prefix}-admin@example.com", is_active=True, is_superuser=True, role="admin")
+        student = User(email=f"{prefix}@example.com", is_active=True)
+        db.add_all([category, admin, student])
+        db.flush()
+        approved = Stage(category_id=category.id, order=1, title="Approved", approval_status="approved")
+        db.add_all([approved, Stage(category_id=category.id, order=2, title="Pending", approval_status="pending")])
+        db.commit()
+        return category.id, approved.id, auth(admin), auth(student)
+    finally:
+        db.close()
+
+
+Base.metadata.create_all(bind=engine)
+client = TestClient(app)
+
+
+def test_matching_etag_gets_an_empty_304():
+    use_test_database()
+    category_id, _, _, student = seed("etag")
+    path = f"/api/categories/{category_id}/stages"
+
+    r = client.get(path, headers=student)
+    assert r.status_code == 200 and len(r.json()) == 1, r.text
+    etag = r.headers["etag"]
+    assert etag.startswith('W/"') and r.headers["cache-control"] == "private, no-cache"
+
+    r = client.get(path, headers={**student, "If-None-Match": etag})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["etag"] == etag and r.headers["last-modified"]
+
+    # Weak comparison, and any tag of a list matches
+    r = client.get(path, headers={**student, "If-None-Match": f'"other", {etag.removeprefix("W/")}'})
+    assert r.status_code == 304
+    r = client.get(path, headers={**student, "If-None-Match": '"other"'})
+    assert r.status_code == 200
+
+
+def test_stage_write_makes_the_etag_stale():
+    use_test_database()
+    category_id, stage_id, admin, student = seed("write")
+    path = f"/api/categories/{category_id}/stages"
+    etag = client.get(path, headers=student).headers["etag"]
+
+    r = client.put(f"/api/stages/{stage_id}", json={"title": "Renamed"}, headers=admin)
+    assert r.status_code == 200, r.text
+
+    r = client.get(path, headers={**student, "If-None-Match": etag})
+    assert r.status_code == 200 and r.json()[0]["title"] == "Renamed", r.text
+    assert r.headers["etag"] != etag
+
+
+def test_if_modified_since():
+    use_test_database()
+    category_id, _, _, student = seed("since")
+    path = f"/api/categories/{category_id}/stages"
+    last_modified = client.get(path, headers=student).headers["last-modified"]
+
+    r = client.get(path, headers={**student, "If-Modified-Since": last_modified})
+    assert r.status_code == 304 and r.content == b""
+
+    earlier = format_datetime(parsedate_to_datetime(last_modified) - timedelta(hours=1), usegmt=True)
+    r = client.get(path, headers={**student, "If-Modified-Since": earlier})
+    assert r.status_code == 200 and r.json(), r.text
+
+    # If-None-Match wins over If-Modified-Since
+    r = client.get(path, headers={**student, "If-None-Match": '"other"', "If-Modified-Since": last_modified})
+    assert r.status_code == 200
+
+    r = client.get(path, headers={**student, "If-Modified-Since": "not a date"})
+    assert r.status_code == 200
+
+
+def test_filters_and_fields_get_their_own_etag():
+    use_test_database()
+    category_id, _, admin, student = seed("variants")
+    path = f"/api/categories/{category_id}/stages"
+
+    # Students only see approved stages, admins see every one
+    student_response = client.get(path, headers=student)
+    admin_response = client.get(path, headers=admin)
+    assert len(student_response.json()) == 1 and len(admin_response.json()) == 2
+    assert student_response.headers["etag"] != admin_response.headers["etag"]
+    r = client.get(path, headers={**admin, "If-None-Match": student_response.headers["etag"]})
+    assert r.status_code == 200 and len(r.json()) == 2
+
+    etags = {
+        client.get(path, params=params, headers=student).headers["etag"]
+        for params in ({}, {"fields": "summary"}, {"fields": "title"}, {"cursor": ""}, {"limit": 1})
+    }
+    assert len(etags) == 5
+
+
+def test_is_not_modified_ignores_missing_validators():
+    request = Request({"type": "http", "headers": [(b"if-modified-since", b"Mon, 01 Jan 2024 00:00:00 GMT")]})
+    # No Last-Modified to compare against
+    assert not http_cache.is_not_modified(request, 'W/"abc"')
+    assert http_cache.is_not_modified(Request({"type": "http", "headers": [(b"if-none-match", b"*")]}), 'W/"abc"')
+
+
+if __name__ == "__main__":
+    test_matching_etag_gets_an_empty_304()
+    test_stage_write_makes_the_etag_stale()
+    test_if_modified_since()
+    test_filters_and_fields_get_their_own_etag()
+    test_is_not_modified_ignores_missing_validators()
+    print("Conditional GETs OK")
@@ -0,0 +1,74 @@
+"""
+Prometheus /metrics endpoint test.
+Run with: python test_metrics.py  (or pytest test_metrics.py)
+
+Makes a few requests against the app and checks that /metrics reports them
+per route template, that unknown paths share the "unmatched" route, and
+that a timed pool records how long checkouts waited.
+"""
+import tempfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.main import app
+from app.services.event_loop_monitor import event_loop_monitor
+from app.services.metrics import TimedQueuePool, registry
+
+client = TestClient(app)
+
+
+def sample(body: str, prefix: str) -> float:
+    """Value of the first line of the exposition starting with `prefix`"""
+    line = next(line for line in body.splitlines() if line.startswith(prefix))
+    return float(line.rsplit(" ", 1)[1])
+
+
+def test_request_metrics():
+    for _ in range(3):
+        assert client.get("/health").status_code == 200
+    client.get("/no/such/page/123")
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = r.text
+    assert sample(body, 'http_requests_total{method="GET",route="/health",status="200"}') >= 3
+    assert 'route="unmatched",status="404"' in body
+    assert "/no/such/page" not in body
+    assert sample(body, 'http_request_duration_seconds_count{method="GET",route="/health"}') >= 3
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/health",le="+Inf"}' in body
+    assert 'http_response_size_bytes_sum{method="GET",route="/health"}' in body
+    assert "# TYPE cache_hit_ratio gauge" in body
+
+
+def test_event_loop_metrics():
+    # The monitor isn't ticking here, so the whole request counts as overdue
+    event_loop_monitor.record_request("GET /metrics-test/stalled", 0.0, 1.0)
+    body = client.get("/metrics").text
+    assert "# TYPE event_loop_lag_seconds gauge" in body
+    assert sample(body, "event_loop_max_lag_seconds ") >= 0
+    assert "# TYPE event_loop_stalled_requests_total counter" in body
+    assert sample(body, 'event_loop_stalled_requests_total{method="GET",route="/metrics-test/stalled"}') == 1
+
+
+def test_pool_checkout_wait():
+    tmp_dir = tempfile.mkdtemp()
+    engine = create_engine(
+        f"sqlite:///{tmp_dir}/metrics.db", poolclass=TimedQueuePool, pool_logging_name="metrics_test"
+    )
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        body = registry.render()
+        assert sample(body, 'db_pool_checked_out_connections{pool="metrics_test"}') == 1
+    body = registry.render()
+    assert sample(body, 'db_pool_checkout_wait_seconds_count{pool="metrics_test"}') == 1
+    assert sample(body, 'db_pool_checked_out_connections{pool="metrics_test"}') == 0
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    test_request_metrics()
+    test_event_loop_metrics()
+    test_pool_checkout_wait()
+    print("Metrics OK")
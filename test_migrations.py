@@ -0,0 +1,170 @@
+"""
+Versioned schema migration test.
+Run with: python test_migrations.py  (or pytest test_migrations.py)
+
+Builds an unversioned SQLite database shaped like the ones created before
+versioning (before the ALTER TABLE scripts ran), runs ensure_schema, and
+checks that it reaches the latest version with the added columns, backfills
+and indexes. A fresh database must be stamped without running migrations.
+"""
+import tempfile
+
+from sqlalchemy import create_engine, inspect, select, text
+
+from app.core.config import settings
+from app.db import migrations
+from app.db.base import Base
+
+# Tables as the first releases created them: no roles, approval workflow,
+# analytics sums, stage versions or unique progress index
+LEGACY_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER PRIMARY KEY, email VARCHAR NOT NULL UNIQUE, hashed_password VARCHAR,
+        full_name VARCHAR, is_active BOOLEAN, is_superuser BOOLEAN,
+        oauth_provider VARCHAR, oauth_id VARCHAR, is_blocked BOOLEAN, block_reason VARCHAR
+    )""",
+    """CREATE TABLE categories (
+        id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE, description VARCHAR, icon VARCHAR,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+    )""",
+    """CREATE TABLE stages (
+        id INTEGER PRIMARY KEY, category_id INTEGER NOT NULL REFERENCES categories(id),
+        "order" INTEGER NOT NULL, title VARCHAR(100) NOT NULL, description VARCHAR, content VARCHAR,
+        challenge_description VARCHAR, media_url VARCHAR, media_type VARCHAR(20),
+        media_filename VARCHAR(255), interactive_config JSON, is_active BOOLEAN
+    )""",
+    """CREATE TABLE user_stage_progress (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users(id),
+        stage_id INTEGER NOT NULL REFERENCES stages(id), is_completed BOOLEAN, is_unlocked BOOLEAN
+    )""",
+    """CREATE TABLE student_attempts (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users(id),
+        stage_id INTEGER NOT NULL REFERENCES stages(id), attempt_number INTEGER NOT NULL,
+        is_successful BOOLEAN, hints_viewed INTEGER, error_details JSON, time_spent_seconds INTEGER,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE stage_analytics (
+        id INTEGER PRIMARY KEY, stage_id INTEGER NOT NULL UNIQUE REFERENCES stages(id),
+        total_attempts INTEGER, failed_attempts INTEGER, successful_attempts INTEGER, success_rate FLOAT,
+        avg_hints_used FLOAT, max_hints_used INTEGER, most_common_errors JSON, avg_time_seconds FLOAT,
+        last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+    )""",
+]
+
+LEGACY_DATA = [
+    "INSERT INTO users (id, email, is_active, is_superuser) VALUES (1, 'admin@example.com', 1, 1)",
+    "INSERT INTO users (id, email, is_active, is_superuser) VALUES (2, 'student@example.com', 1, 0)",
+    "INSERT INTO categories (id, name) VALUES (1, 'Legacy')",
+    'INSERT INTO stages (id, category_id, "order", title, is_active) VALUES (1, 1, 1, \'One\', 1)',
+    'INSERT INTO stages (id, category_id, "order", title, is_active) VALUES (2, 1, 2, \'Two\', 1)',
+    'INSERT INTO stages (id, category_id, "order", title, is_active) VALUES (3, 1, 3, \'Gone\', 0)',
+    # The same (user, stage) twice, completed only on the newer row
+    "INSERT INTO user_stage_progress (id, user_id, stage_id, is_completed, is_unlocked) VALUES (1, 2, 1, 0, 1)",
+    "INSERT INTO user_stage_progress (id, user_id, stage_id, is_completed, is_unlocked) VALUES (2, 2, 1, 1, 1)",
+    "INSERT INTO student_attempts (user_id, stage_id, attempt_number, is_successful, hints_viewed, time_spent_seconds) "
+    "VALUES (2, 1, 1, 0, 2, 30)",
+    "INSERT INTO student_attempts (user_id, stage_id, attempt_number, is_successful, hints_viewed, time_spent_seconds) "
+    "VALUES (2, 1, 2, 1, 1, NULL)",
+    "INSERT INTO stage_analytics (stage_id, total_attempts) VALUES (1, 2)",
+]
+
+
+def new_engine(name: str):
+    return create_engine(f"sqlite:///{tempfile.mkdtemp()}/{name}.db")
+
+
+def legacy_engine():
+    engine = new_engine("legacy")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA + LEGACY_DATA:
+            conn.exec_driver_sql(statement)
+    return engine
+
+
+def applied_versions(engine):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(select(migrations.schema_version.c.version).order_by("version"))]
+
+
+def test_legacy_database_is_migrated_to_the_latest_version():
+    engine = legacy_engine()
+    with engine.connect() as conn:
+        assert migrations.current_version(conn) is None
+
+    migrations.ensure_schema(engine)
+    assert applied_versions(engine) == [migration.version for migration in migrations.MIGRATIONS]
+
+    inspector = inspect(engine)
+    # Every table and column of the models exists now
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert {column.name for column in table.columns} <= columns, table.name
+    indexes = {
+        index["name"]
+        for table in ("user_stage_progress", "stages", "student_attempts", "notifications", "topic_transfer_requests")
+        for index in inspector.get_indexes(table)
+    }
+    assert {
+        "ix_user_stage_progress_user_stage",
+        "ix_stages_category_status_order",
+        "ix_stages_status_submitted",
+        "ix_student_attempts_user_stage_number",
+        "ix_notifications_user_created",
+        "ix_topic_transfer_requests_receiver_status",
+    } <= indexes
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT role FROM users ORDER BY id")).scalars().all() == ["admin", "student"]
+        assert set(conn.execute(text("SELECT approval_status FROM stages")).scalars()) == {"approved"}
+        # Duplicated progress merged into the oldest row, keeping the completion
+        assert conn.execute(text("SELECT id, is_completed FROM user_stage_progress")).all() == [(1, 1)]
+        assert conn.execute(
+            text("SELECT hints_sum, time_sum, timed_attempts FROM stage_analytics WHERE stage_id = 1")
+        ).one() == (3, 30, 1)
+        assert conn.execute(text("SELECT active_stage_count FROM categories WHERE id = 1")).scalar() == 2
+
+    # Current now: nothing left to run
+    assert migrations.upgrade(engine) == []
+    migrations.ensure_schema(engine)
+    engine.dispose()
+
+
+def test_fresh_database_is_stamped_not_migrated():
+    engine = new_engine("fresh")
+    ran = []
+    originals = list(migrations.MIGRATIONS)
+    # Any migration that runs would show up here
+    migrations.MIGRATIONS[:] = [
+        migration._replace(upgrade=lambda conn, version=migration.version: ran.append(version))
+        for migration in originals
+    ]
+    try:
+        assert migrations.upgrade(engine) == []
+    finally:
+        migrations.MIGRATIONS[:] = originals
+    assert ran == []
+    assert applied_versions(engine) == [migration.version for migration in originals]
+    assert set(Base.metadata.tables) <= set(inspect(engine).get_table_names())
+    engine.dispose()
+
+
+def test_outdated_schema_is_refused_without_auto_migrate():
+    engine = legacy_engine()
+    previous, settings.SCHEMA_AUTO_MIGRATE = settings.SCHEMA_AUTO_MIGRATE, False
+    try:
+        migrations.ensure_schema(engine)
+    except RuntimeError as e:
+        assert "migrate.py" in str(e), e
+    else:
+        raise AssertionError("ensure_schema started on an outdated schema")
+    finally:
+        settings.SCHEMA_AUTO_MIGRATE = previous
+    assert "schema_version" not in inspect(engine).get_table_names()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    test_legacy_database_is_migrated_to_the_latest_version()
+    test_fresh_database_is_stamped_not_migrated()
+    test_outdated_schema_is_refused_without_auto_migrate()
+    print("Schema migrations OK")
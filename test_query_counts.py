@@ -0,0 +1,224 @@
+"""
+Query-count budget test for hot endpoints.
+Run with: python test_query_counts.py  (or pytest test_query_counts.py)
+
+Seeds a throwaway SQLite database with a category and STUDENTS students,
+then calls each endpoint inside assert_max_queries. The budgets don't depend
+on the number of students or stages, so an N+1 loop fails the test. Also
+checks that responses carry the Server-Timing header of the query counter.
+"""
+import tempfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.api import deps
+from app.db import session as db_session
+from app.db.base import Base
+from app.core import security
+from app.crud import crud_category
+from app.models.category import Category
+from app.models.stage import Stage, UserStageProgress
+from app.models.user import User
+from app.services.principal_cache import principal_cache
+from app.services.query_counter import assert_max_queries, count_queries
+from app.services.revocation import revocation_list
+
+STUDENTS = 15
+STAGES = 5
+
+_tmp_dir = tempfile.mkdtemp()
+engine = create_engine(f"sqlite:///{_tmp_dir}/counts.db", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# TestClient runs each request on its own event loop, so don't pool async connections
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{_tmp_dir}/counts.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+def auth(user: User) -> dict:
+    token = security.create_access_token(user.id, claims=security.role_claims(user))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed(db):
+    admin = User(email="counts-admin@example.com", is_active=True, is_superuser=True, role="admin")
+    category = Category(name="Counts")
+    students = [
+        User(email=f"counts{i}@example.com", full_name=f"Student {i}", is_active=True)
+        for i in range(STUDENTS)
+    ]
+    db.add_all([admin, category] + students)
+    db.flush()
+    stages = [
+        Stage(category_id=category.id, order=order, title=f"Stage {order}", approval_status="approved")
+        for order in range(1, STAGES + 1)
+    ]
+    db.add_all(stages)
+    db.flush()
+    crud_category.refresh_active_stage_count(db, category.id)
+    db.add_all([
+        UserStageProgress(user_id=student.id, stage_id=stage.id, is_unlocked=True, is_completed=stage.order <= i % STAGES)
+        for i, student in enumerate(students)
+        for stage in stages
+    ])
+    db.commit()
+    return category.id, auth(admin), auth(students[0])
+
+
+def use_test_database():
+    """Point the app at this module's database; other test modules point it at theirs"""
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_async_db] = override_get_async_db
+    # Revocation checks read the database outside the request's session
+    revocation_list.session_factory = TestingSessionLocal
+    revocation_list.reload()
+    principal_cache.clear()
+
+
+Base.metadata.create_all(bind=engine)
+client = TestClient(app)
+_db = TestingSessionLocal()
+CATEGORY_ID, ADMIN, STUDENT = seed(_db)
+_db.close()
+
+# (path, caller, max queries); one spare query for a principal cache miss
+BUDGETS = [
+    ("/categories/", "admin", 2),
+    (f"/api/categories/{CATEGORY_ID}/stages/progress", "student", 3),
+    ("/api/transfer/notifications", "student", 2),
+    (f"/categories/{CATEGORY_ID}/students", "admin", 3),
+    (f"/categories/{CATEGORY_ID}/students?order_by=progress&cursor=", "admin", 3),
+    (f"/categories/{CATEGORY_ID}/detail", "admin", 4),
+    ("/categories/list?order_by=total_stages&order_direction=desc", "admin", 3),
+]
+
+
+def test_query_budgets():
+    use_test_database()
+    headers = {"admin": ADMIN, "student": STUDENT}
+    # Warm the revocation list and the caches that would otherwise add queries to the first call
+    client.get("/categories/", headers=ADMIN)
+    client.get("/api/transfer/notifications", headers=STUDENT)
+    for path, who, limit in BUDGETS:
+        with assert_max_queries(limit):
+            r = client.get(path, headers=headers[who])
+        assert r.status_code == 200, (path, r.text)
+
+
+def test_category_students_keyset_pages():
+    use_test_database()
+    seen, cursor = [], ""
+    while cursor is not None:
+        r = client.get(
+            f"/categories/{CATEGORY_ID}/students",
+            params={"order_by": "progress", "order_direction": "desc", "limit": 4, "cursor": cursor},
+            headers=ADMIN
+        )
+        assert r.status_code == 200, r.text
+        seen += [(student["progress_percentage"], student["id"]) for student in r.json()["items"]]
+        cursor = r.json()["next_cursor"]
+    assert len(seen) == STUDENTS and len(set(seen)) == STUDENTS
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_category_students_unpaginated_lists_everyone():
+    use_test_database()
+    # More students than any page size, in a category of their own
+    db = TestingSessionLocal()
+    try:
+        category = Category(name="Counts crowd")
+        crowd = [User(email=f"crowd{i:03}@example.com", is_active=True) for i in range(120)]
+        db.add_all([category] + crowd)
+        db.flush()
+        stage = Stage(category_id=category.id, order=1, title="Stage 1", approval_status="approved")
+        db.add(stage)
+        db.flush()
+        db.add_all([UserStageProgress(user_id=user.id, stage_id=stage.id, is_unlocked=True) for user in crowd])
+        db.commit()
+        category_id = category.id
+    finally:
+        db.close()
+
+    r = client.get(f"/categories/{category_id}/students", headers=ADMIN)
+    assert r.status_code == 200, r.text
+    assert [student["email"] for student in r.json()] == [f"crowd{i:03}@example.com" for i in range(120)]
+
+    r = client.get(f"/categories/{category_id}/students", params={"skip": 110, "limit": 5}, headers=ADMIN)
+    assert [student["email"] for student in r.json()] == [f"crowd{i:03}@example.com" for i in range(110, 115)]
+
+    # A cursor without a limit pages 100 at a time
+    r = client.get(f"/categories/{category_id}/students", params={"cursor": ""}, headers=ADMIN)
+    assert len(r.json()["items"]) == 100 and r.json()["next_cursor"], r.text
+
+
+def test_category_metrics_cache_invalidation():
+    use_test_database()
+    path = f"/categories/{CATEGORY_ID}/detail"
+    before = client.get(path, headers=ADMIN).json()["metrics"]
+    assert before["total_stages"] == STAGES and before["total_students"] == STUDENTS
+    with count_queries() as stats:
+        assert client.get(path, headers=ADMIN).json()["metrics"] == before
+    assert not any("GROUP BY" in statement for statement in stats.statements), "metrics were not cached"
+
+    # students[0] has completed nothing yet; completing a stage must show up at once
+    first_stage_id = _db_first_stage_id()
+    r = client.post(f"/api/stages/{first_stage_id}/complete", headers=STUDENT)
+    assert r.status_code == 200, r.text
+    after = client.get(path, headers=ADMIN).json()["metrics"]
+    assert after["average_progress"] > before["average_progress"], (before, after)
+
+
+def _db_first_stage_id() -> int:
+    db = TestingSessionLocal()
+    try:
+        return db.query(Stage.id).filter(Stage.category_id == CATEGORY_ID, Stage.order == 1).scalar()
+    finally:
+        db.close()
+
+
+def test_server_timing_header():
+    use_test_database()
+    r = client.get("/categories/", headers=ADMIN)
+    assert r.status_code == 200, r.text
+    timing = r.headers.get("server-timing", "")
+    assert timing.startswith("db;dur=") and "queries" in timing, timing
+
+
+def test_repeated_statements_are_reported():
+    db = TestingSessionLocal()
+    try:
+        with count_queries() as stats:
+            for user_id in range(1, 13):
+                db.query(User).filter(User.id == user_id).first()
+    finally:
+        db.close()
+    (statement, times), = stats.repeated(10)
+    assert times == 12 and "FROM users" in statement, stats.statements
+
+
+if __name__ == "__main__":
+    test_query_budgets()
+    test_category_students_keyset_pages()
+    test_category_students_unpaginated_lists_everyone()
+    test_category_metrics_cache_invalidation()
+    test_server_timing_header()
+    test_repeated_statements_are_reported()
+    print("Query budgets hold")
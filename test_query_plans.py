@@ -0,0 +1,128 @@
+"""
+Query-plan regression test for the hot CRUD queries.
+Run with: python test_query_plans.py  (or pytest test_query_plans.py)
+
+Creates a throwaway SQLite database from the models, runs each hot CRUD
+function while recording the SELECTs it issues, and checks the
+EXPLAIN QUERY PLAN of every one of them: reading a whole table
+("SCAN <table>") instead of searching an index fails the test.
+"""
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.pagination import encode_cursor
+from app.crud import crud_feedback, crud_progress, crud_stage, crud_transfer
+from app.crud.crud_user import user as crud_user
+from app.db.base import Base
+from app.models.category import Category
+from app.models.feedback import StageFeedback, StudentAttempt
+from app.models.stage import Stage, UserCategoryProgress, UserStageProgress
+from app.models.transfer import Notification, TopicTransferRequest
+from app.models.user import User
+
+_tmp_dir = tempfile.mkdtemp()
+engine = create_engine(f"sqlite:///{_tmp_dir}/plans.db", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+TABLES = set(Base.metadata.tables)
+
+
+def seed(db):
+    professor = User(email="plans-prof@example.com", is_active=True, is_professor=True, role="professor")
+    student = User(email="plans-student@example.com", is_active=True)
+    category = Category(name="Plans")
+    db.add_all([professor, student, category])
+    db.flush()
+    stages = [
+        Stage(category_id=category.id, order=order, title=f"Stage {order}", approval_status=status)
+        for order, status in ((1, "approved"), (2, "approved"), (3, "pending"))
+    ]
+    db.add_all(stages)
+    db.flush()
+    db.add_all([
+        UserStageProgress(user_id=student.id, stage_id=stages[0].id, is_unlocked=True),
+        UserCategoryProgress(user_id=student.id, category_id=category.id, highest_completed_order=1),
+        StudentAttempt(user_id=student.id, stage_id=stages[0].id, attempt_number=1),
+        StageFeedback(stage_id=stages[0].id, feedback_type="hint", title="Hint", text_content="Try again", sequence_order=1),
+        Notification(user_id=professor.id, title="Hi", message="Hi", notification_type="TRANSFER_REQUEST"),
+        TopicTransferRequest(sender_id=student.id, receiver_id=professor.id),
+    ])
+    db.commit()
+    return professor.id, student.id, category.id, stages[0].id
+
+
+@contextmanager
+def recorded_selects():
+    """Collect (statement, parameters) of every SELECT run on the engine"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def full_scans(statement: str, parameters) -> list:
+    """Plan steps that read a whole table"""
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        words = detail.split()
+        # "SCAN stages", "SCAN stages USING INDEX ..." (a full index walk) etc.
+        if words[:1] == ["SCAN"] and len(words) > 1 and words[1] in TABLES:
+            scans.append(detail)
+    return scans
+
+
+def hot_queries(professor_id: int, student_id: int, category_id: int, stage_id: int):
+    first_page = encode_cursor(0)
+    return {
+        "stages by category": lambda db: crud_stage.get_stages_by_category(db, category_id),
+        "stages by category, any status": lambda db: crud_stage.get_stages_by_category(db, category_id, status=None),
+        "stages by category page": lambda db: crud_stage.get_stages_by_category_page(db, category_id, first_page),
+        "pending stages": lambda db: crud_stage.get_pending_stages(db),
+        "pending stages page": lambda db: crud_stage.get_pending_stages_page(db, first_page),
+        "stage progress": lambda db: crud_stage.get_user_stage_progress(db, student_id, stage_id),
+        "progress by category": lambda db: crud_stage.get_user_progress_by_category(db, student_id, category_id),
+        "stages with progress": lambda db: crud_stage.get_stages_with_progress(db, student_id, category_id, initialize=False),
+        "compact category progress": lambda db: crud_progress.get_category_progress(db, student_id, category_id),
+        "student attempts": lambda db: crud_feedback.get_student_attempts(db, student_id, stage_id),
+        "stage feedback": lambda db: crud_feedback.get_feedback_by_stage(db, stage_id),
+        "notifications": lambda db: crud_transfer.get_notifications(db, professor_id),
+        "notifications page": lambda db: crud_transfer.get_notifications_page(db, professor_id, first_page),
+        "received transfer requests": lambda db: crud_transfer.get_received_transfer_requests(db, professor_id),
+        "user by email": lambda db: crud_user.get_by_email(db, email="plans-student@example.com"),
+    }
+
+
+def test_hot_queries_use_indexes():
+    db = TestingSessionLocal()
+    try:
+        queries = hot_queries(*seed(db))
+        failures = []
+        for name, run in queries.items():
+            with recorded_selects() as statements:
+                run(db)
+            assert statements, f"{name}: no SELECT recorded"
+            for statement, parameters in statements:
+                for scan in full_scans(statement, parameters):
+                    failures.append(f"{name}: {scan}\n    {' '.join(statement.split())}")
+        assert not failures, "Full table scans in hot queries:\n" + "\n".join(failures)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_hot_queries_use_indexes()
+    print("All hot queries use indexes")
@@ -0,0 +1,89 @@
+"""
+SingleWriterSession routing test.
+Run with: python test_single_writer.py  (or pytest test_single_writer.py)
+
+Two engines on one throwaway SQLite file stand in for the reader pool and
+the writer connection; each records the statements it ran, so the test can
+check which one a session used for reads, flushes and bulk writes.
+"""
+import tempfile
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.sqlite import SingleWriterSession
+from app.models.category import Category
+
+_tmp_dir = tempfile.mkdtemp()
+reader = create_engine(f"sqlite:///{_tmp_dir}/writer.db", connect_args={"check_same_thread": False})
+writer = create_engine(f"sqlite:///{_tmp_dir}/writer.db", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=reader, class_=SingleWriterSession, writer=writer
+)
+
+executed = []
+
+
+def _recorder(name):
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((name, statement.split(None, 1)[0].upper()))
+    return record
+
+
+event.listen(reader, "before_cursor_execute", _recorder("reader"))
+event.listen(writer, "before_cursor_execute", _recorder("writer"))
+
+Base.metadata.create_all(bind=writer)
+
+
+def run(db, statement):
+    """Engine that ran `statement`"""
+    executed.clear()
+    db.execute(statement)
+    return {name for name, _ in executed}
+
+
+def test_flush_and_the_rest_of_its_transaction_use_the_writer():
+    db = TestingSessionLocal()
+    try:
+        assert run(db, select(Category.id)) == {"reader"}
+        # Nothing pending: the flush is a no-op and doesn't claim the writer
+        db.flush()
+        assert not db.writing
+
+        executed.clear()
+        db.add(Category(name="Single writer flush"))
+        db.flush()
+        assert executed and {name for name, _ in executed} == {"writer"}, executed
+        # Reads its own uncommitted insert
+        assert run(db, select(Category.id).where(Category.name == "Single writer flush")) == {"writer"}
+
+        db.commit()
+        assert not db.writing
+        assert run(db, select(Category.id)) == {"reader"}
+    finally:
+        db.close()
+
+
+def test_bulk_write_uses_the_writer_until_rollback():
+    db = TestingSessionLocal()
+    try:
+        db.add(Category(name="Single writer bulk"))
+        db.commit()
+
+        statement = Category.__table__.update().where(Category.name == "Single writer bulk").values(description="x")
+        assert run(db, statement) == {"writer"}
+        assert run(db, select(Category.id)) == {"writer"}
+
+        db.rollback()
+        assert not db.writing
+        assert run(db, select(Category.description).where(Category.name == "Single writer bulk")) == {"reader"}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_flush_and_the_rest_of_its_transaction_use_the_writer()
+    test_bulk_write_uses_the_writer_until_rollback()
+    print("Single writer routing OK")
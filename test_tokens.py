@@ -0,0 +1,273 @@
+"""
+Refresh token rotation and logout tests.
+Run with: python test_tokens.py  (or pytest test_tokens.py)
+
+Against a throwaway SQLite database, checks that a refresh token is single
+use, that logout revokes both tokens (also for a worker that only sees the
+database, even when it has the token in its principal cache), and that the
+background reload picks up revocations written by another process.
+"""
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlsplit
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import crud
+from app.main import app
+from app.api import deps
+from app.api.endpoints.oauth import login_success_redirect
+from app.core import security
+from app.db import session as db_session
+from app.db.base import Base
+from app.models.token import RevokedToken
+from app.models.user import User
+from app.schemas.user import UserUpdate
+from app.services.principal_cache import principal_cache
+from app.services.revocation import RevocationList, revocation_list
+
+_tmp_dir = tempfile.mkdtemp()
+engine = create_engine(f"sqlite:///{_tmp_dir}/tokens.db", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# TestClient runs each request on its own event loop, so don't pool async connections
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{_tmp_dir}/tokens.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+def use_test_database():
+    """Point the app at this module's database; other test modules point it at theirs"""
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_db] = override_get_db
+    app.dependency_overrides[db_session.get_async_db] = override_get_async_db
+    # Revocation checks read the database outside the request's session
+    revocation_list.session_factory = TestingSessionLocal
+    revocation_list.reload()
+    principal_cache.clear()
+
+
+Base.metadata.create_all(bind=engine)
+client = TestClient(app)
+
+
+def login(prefix: str) -> dict:
+    """Create a student and log in; returns the token response"""
+    db = TestingSessionLocal()
+    try:
+        email = f"{prefix}@example.com"
+        db.add(User(email=email, hashed_password=security.get_password_hash("secret"), is_active=True))
+        db.commit()
+    finally:
+        db.close()
+    r = client.post("/login/access-token", data={"username": email, "password": "secret"})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_refresh_rotates_the_token_pair():
+    use_test_database()
+    tokens = login("rotate")
+
+    # A refresh token is not accepted as an access token
+    r = client.get("/api/transfer/notifications", headers=bearer(tokens["refresh_token"]))
+    assert r.status_code == 403, r.text
+
+    r = client.post("/login/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 200, r.text
+    rotated = r.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    r = client.get("/api/transfer/notifications", headers=bearer(rotated["access_token"]))
+    assert r.status_code == 200, r.text
+
+    # The new refresh token is good for exactly one more rotation
+    r = client.post("/login/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert r.status_code == 200, r.text
+
+
+def test_refresh_token_reuse_is_rejected():
+    use_test_database()
+    tokens = login("reuse")
+    r = client.post("/login/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 200, r.text
+
+    r = client.post("/login/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401, r.text
+
+    r = client.post("/login/refresh", json={"refresh_token": "not-a-token"})
+    assert r.status_code == 401, r.text
+
+
+def test_logout_revokes_access_and_refresh_tokens():
+    use_test_database()
+    tokens = login("logout")
+    headers = bearer(tokens["access_token"])
+    assert client.get("/api/transfer/notifications", headers=headers).status_code == 200
+
+    r = client.post("/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers)
+    assert r.status_code == 204, r.text
+    assert client.get("/api/transfer/notifications", headers=headers).status_code == 401
+    r = client.post("/login/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401, r.text
+
+    # Another worker only learns about the logout from the database
+    other_worker = RevocationList(session_factory=TestingSessionLocal)
+    other_worker.reload()
+    jti = security.decode_token(tokens["access_token"])["jti"]
+    assert other_worker.is_token_revoked(jti)
+
+
+def test_logout_only_revokes_the_callers_refresh_token():
+    use_test_database()
+    mine = login("logout-mine")
+    theirs = login("logout-theirs")
+
+    # Someone else's refresh token is ignored
+    r = client.post("/logout", json={"refresh_token": theirs["refresh_token"]}, headers=bearer(mine["access_token"]))
+    assert r.status_code == 204, r.text
+    r = client.post("/login/refresh", json={"refresh_token": theirs["refresh_token"]})
+    assert r.status_code == 200, r.text
+
+    # So is an access token passed as the refresh token
+    r = client.post("/login/access-token", data={"username": "logout-theirs@example.com", "password": "secret"})
+    second_session = r.json()
+    r = client.post(
+        "/logout", json={"refresh_token": second_session["access_token"]}, headers=bearer(theirs["access_token"])
+    )
+    assert r.status_code == 204, r.text
+    r = client.get("/api/transfer/notifications", headers=bearer(second_session["access_token"]))
+    assert r.status_code == 200, r.text
+
+
+def test_cached_principal_is_refused_after_another_worker_revokes_it():
+    use_test_database()
+    tokens = login("elsewhere")
+    headers = bearer(tokens["access_token"])
+    # A missing stage means the token got through authentication
+    attempt = lambda: client.post("/api/stages/999999/attempts", json={"stage_id": 999999}, headers=headers)
+    assert attempt().status_code == 404
+    assert principal_cache.get(tokens["access_token"]) is not None
+
+    # Another worker handled the logout: only the database knows, this worker's cache does not
+    claims = security.decode_token(tokens["access_token"])
+    db = TestingSessionLocal()
+    try:
+        db.add(RevokedToken(
+            jti=claims["jti"], user_id=int(claims["sub"]), token_type=security.ACCESS_TOKEN_TYPE,
+            expires_at=datetime.utcfromtimestamp(claims["exp"])
+        ))
+        db.commit()
+    finally:
+        db.close()
+    revocation_list.reload()
+
+    r = attempt()
+    assert r.status_code == 401, r.text
+    assert principal_cache.get(tokens["access_token"]) is None
+
+
+def test_cached_principal_is_refused_once_blocked_elsewhere():
+    use_test_database()
+    tokens = login("blocked-elsewhere")
+    headers = bearer(tokens["access_token"])
+    attempt = lambda: client.post("/api/stages/999999/attempts", json={"stage_id": 999999}, headers=headers)
+    assert attempt().status_code == 404
+
+    db = TestingSessionLocal()
+    try:
+        db.query(User).filter(User.email == "blocked-elsewhere@example.com").update(
+            {User.is_blocked: True, User.block_reason: "test"}
+        )
+        db.commit()
+    finally:
+        db.close()
+    revocation_list.reload()
+
+    r = attempt()
+    assert r.status_code == 403, r.text
+
+
+def test_concurrent_role_changes_each_bump_the_token_version():
+    use_test_database()
+    login("versions")
+    # Two admins load the same user before either saves a role change
+    first, second = TestingSessionLocal(), TestingSessionLocal()
+    try:
+        user_a = first.query(User).filter(User.email == "versions@example.com").one()
+        user_b = second.query(User).filter(User.email == "versions@example.com").one()
+        assert user_a.token_version == user_b.token_version == 0
+        crud.user.update(first, db_obj=user_a, obj_in=UserUpdate(email=user_a.email, role="professor", is_professor=True))
+        crud.user.update(second, db_obj=user_b, obj_in=UserUpdate(email=user_b.email, role="admin", is_superuser=True))
+        assert user_b.token_version == 2
+        assert revocation_list.is_version_stale(user_b.id, 1)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_oauth_redirect_keeps_the_refresh_token_out_of_the_query():
+    url = urlsplit(login_success_redirect("access", "refresh").headers["location"])
+    assert parse_qs(url.query) == {"token": ["access"]}
+    assert parse_qs(url.fragment) == {"refresh_token": ["refresh"]}
+
+
+def test_background_reload_picks_up_other_workers_revocations():
+    use_test_database()
+    revocations = RevocationList(session_factory=TestingSessionLocal, reload_seconds=0.05)
+    revocations.reload()
+    jti = uuid.uuid4().hex
+    assert not revocations.is_token_revoked(jti)
+
+    revocations.start()
+    try:
+        db = TestingSessionLocal()
+        try:
+            db.add(RevokedToken(
+                jti=jti, token_type=security.ACCESS_TOKEN_TYPE,
+                expires_at=datetime.utcnow() + timedelta(minutes=5)
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+        deadline = time.monotonic() + 5
+        while not revocations.is_token_revoked(jti):
+            assert time.monotonic() < deadline, "revocation not reloaded in the background"
+            time.sleep(0.01)
+    finally:
+        revocations.stop()
+    assert not revocations.is_running
+
+
+if __name__ == "__main__":
+    test_refresh_rotates_the_token_pair()
+    test_refresh_token_reuse_is_rejected()
+    test_logout_revokes_access_and_refresh_tokens()
+    test_logout_only_revokes_the_callers_refresh_token()
+    test_cached_principal_is_refused_after_another_worker_revokes_it()
+    test_cached_principal_is_refused_once_blocked_elsewhere()
+    test_concurrent_role_changes_each_bump_the_token_version()
+    test_oauth_redirect_keeps_the_refresh_token_out_of_the_query()
+    test_background_reload_picks_up_other_workers_revocations()
+    print("Token rotation and revocation OK")